@@ -6,6 +6,33 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql://lavanderia:lavanderia123@db:5432/lavanderia_db")
+
+    # Pools de conexões por carga (interativo: API e telas; ingestao: balanças e tarefas em
+    # segundo plano; relatorios: relatórios e dashboard). statement_timeout só no Postgres.
+    DB_POOL_INTERATIVO_TAMANHO: int = int(os.getenv("DB_POOL_INTERATIVO_TAMANHO", "10"))
+    DB_POOL_INTERATIVO_OVERFLOW: int = int(os.getenv("DB_POOL_INTERATIVO_OVERFLOW", "10"))
+    DB_POOL_INTERATIVO_TIMEOUT_S: float = float(os.getenv("DB_POOL_INTERATIVO_TIMEOUT_S", "10"))
+    DB_POOL_INTERATIVO_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_POOL_INTERATIVO_STATEMENT_TIMEOUT_MS", "15000"))
+    DB_POOL_INGESTAO_TAMANHO: int = int(os.getenv("DB_POOL_INGESTAO_TAMANHO", "5"))
+    DB_POOL_INGESTAO_OVERFLOW: int = int(os.getenv("DB_POOL_INGESTAO_OVERFLOW", "5"))
+    DB_POOL_INGESTAO_TIMEOUT_S: float = float(os.getenv("DB_POOL_INGESTAO_TIMEOUT_S", "5"))
+    DB_POOL_INGESTAO_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_POOL_INGESTAO_STATEMENT_TIMEOUT_MS", "5000"))
+    DB_POOL_RELATORIOS_TAMANHO: int = int(os.getenv("DB_POOL_RELATORIOS_TAMANHO", "3"))
+    DB_POOL_RELATORIOS_OVERFLOW: int = int(os.getenv("DB_POOL_RELATORIOS_OVERFLOW", "2"))
+    DB_POOL_RELATORIOS_TIMEOUT_S: float = float(os.getenv("DB_POOL_RELATORIOS_TIMEOUT_S", "30"))
+    DB_POOL_RELATORIOS_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_POOL_RELATORIOS_STATEMENT_TIMEOUT_MS", "120000"))
+    # Réplica de leitura opcional para listagens, relatórios e dashboard
+    DATABASE_REPLICA_URL: str | None = os.getenv("DATABASE_REPLICA_URL") or None
+    DB_POOL_REPLICA_TAMANHO: int = int(os.getenv("DB_POOL_REPLICA_TAMANHO", "10"))
+    DB_POOL_REPLICA_OVERFLOW: int = int(os.getenv("DB_POOL_REPLICA_OVERFLOW", "10"))
+    DB_POOL_REPLICA_TIMEOUT_S: float = float(os.getenv("DB_POOL_REPLICA_TIMEOUT_S", "10"))
+    DB_POOL_REPLICA_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_POOL_REPLICA_STATEMENT_TIMEOUT_MS", "120000"))
+    # Depois de uma falha, a réplica fica de fora por esse tempo
+    REPLICA_ESPERA_FALHA_S: float = float(os.getenv("REPLICA_ESPERA_FALHA_S", "30"))
+    # Após uma escrita, as leituras do mesmo cliente vão ao primário por esse tempo (atraso máximo da réplica)
+    REPLICA_ATRASO_MAX_S: float = float(os.getenv("REPLICA_ATRASO_MAX_S", "5"))
+    DB_POOL_RECYCLE_S: int = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-123456789")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
@@ -13,5 +40,83 @@ class Settings:
     PROJECT_NAME: str = "Lavanderia Hospitalar"
     API_V1_STR: str = "/api/v1"
 
+    # Buffer de gravação em lote (group commit) para /pesagens/balanca
+    PESAGEM_BUFFER_ATIVO: bool = os.getenv("PESAGEM_BUFFER_ATIVO", "false").lower() in ("1", "true", "yes")
+    PESAGEM_BUFFER_LOTE_MAX: int = int(os.getenv("PESAGEM_BUFFER_LOTE_MAX", "200"))
+    PESAGEM_BUFFER_LATENCIA_MAX_MS: int = int(os.getenv("PESAGEM_BUFFER_LATENCIA_MAX_MS", "20"))
+    PESAGEM_BUFFER_FILA_MAX: int = int(os.getenv("PESAGEM_BUFFER_FILA_MAX", "10000"))
+    PESAGEM_BUFFER_TIMEOUT_S: float = float(os.getenv("PESAGEM_BUFFER_TIMEOUT_S", "5"))
+
+    # Admissão das leituras da balança: balde de tokens por balanca_id (requisições/s, 0 desliga)
+    # e limite global de requisições de ingestão simultâneas, abaixo do pool do banco
+    PESAGEM_TAXA_POR_BALANCA: float = float(os.getenv("PESAGEM_TAXA_POR_BALANCA", "10"))
+    PESAGEM_RAJADA_POR_BALANCA: int = int(os.getenv("PESAGEM_RAJADA_POR_BALANCA", "20"))
+    PESAGEM_CONCORRENCIA_MAX: int = int(os.getenv("PESAGEM_CONCORRENCIA_MAX", "4"))
+    PESAGEM_CONCORRENCIA_ESPERA_MS: int = int(os.getenv("PESAGEM_CONCORRENCIA_ESPERA_MS", "100"))
+
+    # Despacho assíncrono das notificações (false: eventos ficam na fila até serem descarregados)
+    NOTIFICACOES_GRAVADOR_ATIVO: bool = os.getenv("NOTIFICACOES_GRAVADOR_ATIVO", "true").lower() in ("1", "true", "yes")
+    NOTIFICACOES_LOTE_MAX: int = int(os.getenv("NOTIFICACOES_LOTE_MAX", "500"))
+    NOTIFICACOES_LATENCIA_MAX_MS: int = int(os.getenv("NOTIFICACOES_LATENCIA_MAX_MS", "50"))
+    NOTIFICACOES_FILA_MAX: int = int(os.getenv("NOTIFICACOES_FILA_MAX", "10000"))
+    NOTIFICACOES_WORKERS: int = int(os.getenv("NOTIFICACOES_WORKERS", "2"))
+    NOTIFICACOES_TENTATIVAS: int = int(os.getenv("NOTIFICACOES_TENTATIVAS", "3"))
+    NOTIFICACOES_WEBHOOK_URL: str | None = os.getenv("NOTIFICACOES_WEBHOOK_URL") or None
+
+    # Webhooks dos hospitais: eventos acumulados por assinatura e enviados em lote
+    WEBHOOK_JANELA_MS: int = int(os.getenv("WEBHOOK_JANELA_MS", "5000"))
+    WEBHOOK_LOTE_MAX: int = int(os.getenv("WEBHOOK_LOTE_MAX", "200"))
+    WEBHOOK_CONCORRENCIA: int = int(os.getenv("WEBHOOK_CONCORRENCIA", "8"))
+    WEBHOOK_TENTATIVAS: int = int(os.getenv("WEBHOOK_TENTATIVAS", "6"))
+    WEBHOOK_ESPERA_INICIAL_S: float = float(os.getenv("WEBHOOK_ESPERA_INICIAL_S", "1"))
+    WEBHOOK_ESPERA_MAX_S: float = float(os.getenv("WEBHOOK_ESPERA_MAX_S", "300"))
+    WEBHOOK_PENDENTES_MAX: int = int(os.getenv("WEBHOOK_PENDENTES_MAX", "10000"))
+    WEBHOOK_TIMEOUT_S: float = float(os.getenv("WEBHOOK_TIMEOUT_S", "10"))
+
+    # Barramento que distribui as notificações entre workers: "auto" (postgres quando o banco
+    # é Postgres), "postgres" (LISTEN/NOTIFY) ou "local" (apenas o próprio processo)
+    NOTIFICACOES_BARRAMENTO: str = os.getenv("NOTIFICACOES_BARRAMENTO", "auto")
+    NOTIFICACOES_CANAL: str = os.getenv("NOTIFICACOES_CANAL", "notificacoes")
+
+    # Stream SSE de notificações: fila por cliente, intervalo do heartbeat e máximo de eventos reenviados
+    SSE_FILA_MAX: int = int(os.getenv("SSE_FILA_MAX", "100"))
+    SSE_HEARTBEAT_S: float = float(os.getenv("SSE_HEARTBEAT_S", "15"))
+    SSE_REPLAY_MAX: int = int(os.getenv("SSE_REPLAY_MAX", "500"))
+
+    # Cache código → gaiola usado pelas leituras da balança
+    GAIOLA_CACHE_TAMANHO: int = int(os.getenv("GAIOLA_CACHE_TAMANHO", "10000"))
+    GAIOLA_CACHE_TTL_S: float = float(os.getenv("GAIOLA_CACHE_TTL_S", "300"))
+
+    # Cache do usuário autenticado (sub do token → usuário ativo)
+    USUARIO_CACHE_TAMANHO: int = int(os.getenv("USUARIO_CACHE_TAMANHO", "5000"))
+    USUARIO_CACHE_TTL_S: float = float(os.getenv("USUARIO_CACHE_TTL_S", "30"))
+    # Intervalo de recarga da lista de revogação de tokens (versões dos usuários)
+    REVOGACAO_INTERVALO_S: float = float(os.getenv("REVOGACAO_INTERVALO_S", "10"))
+
+    # Custo do bcrypt; hashes com outro custo são refeitos no próximo login
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Pool dedicado ao hash/verificação de senhas (0 workers: um por núcleo)
+    SENHA_POOL_WORKERS: int = int(os.getenv("SENHA_POOL_WORKERS", "0"))
+    SENHA_POOL_FILA_MAX: int = int(os.getenv("SENHA_POOL_FILA_MAX", "64"))
+
+    # Janela em memória de leituras já gravadas (reenvios da balança)
+    PESAGEM_DEDUP_TAMANHO: int = int(os.getenv("PESAGEM_DEDUP_TAMANHO", "100000"))
+    PESAGEM_DEDUP_TTL_S: float = float(os.getenv("PESAGEM_DEDUP_TTL_S", "600"))
+
+    # Detecção de peso estável a partir de amostras brutas da balança
+    ESTABILIZACAO_JANELA: int = int(os.getenv("ESTABILIZACAO_JANELA", "20"))
+    ESTABILIZACAO_DESVIO_MAX_KG: float = float(os.getenv("ESTABILIZACAO_DESVIO_MAX_KG", "0.05"))
+    ESTABILIZACAO_TEMPO_S: float = float(os.getenv("ESTABILIZACAO_TEMPO_S", "1.0"))
+    ESTABILIZACAO_PESO_MIN_KG: float = float(os.getenv("ESTABILIZACAO_PESO_MIN_KG", "0.5"))
+    # Detectores mantidos (um por balança) e tempo sem amostras até o detector ser descartado
+    ESTABILIZACAO_BALANCAS_MAX: int = int(os.getenv("ESTABILIZACAO_BALANCAS_MAX", "1000"))
+    ESTABILIZACAO_OCIOSA_S: float = float(os.getenv("ESTABILIZACAO_OCIOSA_S", "600"))
+
+    # Listener TCP para balanças com protocolo de linhas (grava pelo buffer de pesagens)
+    BALANCA_TCP_ATIVO: bool = os.getenv("BALANCA_TCP_ATIVO", "false").lower() in ("1", "true", "yes")
+    BALANCA_TCP_HOST: str = os.getenv("BALANCA_TCP_HOST", "0.0.0.0")
+    BALANCA_TCP_PORTA: int = int(os.getenv("BALANCA_TCP_PORTA", "9100"))
+    BALANCA_TCP_PENDENTES_MAX: int = int(os.getenv("BALANCA_TCP_PENDENTES_MAX", "256"))
+
 
 settings = Settings()
@@ -1,18 +1,230 @@
+"""
+Engines e sessões do banco, com um pool de conexões por carga de trabalho.
+
+- ``interativo``: rotas da API e telas (``get_db``, ``SessionLocal``)
+- ``ingestao``: leituras da balança, buffer de gravação e tarefas em segundo
+  plano (``get_db_ingestao``, ``SessionIngestao``)
+- ``relatorios``: relatórios e dashboard, consultas longas
+  (``get_db_relatorios``, ``SessionRelatorios``)
+
+Separar os pools impede que relatórios segurando conexões em varreduras
+longas façam a ingestão da balança esperar na fila do pool. Tamanho,
+overflow, espera máxima por conexão e ``statement_timeout`` (Postgres) de
+cada pool vêm de ``DB_POOL_<CARGA>_*``; ``DB_POOL_RECYCLE_S`` e
+``DB_POOL_PRE_PING`` valem para todos. ``metricas_pools()`` expõe conexões
+em uso e o tempo de espera por conexão de cada pool.
+
+Com SQLite (desenvolvimento e testes) as três cargas compartilham um único
+engine, já que o banco tem um único escritor.
+
+Leituras em réplica: com ``DATABASE_REPLICA_URL``, as dependências só de
+leitura (``get_db_leitura`` para listagens/detalhes e ``get_db_relatorios``)
+abrem a sessão na réplica (pool ``DB_POOL_REPLICA_*``). Se a réplica não
+responder, a sessão volta para o primário e a réplica fica de fora por
+``REPLICA_ESPERA_FALHA_S``. Escritas e fluxos que leem o que acabaram de
+gravar continuam em ``get_db``. Para o cliente enxergar a própria escrita,
+toda requisição de escrita bem-sucedida grava o cookie ``PRIMARIO_COOKIE``
+(ver ``main.py``) e, até ``REPLICA_ATRASO_MAX_S`` depois, as leituras desse
+cliente vão ao primário; o cabeçalho ``PRIMARIO_HEADER`` força o mesmo.
+"""
+import logging
+import os
+import threading
+import time
+
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+
 from app.config import settings
-import os
+
+logger = logging.getLogger(__name__)
 
 _db_url = os.environ.get("DATABASE_URL", settings.DATABASE_URL)
-_connect_args = {"check_same_thread": False} if _db_url.startswith("sqlite") else {}
-engine = create_engine(_db_url, connect_args=_connect_args)
+_sqlite = _db_url.startswith("sqlite")
+_replica_url = os.environ.get("DATABASE_REPLICA_URL", settings.DATABASE_REPLICA_URL) or None
+
+PRIMARIO_COOKIE = "ler_primario_ate"
+PRIMARIO_HEADER = "X-Ler-Primario"
+
+
+class PoolMedido(QueuePool):
+    """``QueuePool`` que mede a espera por conexão (checkout) e os timeouts do pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._lock_metricas:
+                self._timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_metricas:
+                self._checkouts += 1
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+
+    def recreate(self):
+        # Mantém as métricas quando o engine recria o pool (ex.: dispose)
+        novo = super().recreate()
+        novo._checkouts, novo._timeouts = self._checkouts, self._timeouts
+        novo._espera_total, novo._espera_max = self._espera_total, self._espera_max
+        return novo
+
+    def metricas(self) -> dict:
+        with self._lock_metricas:
+            return {
+                "tamanho": self.size(),
+                "overflow_max": self._max_overflow,
+                "em_uso": self.checkedout(),
+                "ociosas": self.checkedin(),
+                "overflow": max(self.overflow(), 0),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "espera_media_ms": round(self._espera_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "espera_max_ms": round(self._espera_max * 1000, 3),
+            }
+
+
+def _criar_engine(carga: str, url: str = _db_url):
+    prefixo = f"DB_POOL_{carga.upper()}_"
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    else:
+        statement_timeout = getattr(settings, prefixo + "STATEMENT_TIMEOUT_MS")
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=PoolMedido,
+        pool_size=getattr(settings, prefixo + "TAMANHO"),
+        max_overflow=getattr(settings, prefixo + "OVERFLOW"),
+        pool_timeout=getattr(settings, prefixo + "TIMEOUT_S"),
+        pool_recycle=settings.DB_POOL_RECYCLE_S,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
+engine = _criar_engine("interativo")
+engine_ingestao = engine if _sqlite else _criar_engine("ingestao")
+engine_relatorios = engine if _sqlite else _criar_engine("relatorios")
+engine_replica = _criar_engine("replica", _replica_url) if _replica_url else None
+engines = {"interativo": engine, "ingestao": engine_ingestao, "relatorios": engine_relatorios}
+if engine_replica is not None:
+    engines["replica"] = engine_replica
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionIngestao = sessionmaker(autocommit=False, autoflush=False, bind=engine_ingestao)
+SessionRelatorios = sessionmaker(autocommit=False, autoflush=False, bind=engine_relatorios)
+SessionReplica = sessionmaker(autocommit=False, autoflush=False, bind=engine_replica) if engine_replica else None
 Base = declarative_base()
 
 
+class RoteadorLeitura:
+    """Abre sessões só de leitura na réplica, com volta para o primário se ela falhar."""
+
+    def __init__(self, replica: sessionmaker | None, primario: sessionmaker,
+                 espera_falha_s: float = settings.REPLICA_ESPERA_FALHA_S):
+        self.replica = replica
+        self.primario = primario
+        self.espera_falha = espera_falha_s
+        self._replica_fora_ate = 0.0
+        self._lock = threading.Lock()
+        self._metricas = {"replica": 0, "primario": 0, "primario_forcado": 0, "falhas_replica": 0}
+
+    def sessao(self, forcar_primario: bool = False) -> Session:
+        if self.replica is not None and not forcar_primario and time.monotonic() >= self._replica_fora_ate:
+            db = self.replica()
+            try:
+                # Garante a conexão já aqui, para a falha não aparecer no meio da rota
+                db.connection()
+            except (DBAPIError, PoolTimeoutError):
+                # Réplica fora do ar ou com o pool esgotado: o primário atende enquanto isso
+                db.close()
+                logger.warning("Réplica indisponível; leituras no primário por %.0fs", self.espera_falha, exc_info=True)
+                with self._lock:
+                    self._replica_fora_ate = time.monotonic() + self.espera_falha
+                    self._metricas["falhas_replica"] += 1
+            else:
+                with self._lock:
+                    self._metricas["replica"] += 1
+                return db
+        with self._lock:
+            self._metricas["primario_forcado" if forcar_primario and self.replica else "primario"] += 1
+        return self.primario()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                **self._metricas,
+                "replica_configurada": self.replica is not None,
+                "replica_disponivel": self.replica is not None and time.monotonic() >= self._replica_fora_ate,
+            }
+
+
+leitura = RoteadorLeitura(SessionReplica, SessionLocal)
+leitura_relatorios = RoteadorLeitura(SessionReplica, SessionRelatorios)
+
+
+def _ler_do_primario(request: Request) -> bool:
+    """O cliente escreveu há pouco (cookie) ou pediu leitura consistente (cabeçalho)."""
+    if request.headers.get(PRIMARIO_HEADER):
+        return True
+    try:
+        return float(request.cookies.get(PRIMARIO_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_db_ingestao():
+    db = SessionIngestao()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_db_leitura(request: Request):
+    """Sessão para rotas só de leitura (listagens e detalhes): réplica, se configurada."""
+    db = leitura.sessao(forcar_primario=_ler_do_primario(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_db_relatorios(request: Request):
+    db = leitura_relatorios.sessao(forcar_primario=_ler_do_primario(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def metricas_pools() -> dict:
+    """Conexões em uso/ociosas e espera por conexão de cada pool (cargas que compartilham engine repetem os valores)."""
+    return {
+        **{carga: e.pool.metricas() for carga, e in engines.items()},
+        "roteamento_leitura": {"listagens": leitura.metricas(), "relatorios": leitura_relatorios.metricas()},
+    }
@@ -1,40 +1,86 @@
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from sqlalchemy.orm import Session, joinedload
 
 from app.config import settings
-from app.database import get_db
+from app import database
+from app.database import get_db, get_db_leitura, get_db_relatorios, metricas_pools
 from app.models.gaiola import Gaiola, StatusGaiola
-from app.models.pesagem import Pesagem, TipoPesagem
+from app.models.pesagem import Pesagem
 from app.models.hospital import Hospital
 from app.models.user import Usuario
-from app.utils.dependencies import get_optional_user, require_web_user
-from app.utils.security import verify_password, create_access_token, create_refresh_token
-from app.routers import auth, hospitais, gaiolas, pesagens, transportes, processos, relatorios
+from app.utils.dependencies import get_current_active_user, get_optional_user, require_web_user
+from app.utils.security import create_access_token, create_refresh_token, claims_usuario
+from app.utils.paginacao import NEXT_CURSOR_HEADER
+from app.routers import auth, hospitais, gaiolas, pesagens, transportes, processos, relatorios, notificacoes
+from app.services import balanca_tcp_service, dashboard_service, ingestao_service, notificacao_service
+from app.services.senha_service import PoolSenhasCheio, senhas
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    notificacao_service.iniciar(despachar=settings.NOTIFICACOES_GRAVADOR_ATIVO)
+    if settings.PESAGEM_BUFFER_ATIVO:
+        ingestao_service.iniciar()
+    if settings.BALANCA_TCP_ATIVO:
+        await balanca_tcp_service.iniciar()
+    yield
+    await balanca_tcp_service.parar()
+    ingestao_service.parar()
+    notificacao_service.parar()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Sistema de gerenciamento de lavanderia hospitalar",
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
+@app.exception_handler(PoolSenhasCheio)
+def pool_senhas_cheio(request: Request, exc: PoolSenhasCheio):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.middleware("http")
+async def ler_do_primario_apos_escrita(request: Request, call_next):
+    """Após uma escrita, leva as leituras do cliente ao primário enquanto a réplica pode estar atrasada."""
+    response = await call_next(request)
+    if (
+        database.leitura.replica is not None
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            database.PRIMARIO_COOKIE,
+            f"{time.time() + settings.REPLICA_ATRASO_MAX_S:.3f}",
+            max_age=int(settings.REPLICA_ATRASO_MAX_S) + 1,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Determine base directory for static/template files
@@ -54,27 +100,16 @@ app.include_router(pesagens.router)
 app.include_router(transportes.router)
 app.include_router(processos.router)
 app.include_router(relatorios.router)
+app.include_router(notificacoes.router)
 
 
-# ─── Notifications API ─────────────────────────────────────────────────────────
-
-from fastapi import APIRouter as _APIRouter
-from app.services import notificacao_service as _ns
-from app.utils.dependencies import get_current_active_user as _get_user
-
-_notif_router = _APIRouter(prefix="/api/v1/notificacoes", tags=["notificacoes"])
-
-
-@_notif_router.get("/")
-def get_notificacoes(limite: int = 50, current_user=Depends(_get_user)):
-    """Retorna as últimas notificações de mudança de status."""
-    return _ns.get_notificacoes_recentes(limite)
-
-
-app.include_router(_notif_router)
+# ─── Web Routes ────────────────────────────────────────────────────────────────
 
+@app.get("/api/v1/metricas/banco")
+def metricas_banco(current_user: Usuario = Depends(get_current_active_user)):
+    """Conexões em uso/ociosas e tempo de espera por conexão de cada pool do banco."""
+    return metricas_pools()
 
-# ─── Web Routes ────────────────────────────────────────────────────────────────
 
 @app.get("/", response_class=HTMLResponse)
 def root(request: Request):
@@ -89,20 +124,33 @@ def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 
+def _buscar_usuario(db: Session, email: str) -> Usuario | None:
+    return db.query(Usuario).filter(Usuario.email == email).first()
+
+
+def _trocar_hash(db: Session, user: Usuario, novo_hash: str) -> None:
+    user.senha_hash = novo_hash
+    db.commit()
+
+
 @app.post("/login", response_class=HTMLResponse)
 async def login_submit(request: Request, db: Session = Depends(get_db)):
     form = await request.form()
     email = form.get("email", "")
     senha = form.get("senha", "")
-    user = db.query(Usuario).filter(Usuario.email == email).first()
-    if not user or not verify_password(senha, user.senha_hash) or not user.ativo:
+    # Consulta e bcrypt fora do event loop: a verificação roda no pool de senhas
+    user = await run_in_threadpool(_buscar_usuario, db, email)
+    valida, novo_hash = await senhas.verificar_async(senha, user.senha_hash) if user else (False, None)
+    if not valida or not user.ativo:
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "Email ou senha incorretos"},
             status_code=401
         )
-    access_token = create_access_token(data={"sub": user.email})
-    refresh_token = create_refresh_token(data={"sub": user.email})
+    if novo_hash:
+        await run_in_threadpool(_trocar_hash, db, user, novo_hash)
+    access_token = create_access_token(data=claims_usuario(user))
+    refresh_token = create_refresh_token(data=claims_usuario(user))
     response = RedirectResponse(url="/dashboard", status_code=302)
     response.set_cookie("access_token", access_token, httponly=True, samesite="lax")
     response.set_cookie("refresh_token", refresh_token, httponly=True, samesite="lax")
@@ -118,65 +166,24 @@ def logout():
 
 
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, db: Session = Depends(get_db_relatorios)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
 
-    today = datetime.now(timezone.utc).date()
-    total_peso_hoje = 0.0
-    pesagens_hoje = db.query(Pesagem).filter(
-        Pesagem.timestamp >= datetime(today.year, today.month, today.day, tzinfo=timezone.utc)
-    ).all()
-    for p in pesagens_hoje:
-        total_peso_hoje += float(p.peso)
-
-    stats = {
-        "em_transito": db.query(Gaiola).filter(
-            Gaiola.status.in_([StatusGaiola.EM_TRANSPORTE_IDA, StatusGaiola.EM_TRANSPORTE_VOLTA])
-        ).count(),
-        "em_processamento": db.query(Gaiola).filter(
-            Gaiola.status.in_([StatusGaiola.EM_SEPARACAO, StatusGaiola.EM_LAVAGEM,
-                                StatusGaiola.EM_SECAGEM, StatusGaiola.EM_DOBRA])
-        ).count(),
-        "prontas_expedicao": db.query(Gaiola).filter(
-            Gaiola.status == StatusGaiola.PRONTA_EXPEDICAO
-        ).count(),
-        "peso_hoje": round(total_peso_hoje, 2),
-    }
-
-    gaiolas_recentes = db.query(Gaiola).order_by(Gaiola.data_criacao.desc()).limit(10).all()
-
-    # Divergências > 5%
-    alertas = []
-    for g in db.query(Gaiola).all():
-        peso_saida = None
-        peso_exp = None
-        for p in g.pesagens:
-            if p.tipo_pesagem == TipoPesagem.SAIDA_HOSPITAL:
-                peso_saida = float(p.peso)
-            elif p.tipo_pesagem == TipoPesagem.EXPEDICAO:
-                peso_exp = float(p.peso)
-        if peso_saida and peso_exp:
-            div = abs(peso_saida - peso_exp) / peso_saida * 100
-            if div > 5:
-                alertas.append({"gaiola": g.codigo, "divergencia": round(div, 2)})
-
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
         "user": user,
-        "stats": stats,
-        "gaiolas_recentes": gaiolas_recentes,
-        "alertas": alertas,
+        **dashboard_service.contexto_dashboard(db),
     })
 
 
 @app.get("/gaiolas", response_class=HTMLResponse)
-def gaiolas_page(request: Request, db: Session = Depends(get_db)):
+def gaiolas_page(request: Request, db: Session = Depends(get_db_leitura)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
-    all_gaiolas = db.query(Gaiola).order_by(Gaiola.data_criacao.desc()).all()
+    all_gaiolas = db.query(Gaiola).options(joinedload(Gaiola.hospital)).order_by(Gaiola.data_criacao.desc()).all()
     hospitais = db.query(Hospital).filter(Hospital.ativo == True).all()  # noqa: E712
     return templates.TemplateResponse("gaiolas/list.html", {
         "request": request,
@@ -188,7 +195,7 @@ def gaiolas_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/gaiolas/nova", response_class=HTMLResponse)
-def gaiola_create_page(request: Request, db: Session = Depends(get_db)):
+def gaiola_create_page(request: Request, db: Session = Depends(get_db_leitura)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
@@ -201,7 +208,7 @@ def gaiola_create_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/gaiolas/{gaiola_id}", response_class=HTMLResponse)
-def gaiola_detail_page(request: Request, gaiola_id: str, db: Session = Depends(get_db)):
+def gaiola_detail_page(request: Request, gaiola_id: str, db: Session = Depends(get_db_leitura)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
@@ -217,7 +224,7 @@ def gaiola_detail_page(request: Request, gaiola_id: str, db: Session = Depends(g
 
 
 @app.get("/hospitais", response_class=HTMLResponse)
-def hospitais_page(request: Request, db: Session = Depends(get_db)):
+def hospitais_page(request: Request, db: Session = Depends(get_db_leitura)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
@@ -230,11 +237,17 @@ def hospitais_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/pesagens", response_class=HTMLResponse)
-def pesagens_page(request: Request, db: Session = Depends(get_db)):
+def pesagens_page(request: Request, db: Session = Depends(get_db_leitura)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
-    all_pesagens = db.query(Pesagem).order_by(Pesagem.timestamp.desc()).limit(100).all()
+    all_pesagens = (
+        db.query(Pesagem)
+        .options(joinedload(Pesagem.gaiola).load_only(Gaiola.codigo))
+        .order_by(Pesagem.timestamp.desc())
+        .limit(100)
+        .all()
+    )
     return templates.TemplateResponse("pesagens/list.html", {
         "request": request,
         "user": user,
@@ -243,12 +256,18 @@ def pesagens_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/transportes", response_class=HTMLResponse)
-def transportes_page(request: Request, db: Session = Depends(get_db)):
+def transportes_page(request: Request, db: Session = Depends(get_db_leitura)):
     from app.models.transporte import Transporte
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
-    all_transportes = db.query(Transporte).order_by(Transporte.data_saida.desc()).limit(100).all()
+    all_transportes = (
+        db.query(Transporte)
+        .options(joinedload(Transporte.gaiola).load_only(Gaiola.codigo))
+        .order_by(Transporte.data_saida.desc())
+        .limit(100)
+        .all()
+    )
     return templates.TemplateResponse("transportes/list.html", {
         "request": request,
         "user": user,
@@ -257,7 +276,7 @@ def transportes_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/relatorios", response_class=HTMLResponse)
-def relatorios_page(request: Request, db: Session = Depends(get_db)):
+def relatorios_page(request: Request, db: Session = Depends(get_db_leitura)):
     user = _get_user_or_redirect(request, db)
     if isinstance(user, RedirectResponse):
         return user
@@ -5,3 +5,6 @@ from app.models.gaiola import Gaiola  # noqa: F401
 from app.models.pesagem import Pesagem  # noqa: F401
 from app.models.transporte import Transporte  # noqa: F401
 from app.models.processo import Processo  # noqa: F401
+from app.models.resumo_pesagem import ResumoPesagem  # noqa: F401
+from app.models.notificacao import Notificacao  # noqa: F401
+from app.models.webhook import WebhookHospital  # noqa: F401
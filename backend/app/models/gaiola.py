@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, DateTime, Text, Enum as SAEnum, ForeignKey
+from sqlalchemy import Column, String, DateTime, Text, Enum as SAEnum, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -22,6 +22,9 @@ class StatusGaiola(str, enum.Enum):
 
 class Gaiola(Base):
     __tablename__ = "gaiolas"
+    __table_args__ = (
+        Index("ix_gaiolas_data_criacao_id", "data_criacao", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     codigo = Column(String(100), unique=True, nullable=False, index=True)
@@ -35,3 +38,4 @@ class Gaiola(Base):
     pesagens = relationship("Pesagem", back_populates="gaiola")
     transportes = relationship("Transporte", back_populates="gaiola")
     processos = relationship("Processo", back_populates="gaiola")
+    resumo_pesagem = relationship("ResumoPesagem", back_populates="gaiola", uselist=False)
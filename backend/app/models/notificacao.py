@@ -0,0 +1,24 @@
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Index, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class Notificacao(Base):
+    """Log append-only das mudanças de status das gaiolas, gravado em lote por ``notificacao_service``."""
+    __tablename__ = "notificacoes"
+    __table_args__ = (
+        Index("ix_notificacoes_timestamp_id", "timestamp", "id"),
+        Index("ix_notificacoes_gaiola_codigo_timestamp", "gaiola_codigo", "timestamp"),
+        Index("ix_notificacoes_status_novo_timestamp", "status_novo", "timestamp"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    timestamp = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Código (e não FK) para o histórico sobreviver a renomeações de gaiola
+    gaiola_codigo = Column(String(100), nullable=False)
+    status_anterior = Column(String(50), nullable=True)
+    status_novo = Column(String(50), nullable=False)
+    usuario = Column(String(255), nullable=True)
+    observacoes = Column(Text, nullable=True)
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, DateTime, Text, Enum as SAEnum, ForeignKey, Numeric
+from sqlalchemy import Column, String, DateTime, Text, Enum as SAEnum, ForeignKey, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -15,6 +15,10 @@ class TipoPesagem(str, enum.Enum):
 
 class Pesagem(Base):
     __tablename__ = "pesagens"
+    __table_args__ = (
+        Index("ix_pesagens_timestamp_id", "timestamp", "id"),
+        Index("ix_pesagens_gaiola_id_timestamp_id", "gaiola_id", "timestamp", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     gaiola_id = Column(UUID(as_uuid=True), ForeignKey("gaiolas.id"), nullable=False)
@@ -24,6 +28,8 @@ class Pesagem(Base):
     timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=True)
     observacoes = Column(Text, nullable=True)
+    # Chave enviada pela balança (ou derivada) para descartar reenvios da mesma leitura
+    chave_idempotencia = Column(String(400), nullable=True, unique=True, index=True)
 
     gaiola = relationship("Gaiola", back_populates="pesagens")
     usuario = relationship("Usuario", back_populates="pesagens")
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, DateTime, Text, Enum as SAEnum, ForeignKey
+from sqlalchemy import Column, String, DateTime, Text, Enum as SAEnum, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -16,6 +16,9 @@ class EtapaProcesso(str, enum.Enum):
 
 class Processo(Base):
     __tablename__ = "processos"
+    __table_args__ = (
+        Index("ix_processos_data_inicio_id", "data_inicio", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     gaiola_id = Column(UUID(as_uuid=True), ForeignKey("gaiolas.id"), nullable=False)
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Numeric
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class ResumoPesagem(Base):
+    """Última pesagem de cada tipo por gaiola, mantida por ``balanca_service.registrar_pesagem``."""
+    __tablename__ = "resumos_pesagem"
+
+    gaiola_id = Column(UUID(as_uuid=True), ForeignKey("gaiolas.id"), primary_key=True)
+    peso_saida = Column(Numeric(10, 3), nullable=True)
+    timestamp_saida = Column(DateTime(timezone=True), nullable=True)
+    peso_recebimento = Column(Numeric(10, 3), nullable=True)
+    timestamp_recebimento = Column(DateTime(timezone=True), nullable=True)
+    peso_expedicao = Column(Numeric(10, 3), nullable=True)
+    timestamp_expedicao = Column(DateTime(timezone=True), nullable=True)
+    divergencia = Column(Numeric(8, 2), nullable=True, index=True)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc),
+                        onupdate=lambda: datetime.now(timezone.utc))
+
+    gaiola = relationship("Gaiola", back_populates="resumo_pesagem")
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, DateTime, Enum as SAEnum, ForeignKey
+from sqlalchemy import Column, String, DateTime, Enum as SAEnum, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -19,6 +19,9 @@ class StatusTransporte(str, enum.Enum):
 
 class Transporte(Base):
     __tablename__ = "transportes"
+    __table_args__ = (
+        Index("ix_transportes_data_saida_id", "data_saida", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     gaiola_id = Column(UUID(as_uuid=True), ForeignKey("gaiolas.id"), nullable=False)
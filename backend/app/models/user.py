@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SAEnum
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Enum as SAEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import enum
@@ -23,6 +23,8 @@ class Usuario(Base):
     senha_hash = Column(String(255), nullable=False)
     tipo_usuario = Column(SAEnum(TipoUsuario), nullable=False, default=TipoUsuario.OPERADOR_LAVANDERIA)
     ativo = Column(Boolean, default=True)
+    # Incrementada ao desativar o usuário ou mudar perfil, e-mail ou senha; tokens com versão menor são recusados
+    versao_token = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc),
                         onupdate=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,29 @@
+import uuid
+import enum
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class TipoEventoWebhook(str, enum.Enum):
+    ENTREGUE = "ENTREGUE"
+    DIVERGENCIA = "DIVERGENCIA"
+
+
+class WebhookHospital(Base):
+    """Assinatura de um hospital para receber eventos das suas gaiolas, entregues em lote por ``webhook_service``."""
+    __tablename__ = "webhooks_hospitais"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey("hospitais.id"), nullable=False, index=True)
+    url = Column(String(500), nullable=False)
+    # Tipos de ``TipoEventoWebhook`` separados por vírgula
+    eventos = Column(String(100), nullable=False)
+    segredo = Column(String(200), nullable=True)
+    ativo = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    @property
+    def tipos(self) -> set[str]:
+        return set(self.eventos.split(",")) if self.eventos else set()
@@ -1,12 +1,16 @@
 from datetime import timedelta
+import uuid as _uuid
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import Usuario
-from app.schemas.user import LoginRequest, Token, UsuarioCreate, UsuarioResponse
-from app.utils.security import verify_password, get_password_hash, create_access_token, create_refresh_token
+from app.schemas.user import LoginRequest, Token, UsuarioCreate, UsuarioUpdate, UsuarioResponse
+from app.services.revogacao_tokens import revogacao
+from app.services.senha_service import senhas
+from app.services.usuario_cache import usuarios
+from app.utils.security import create_access_token, create_refresh_token, claims_usuario
 from app.utils.dependencies import get_current_active_user
 from app.config import settings
 
@@ -17,15 +21,20 @@ templates = Jinja2Templates(directory="frontend/templates")
 @router.post("/token", response_model=Token)
 def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(Usuario).filter(Usuario.email == login_data.email).first()
-    if not user or not verify_password(login_data.senha, user.senha_hash):
+    valida, novo_hash = senhas.verificar(login_data.senha, user.senha_hash) if user else (False, None)
+    if not valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
         )
     if not user.ativo:
         raise HTTPException(status_code=400, detail="Usuário inativo")
-    access_token = create_access_token(data={"sub": user.email})
-    refresh_token = create_refresh_token(data={"sub": user.email})
+    if novo_hash:
+        # Hash gerado com outro BCRYPT_ROUNDS: troca pelo hash com o custo atual
+        user.senha_hash = novo_hash
+        db.commit()
+    access_token = create_access_token(data=claims_usuario(user))
+    refresh_token = create_refresh_token(data=claims_usuario(user))
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
@@ -43,7 +52,7 @@ def create_usuario(
     db_user = Usuario(
         nome=usuario.nome,
         email=usuario.email,
-        senha_hash=get_password_hash(usuario.senha),
+        senha_hash=senhas.gerar_hash(usuario.senha),
         tipo_usuario=usuario.tipo_usuario,
         ativo=usuario.ativo,
     )
@@ -54,5 +63,54 @@ def create_usuario(
 
 
 @router.get("/me", response_model=UsuarioResponse)
-def get_me(current_user: Usuario = Depends(get_current_active_user)):
-    return current_user
+def get_me(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    # O usuário do token só traz as claims; o perfil completo vem do cache/banco
+    user = usuarios.obter(db, current_user.email)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas")
+    return user
+
+
+@router.put("/usuarios/{usuario_id}", response_model=UsuarioResponse)
+def update_usuario(
+    usuario_id: str,
+    usuario_update: UsuarioUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    if current_user.tipo_usuario.value != "admin":
+        raise HTTPException(status_code=403, detail="Apenas administradores podem alterar usuários")
+    db_user = db.query(Usuario).filter(Usuario.id == _uuid.UUID(usuario_id)).first()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    update_data = usuario_update.model_dump(exclude_unset=True)
+    if "email" in update_data and update_data["email"] != db_user.email:
+        if db.query(Usuario).filter(Usuario.email == update_data["email"]).first():
+            raise HTTPException(status_code=400, detail="Email já cadastrado")
+    senha = update_data.pop("senha", None)
+    revogar = bool(senha) or update_data.get("ativo") is False or any(
+        key in update_data and update_data[key] != getattr(db_user, key) for key in ("tipo_usuario", "email")
+    )
+    if senha:
+        db_user.senha_hash = senhas.gerar_hash(senha)
+    email_anterior = db_user.email
+    for key, value in update_data.items():
+        setattr(db_user, key, value)
+    if revogar:
+        db_user.versao_token = (db_user.versao_token or 0) + 1
+    db.commit()
+    db.refresh(db_user)
+    # Desativação, troca de perfil, e-mail ou senha valem já na próxima requisição deste worker
+    usuarios.invalidar(email_anterior, db_user.email)
+    if revogar:
+        revogacao.registrar(db_user.id, db_user.versao_token)
+    return db_user
+
+
+@router.get("/cache")
+def metricas_cache_usuarios(current_user: Usuario = Depends(get_current_active_user)):
+    """Métricas do cache do usuário autenticado (consultas ao banco evitadas), da lista de revogação e do pool de senhas."""
+    return {**usuarios.metricas(), "revogacao": revogacao.metricas(), "senhas": senhas.metricas()}
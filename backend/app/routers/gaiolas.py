@@ -2,16 +2,18 @@ import io
 import uuid as _uuid
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db, get_db_leitura
 from app.models.gaiola import Gaiola, StatusGaiola
 from app.models.hospital import Hospital
 from app.schemas.gaiola import GaiolaCreate, GaiolaUpdate, GaiolaResponse
 from app.utils.dependencies import get_current_active_user
 from app.models.user import Usuario
 from app.services import notificacao_service
+from app.services.gaiola_resolver import resolvedor
+from app.utils.paginacao import paginar
 
 router = APIRouter(prefix="/api/v1/gaiolas", tags=["gaiolas"])
 
@@ -32,6 +34,11 @@ def _generate_qr_code(codigo: str) -> str:
         return None
 
 
+def _query_gaiolas(db: Session):
+    """Consulta de gaiolas com o hospital carregado no mesmo SELECT (evita N+1)."""
+    return db.query(Gaiola).options(joinedload(Gaiola.hospital))
+
+
 def _build_response(gaiola: Gaiola) -> dict:
     data = {
         "id": gaiola.id,
@@ -48,19 +55,21 @@ def _build_response(gaiola: Gaiola) -> dict:
 
 @router.get("/", response_model=List[GaiolaResponse])
 def list_gaiolas(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[StatusGaiola] = None,
     hospital_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    query = db.query(Gaiola)
+    query = _query_gaiolas(db)
     if status:
         query = query.filter(Gaiola.status == status)
     if hospital_id:
-        query = query.filter(Gaiola.hospital_id == hospital_id)
-    gaiolas = query.offset(skip).limit(limit).all()
+        query = query.filter(Gaiola.hospital_id == _uuid.UUID(hospital_id))
+    gaiolas = paginar(query, Gaiola.data_criacao, Gaiola.id, response, limit, cursor, skip)
     return [_build_response(g) for g in gaiolas]
 
 
@@ -81,16 +90,17 @@ def create_gaiola(
     db.add(db_gaiola)
     db.commit()
     db.refresh(db_gaiola)
+    resolvedor.invalidar(db_gaiola.codigo)
     return _build_response(db_gaiola)
 
 
 @router.get("/{gaiola_id}", response_model=GaiolaResponse)
 def get_gaiola(
     gaiola_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    gaiola = db.query(Gaiola).filter(Gaiola.id == _uuid.UUID(gaiola_id)).first()
+    gaiola = _query_gaiolas(db).filter(Gaiola.id == _uuid.UUID(gaiola_id)).first()
     if not gaiola:
         raise HTTPException(status_code=404, detail="Gaiola não encontrada")
     return _build_response(gaiola)
@@ -107,11 +117,13 @@ def update_gaiola(
     if not gaiola:
         raise HTTPException(status_code=404, detail="Gaiola não encontrada")
     status_anterior = gaiola.status.value
+    codigo_anterior = gaiola.codigo
     update_data = gaiola_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(gaiola, key, value)
     db.commit()
     db.refresh(gaiola)
+    resolvedor.invalidar(codigo_anterior, gaiola.codigo)
     if gaiola.status.value != status_anterior:
         notificacao_service.notificar_mudanca_status(
             gaiola_codigo=gaiola.codigo,
@@ -125,7 +137,7 @@ def update_gaiola(
 @router.get("/{gaiola_id}/qrcode")
 def get_qrcode(
     gaiola_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
     gaiola = db.query(Gaiola).filter(Gaiola.id == _uuid.UUID(gaiola_id)).first()
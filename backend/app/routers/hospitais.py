@@ -1,28 +1,34 @@
 from typing import List, Optional
 import uuid as _uuid
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_db_leitura
 from app.models.hospital import Hospital
+from app.models.webhook import WebhookHospital
 from app.schemas.hospital import HospitalCreate, HospitalUpdate, HospitalResponse
+from app.schemas.webhook import WebhookCreate, WebhookResponse
 from app.utils.dependencies import get_current_active_user
 from app.models.user import Usuario
+from app.utils.paginacao import paginar
+from app.services import webhook_service
 
 router = APIRouter(prefix="/api/v1/hospitais", tags=["hospitais"])
 
 
 @router.get("/", response_model=List[HospitalResponse])
 def list_hospitais(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     ativo: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
     query = db.query(Hospital)
     if ativo is not None:
         query = query.filter(Hospital.ativo == ativo)
-    return query.offset(skip).limit(limit).all()
+    return paginar(query, Hospital.created_at, Hospital.id, response, limit, cursor, skip)
 
 
 @router.post("/", response_model=HospitalResponse, status_code=201)
@@ -45,7 +51,7 @@ def create_hospital(
 @router.get("/{hospital_id}", response_model=HospitalResponse)
 def get_hospital(
     hospital_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
     hospital = db.query(Hospital).filter(Hospital.id == _uuid.UUID(hospital_id)).first()
@@ -84,3 +90,72 @@ def delete_hospital(
     hospital.ativo = False
     db.commit()
     return {"message": "Hospital desativado com sucesso"}
+
+
+def _get_hospital_or_404(db: Session, hospital_id: str) -> Hospital:
+    hospital = db.query(Hospital).filter(Hospital.id == _uuid.UUID(hospital_id)).first()
+    if not hospital:
+        raise HTTPException(status_code=404, detail="Hospital não encontrado")
+    return hospital
+
+
+@router.get("/{hospital_id}/webhooks", response_model=List[WebhookResponse])
+def list_webhooks(
+    hospital_id: str,
+    db: Session = Depends(get_db_leitura),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    hospital = _get_hospital_or_404(db, hospital_id)
+    return (
+        db.query(WebhookHospital)
+        .filter(WebhookHospital.hospital_id == hospital.id)
+        .order_by(WebhookHospital.created_at)
+        .all()
+    )
+
+
+@router.post("/{hospital_id}/webhooks", response_model=WebhookResponse, status_code=201)
+def create_webhook(
+    hospital_id: str,
+    webhook: WebhookCreate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Assina os eventos (``ENTREGUE``, ``DIVERGENCIA``) das gaiolas do hospital, entregues em lote na URL."""
+    if current_user.tipo_usuario.value != "admin":
+        raise HTTPException(status_code=403, detail="Apenas administradores podem cadastrar webhooks")
+    try:
+        webhook_service.validar_url(str(webhook.url))
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    hospital = _get_hospital_or_404(db, hospital_id)
+    db_webhook = WebhookHospital(
+        hospital_id=hospital.id,
+        url=str(webhook.url),
+        eventos=",".join(tipo.value for tipo in webhook.eventos),
+        segredo=webhook.segredo,
+        ativo=webhook.ativo,
+    )
+    db.add(db_webhook)
+    db.commit()
+    db.refresh(db_webhook)
+    return db_webhook
+
+
+@router.delete("/{hospital_id}/webhooks/{webhook_id}")
+def delete_webhook(
+    hospital_id: str,
+    webhook_id: str,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    webhook = db.query(WebhookHospital).filter(
+        WebhookHospital.id == _uuid.UUID(webhook_id),
+        WebhookHospital.hospital_id == _uuid.UUID(hospital_id),
+    ).first()
+    if not webhook:
+        raise HTTPException(status_code=404, detail="Webhook não encontrado")
+    db.delete(webhook)
+    db.commit()
+    webhook_service.entregador.remover(webhook.id)
+    return {"message": "Webhook removido com sucesso"}
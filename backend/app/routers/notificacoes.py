@@ -0,0 +1,88 @@
+from typing import List, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_db
+from app.models.gaiola import StatusGaiola
+from app.schemas.notificacao import NotificacaoResponse
+from app.utils.dependencies import get_current_active_user, get_stream_user
+from app.models.user import Usuario
+from app.services import eventos_service, notificacao_service, webhook_service
+
+router = APIRouter(prefix="/api/v1/notificacoes", tags=["notificacoes"])
+
+
+@router.get("/", response_model=List[NotificacaoResponse])
+def get_notificacoes(
+    response: Response,
+    limite: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    gaiola_codigo: Optional[str] = None,
+    status_novo: Optional[StatusGaiola] = None,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """
+    Retorna as notificações de mudança de status.
+
+    Sem ``since``, as mais recentes primeiro; com ``since``, em ordem
+    cronológica após o instante informado. Mais páginas via ``X-Next-Cursor``.
+    """
+    return notificacao_service.listar_notificacoes(
+        db,
+        response,
+        since=since,
+        gaiola_codigo=gaiola_codigo,
+        status_novo=status_novo.value if status_novo else None,
+        limite=limite,
+        cursor=cursor,
+    )
+
+
+@router.get("/stream")
+async def stream_notificacoes(
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_stream_user)
+):
+    """
+    Stream SSE das mudanças de status, para o dashboard não precisar fazer polling.
+
+    Ao reconectar, o navegador envia ``Last-Event-ID`` e recebe primeiro os
+    eventos perdidos (até ``SSE_REPLAY_MAX``), lidos do log persistente.
+    """
+    central = eventos_service.central
+    # Assina antes de consultar o log para não perder eventos entre a consulta e o stream
+    assinante = central.assinar()
+    pendentes = []
+    if last_event_id:
+        try:
+            pendentes = await run_in_threadpool(
+                notificacao_service.eventos_apos, db, last_event_id, settings.SSE_REPLAY_MAX
+            )
+        except Exception:
+            central.cancelar(assinante)
+            raise
+    return StreamingResponse(
+        eventos_service.stream_eventos(central, assinante, pendentes),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/despacho")
+def metricas_despacho(current_user: Usuario = Depends(get_current_active_user)):
+    """Métricas do despacho assíncrono e dos webhooks dos hospitais, e os lotes mais recentes na fila de mortos."""
+    despachante = notificacao_service.despachante
+    return {
+        **despachante.metricas(),
+        "ultimos_mortos": [
+            {**{k: v for k, v in morto.items() if k != "eventos"}, "eventos": len(morto["eventos"])}
+            for morto in list(despachante.mortos)[-20:]
+        ],
+        "webhooks_hospitais": webhook_service.entregador.metricas(),
+    }
@@ -1,18 +1,53 @@
+import concurrent.futures
+import math
+import queue
+from contextlib import contextmanager
 from typing import List, Optional
 import uuid as _uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db, get_db_ingestao, get_db_leitura
 from app.models.pesagem import Pesagem, TipoPesagem
 from app.models.gaiola import Gaiola, StatusGaiola
-from app.schemas.pesagem import PesagemCreate, PesagemBalanca, PesagemResponse
+from app.schemas.pesagem import (
+    PesagemCreate, PesagemBalanca, PesagemResponse, PesagemLoteResponse, PesagemAmostras, PesagemAmostrasResponse,
+)
 from app.utils.dependencies import get_current_active_user
 from app.models.user import Usuario
-from app.services import balanca_service, notificacao_service
+from app.services import (
+    admissao_service, balanca_service, balanca_tcp_service, estabilizacao_service, idempotencia_service, ingestao_service,
+    notificacao_service,
+)
+from app.services.gaiola_resolver import resolvedor
+from app.utils.paginacao import paginar
 
 router = APIRouter(prefix="/api/v1/pesagens", tags=["pesagens"])
 
+# Máximo de leituras aceitas por requisição em /balanca/lote
+LOTE_MAXIMO = 1000
+# Máximo de amostras brutas aceitas por requisição em /balanca/amostras
+AMOSTRAS_MAXIMO = 20000
+
+
+def _query_pesagens(db: Session):
+    """Consulta de pesagens com o código da gaiola carregado no mesmo SELECT (evita N+1)."""
+    return db.query(Pesagem).options(joinedload(Pesagem.gaiola).load_only(Gaiola.codigo))
+
+
+@contextmanager
+def _admissao(balanca_ids):
+    """Aplica o controle de admissão das balanças, respondendo 429/503 com Retry-After."""
+    try:
+        with admissao_service.controle.admitir(balanca_ids):
+            yield
+    except admissao_service.TaxaExcedida as exc:
+        raise HTTPException(status_code=429, detail=str(exc),
+                            headers={"Retry-After": str(max(1, math.ceil(exc.espera)))})
+    except admissao_service.CapacidadeEsgotada as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
 
 def _build_response(p: Pesagem) -> dict:
     return {
@@ -30,19 +65,22 @@ def _build_response(p: Pesagem) -> dict:
 
 @router.get("/", response_model=List[PesagemResponse])
 def list_pesagens(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     gaiola_id: Optional[str] = None,
     tipo: Optional[TipoPesagem] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    query = db.query(Pesagem)
+    query = _query_pesagens(db)
     if gaiola_id:
-        query = query.filter(Pesagem.gaiola_id == gaiola_id)
+        query = query.filter(Pesagem.gaiola_id == _uuid.UUID(gaiola_id))
     if tipo:
         query = query.filter(Pesagem.tipo_pesagem == tipo)
-    return [_build_response(p) for p in query.offset(skip).limit(limit).all()]
+    pesagens = paginar(query, Pesagem.timestamp, Pesagem.id, response, limit, cursor, skip)
+    return [_build_response(p) for p in pesagens]
 
 
 @router.post("/", response_model=PesagemResponse, status_code=201)
@@ -77,37 +115,204 @@ def create_pesagem(
 @router.post("/balanca", response_model=PesagemResponse, status_code=201)
 def pesagem_balanca(
     pesagem_data: PesagemBalanca,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_ingestao)
 ):
     """Endpoint para receber dados direto da balança."""
-    gaiola = db.query(Gaiola).filter(Gaiola.codigo == pesagem_data.gaiola_codigo).first()
-    if not gaiola:
+    with _admissao([pesagem_data.balanca_id]):
+        return _registrar_leitura(db, pesagem_data)
+
+
+def _registrar_leitura(db: Session, pesagem_data: PesagemBalanca) -> dict:
+    """Grava uma leitura da balança pelo buffer, se ativo, ou direto pelo cache de códigos."""
+    chave = idempotencia_service.chave_de(pesagem_data)
+    registro = idempotencia_service.janela.obter(chave) if chave else None
+    if registro is not None:
+        return _resposta_balanca(pesagem_data, registro)
+    buffer = ingestao_service.get_buffer()
+    if buffer is not None:
+        return _pesagem_balanca_buffer(buffer, pesagem_data)
+    ref = resolvedor.resolver(db, pesagem_data.gaiola_codigo)
+    if ref is None:
         raise HTTPException(status_code=404, detail=f"Gaiola '{pesagem_data.gaiola_codigo}' não encontrada")
-    status_anterior = gaiola.status.value
-    db_pesagem = balanca_service.registrar_pesagem(
-        db=db,
-        gaiola=gaiola,
-        tipo_pesagem=pesagem_data.tipo_pesagem,
-        peso=pesagem_data.peso,
-        balanca_id=pesagem_data.balanca_id,
-        timestamp=pesagem_data.timestamp,
+    timestamp = pesagem_data.timestamp or datetime.now(timezone.utc)
+    try:
+        pesagem_id, status_anterior, status_novo = balanca_service.registrar_pesagem_ref(
+            db=db,
+            gaiola_id=ref.id,
+            tipo_pesagem=pesagem_data.tipo_pesagem,
+            peso=pesagem_data.peso,
+            balanca_id=pesagem_data.balanca_id,
+            timestamp=timestamp,
+            chave_idempotencia=chave,
+        )
+    except IntegrityError:
+        # Reenvio de leitura gravada antes da janela atual (ex.: outro worker ou reinício)
+        db.rollback()
+        registro = idempotencia_service.buscar_no_banco(db, [chave]).get(chave) if chave else None
+        if registro is None:
+            raise
+        idempotencia_service.janela.guardar(chave, registro)
+        return _resposta_balanca(pesagem_data, registro)
+    registro = idempotencia_service.PesagemRegistrada(
+        pesagem_id, ref.id, ref.codigo, timestamp, pesagem_data.tipo_pesagem, pesagem_data.peso
     )
-    if gaiola.status.value != status_anterior:
+    if chave:
+        idempotencia_service.janela.guardar(chave, registro)
+    if status_novo is not None:
+        resolvedor.atualizar_status(ref.codigo, status_novo)
         notificacao_service.notificar_mudanca_status(
-            gaiola_codigo=gaiola.codigo,
-            status_anterior=status_anterior,
-            status_novo=gaiola.status.value,
+            gaiola_codigo=ref.codigo,
+            status_anterior=status_anterior.value,
+            status_novo=status_novo.value,
         )
-    return _build_response(db_pesagem)
+    return _resposta_balanca(pesagem_data, registro)
+
+
+def _resposta_balanca(pesagem_data: PesagemBalanca, registro: idempotencia_service.PesagemRegistrada) -> dict:
+    # Monta a resposta com os dados já conhecidos, sem recarregar a pesagem após o commit;
+    # num reenvio, tudo vem da pesagem original
+    return {
+        "id": registro.pesagem_id,
+        "gaiola_id": registro.gaiola_id,
+        "tipo_pesagem": registro.tipo_pesagem,
+        "peso": registro.peso,
+        "balanca_id": pesagem_data.balanca_id,
+        "timestamp": registro.timestamp,
+        "usuario_id": None,
+        "observacoes": None,
+        "gaiola_codigo": registro.gaiola_codigo,
+    }
+
+
+def _pesagem_balanca_buffer(buffer: ingestao_service.BufferPesagens, pesagem_data: PesagemBalanca) -> dict:
+    """
+    Grava a leitura pelo buffer de group commit e responde após o commit do lote.
+
+    Fila cheia ou falha do lote respondem 503 e a falta de confirmação a tempo
+    responde 504, sempre com Retry-After: reenviar a leitura com a mesma
+    ``chave_idempotencia`` (ou ``timestamp``) é seguro.
+    """
+    try:
+        r = buffer.registrar(pesagem_data)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Fila de pesagens cheia, tente novamente",
+                            headers={"Retry-After": "1"})
+    except concurrent.futures.TimeoutError:
+        raise HTTPException(status_code=504, detail="Gravação da leitura não confirmada a tempo, reenvie a leitura",
+                            headers={"Retry-After": "1"})
+    except Exception:
+        # A falha já foi registrada no log pelo buffer
+        raise HTTPException(status_code=503, detail="Falha ao gravar a leitura, reenvie a leitura",
+                            headers={"Retry-After": "1"})
+    if r["erro"]:
+        raise HTTPException(status_code=404, detail=r["erro"])
+    if r["status_novo"] != r["status_anterior"]:
+        notificacao_service.notificar_mudanca_status(
+            gaiola_codigo=r["gaiola_codigo"],
+            status_anterior=r["status_anterior"],
+            status_novo=r["status_novo"],
+        )
+    registro = idempotencia_service.PesagemRegistrada(
+        r["pesagem_id"], r["gaiola_id"], r["gaiola_codigo"], r["timestamp"], r["tipo_pesagem"], r["peso"]
+    )
+    return _resposta_balanca(pesagem_data, registro)
+
+
+@router.post("/balanca/lote", response_model=PesagemLoteResponse)
+def pesagem_balanca_lote(
+    leituras: List[PesagemBalanca],
+    db: Session = Depends(get_db_ingestao)
+):
+    """
+    Recebe várias leituras da balança de uma vez (ex.: buffer reenviado após queda de rede).
+
+    Todas as leituras válidas são gravadas em uma única transação; leituras de
+    gaiolas inexistentes são reportadas item a item sem bloquear as demais.
+    """
+    if len(leituras) > LOTE_MAXIMO:
+        raise HTTPException(status_code=413, detail=f"Lote excede o máximo de {LOTE_MAXIMO} leituras")
+    with _admissao(leitura.balanca_id for leitura in leituras):
+        resultados = balanca_service.registrar_pesagens_lote(db, leituras)
+    itens = []
+    for r in resultados:
+        if r["erro"] is None and r["status_novo"] != r["status_anterior"]:
+            notificacao_service.notificar_mudanca_status(
+                gaiola_codigo=r["gaiola_codigo"],
+                status_anterior=r["status_anterior"],
+                status_novo=r["status_novo"],
+            )
+        itens.append({
+            "indice": r["indice"],
+            "gaiola_codigo": r["gaiola_codigo"],
+            "pesagem_id": r["pesagem_id"],
+            "status_gaiola": r["status_novo"],
+            "duplicada": r["duplicada"],
+            "erro": r["erro"],
+        })
+    erros = sum(1 for r in resultados if r["erro"])
+    return {
+        "total": len(resultados),
+        "registradas": len(resultados) - erros,
+        "erros": erros,
+        "itens": itens,
+    }
+
+
+@router.post("/balanca/amostras", response_model=PesagemAmostrasResponse)
+def pesagem_balanca_amostras(
+    dados: PesagemAmostras,
+    db: Session = Depends(get_db_ingestao)
+):
+    """
+    Recebe amostras brutas de uma balança e grava uma pesagem quando o peso estabiliza.
+
+    O detector de cada ``balanca_id`` mantém o estado entre requisições, então
+    o fluxo pode ser enviado em lotes pequenos; normalmente a resposta não traz
+    pesagem nenhuma, e traz uma quando a leitura acomoda.
+    """
+    if len(dados.amostras) > AMOSTRAS_MAXIMO:
+        raise HTTPException(status_code=413, detail=f"Lote excede o máximo de {AMOSTRAS_MAXIMO} amostras")
+    with _admissao([dados.balanca_id]):
+        if resolvedor.resolver(db, dados.gaiola_codigo) is None:
+            raise HTTPException(status_code=404, detail=f"Gaiola '{dados.gaiola_codigo}' não encontrada")
+        pesos = estabilizacao_service.gestor.processar(
+            dados.balanca_id, (dados.gaiola_codigo, dados.tipo_pesagem), dados.amostras
+        )
+        pesagens = [
+            _registrar_leitura(db, PesagemBalanca(
+                gaiola_codigo=dados.gaiola_codigo,
+                peso=peso,
+                tipo_pesagem=dados.tipo_pesagem,
+                balanca_id=dados.balanca_id,
+            ))
+            for peso in pesos
+        ]
+    return {"amostras": len(dados.amostras), "pesagens": pesagens}
+
+
+@router.get("/balanca/metricas")
+def metricas_balanca(current_user: Usuario = Depends(get_current_active_user)):
+    """Métricas do buffer de gravação em lote, do cache de códigos, da estabilização e do listener TCP."""
+    buffer = ingestao_service.get_buffer()
+    servidor = balanca_tcp_service.get_servidor()
+    return {
+        "buffer_ativo": buffer is not None,
+        **(buffer.metricas() if buffer else {}),
+        "resolvedor_gaiolas": resolvedor.metricas(),
+        "estabilizacao": estabilizacao_service.gestor.metricas(),
+        "tcp": servidor.metricas() if servidor else None,
+        "deduplicacao": idempotencia_service.janela.metricas(),
+        "admissao": admissao_service.controle.metricas(),
+    }
 
 
 @router.get("/{pesagem_id}", response_model=PesagemResponse)
 def get_pesagem(
     pesagem_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    p = db.query(Pesagem).filter(Pesagem.id == _uuid.UUID(pesagem_id)).first()
+    p = _query_pesagens(db).filter(Pesagem.id == _uuid.UUID(pesagem_id)).first()
     if not p:
         raise HTTPException(status_code=404, detail="Pesagem não encontrada")
     return _build_response(p)
@@ -1,14 +1,16 @@
 from typing import List, Optional
 import uuid as _uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db, get_db_leitura
 from app.models.processo import Processo, EtapaProcesso
 from app.models.gaiola import Gaiola, StatusGaiola
 from app.schemas.processo import ProcessoCreate, ProcessoUpdate, ProcessoResponse
 from app.utils.dependencies import get_current_active_user
 from app.models.user import Usuario
+from app.utils.paginacao import paginar
+from app.services.gaiola_resolver import resolvedor
 
 router = APIRouter(prefix="/api/v1/processos", tags=["processos"])
 
@@ -20,18 +22,40 @@ ETAPA_STATUS_MAP = {
 }
 
 
+def _query_processos(db: Session):
+    """Consulta de processos com o código da gaiola carregado no mesmo SELECT (evita N+1)."""
+    return db.query(Processo).options(joinedload(Processo.gaiola).load_only(Gaiola.codigo))
+
+
+def _build_response(p: Processo) -> dict:
+    return {
+        "id": p.id,
+        "gaiola_id": p.gaiola_id,
+        "etapa": p.etapa,
+        "maquina_id": p.maquina_id,
+        "observacoes": p.observacoes,
+        "data_inicio": p.data_inicio,
+        "data_fim": p.data_fim,
+        "usuario_id": p.usuario_id,
+        "gaiola_codigo": p.gaiola.codigo if p.gaiola else None,
+    }
+
+
 @router.get("/", response_model=List[ProcessoResponse])
 def list_processos(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     gaiola_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    query = db.query(Processo)
+    query = _query_processos(db)
     if gaiola_id:
-        query = query.filter(Processo.gaiola_id == gaiola_id)
-    return query.offset(skip).limit(limit).all()
+        query = query.filter(Processo.gaiola_id == _uuid.UUID(gaiola_id))
+    processos = paginar(query, Processo.data_inicio, Processo.id, response, limit, cursor, skip)
+    return [_build_response(p) for p in processos]
 
 
 @router.post("/", response_model=ProcessoResponse, status_code=201)
@@ -55,8 +79,11 @@ def create_processo(
     if new_status:
         gaiola.status = new_status
     db.commit()
+    if new_status:
+        # Só depois do commit: um rollback não pode deixar no cache um status que não foi gravado
+        resolvedor.atualizar_status(gaiola.codigo, new_status)
     db.refresh(db_processo)
-    return db_processo
+    return _build_response(db_processo)
 
 
 @router.put("/{processo_id}", response_model=ProcessoResponse)
@@ -66,7 +93,7 @@ def update_processo(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    processo = db.query(Processo).filter(Processo.id == _uuid.UUID(processo_id)).first()
+    processo = _query_processos(db).filter(Processo.id == _uuid.UUID(processo_id)).first()
     if not processo:
         raise HTTPException(status_code=404, detail="Processo não encontrado")
     update_data = update.model_dump(exclude_unset=True)
@@ -76,16 +103,16 @@ def update_processo(
         processo.data_fim = datetime.now(timezone.utc)
     db.commit()
     db.refresh(processo)
-    return processo
+    return _build_response(processo)
 
 
 @router.get("/{processo_id}", response_model=ProcessoResponse)
 def get_processo(
     processo_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    p = db.query(Processo).filter(Processo.id == _uuid.UUID(processo_id)).first()
+    p = _query_processos(db).filter(Processo.id == _uuid.UUID(processo_id)).first()
     if not p:
         raise HTTPException(status_code=404, detail="Processo não encontrado")
-    return p
+    return _build_response(p)
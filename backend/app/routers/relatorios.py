@@ -1,9 +1,9 @@
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db_relatorios
 from app.utils.dependencies import get_current_active_user
 from app.models.user import Usuario
 from app.services import relatorio_service
@@ -11,17 +11,25 @@ from app.services import relatorio_service
 router = APIRouter(prefix="/api/v1/relatorios", tags=["relatorios"])
 
 
+def _fechar_sessao_ao_final(db: Session, chunks):
+    """Mantém a sessão aberta enquanto a resposta é transmitida e a fecha no final."""
+    try:
+        yield from chunks
+    finally:
+        db.close()
+
+
 @router.get("/expedicao/excel")
 def relatorio_expedicao_excel(
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_relatorios),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    buf = relatorio_service.relatorio_expedicao_excel(db, hospital_id, data_inicio, data_fim)
+    chunks = relatorio_service.relatorio_expedicao_excel(db, hospital_id, data_inicio, data_fim)
     return StreamingResponse(
-        buf,
+        chunks,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": "attachment; filename=relatorio_expedicao.xlsx"}
     )
@@ -32,12 +40,12 @@ def relatorio_expedicao_csv(
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_relatorios),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    buf = relatorio_service.relatorio_expedicao_csv(db, hospital_id, data_inicio, data_fim)
+    chunks = relatorio_service.relatorio_expedicao_csv(db, hospital_id, data_inicio, data_fim)
     return StreamingResponse(
-        buf,
+        _fechar_sessao_ao_final(db, chunks),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=relatorio_expedicao.csv"}
     )
@@ -46,17 +54,26 @@ def relatorio_expedicao_csv(
 @router.get("/divergencias")
 def relatorio_divergencias(
     limite_percentual: float = Query(5.0),
-    db: Session = Depends(get_db),
+    hospital_id: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    ordem: Literal["asc", "desc"] = Query("desc"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db_relatorios),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    return relatorio_service.relatorio_divergencias(db, limite_percentual)
+    return relatorio_service.relatorio_divergencias(
+        db, limite_percentual, hospital_id, data_inicio, data_fim, ordem, skip, limit
+    )
 
 
 @router.get("/produtividade")
 def relatorio_produtividade(
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
-    db: Session = Depends(get_db),
+    group_by: Optional[Literal["hospital", "day", "maquina"]] = Query(None),
+    db: Session = Depends(get_db_relatorios),
     current_user: Usuario = Depends(get_current_active_user)
 ):
     """
@@ -64,6 +81,7 @@ def relatorio_produtividade(
 
     Retorna contagens de gaiolas por status, peso total expedido
     e tempo médio (em minutos) de cada etapa de processamento.
+    Com ``group_by``, inclui a quebra por hospital, dia ou máquina.
     """
-    return relatorio_service.relatorio_produtividade(db, data_inicio, data_fim)
+    return relatorio_service.relatorio_produtividade(db, data_inicio, data_fim, group_by)
 
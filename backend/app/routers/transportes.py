@@ -1,18 +1,25 @@
 from typing import List, Optional
 import uuid as _uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db, get_db_leitura
 from app.models.transporte import Transporte, TipoTransporte, StatusTransporte
 from app.models.gaiola import Gaiola, StatusGaiola
 from app.schemas.transporte import TransporteCreate, TransporteUpdate, TransporteResponse
 from app.utils.dependencies import get_current_active_user
 from app.models.user import Usuario
+from app.utils.paginacao import paginar
+from app.services.gaiola_resolver import resolvedor
 
 router = APIRouter(prefix="/api/v1/transportes", tags=["transportes"])
 
 
+def _query_transportes(db: Session):
+    """Consulta de transportes com o código da gaiola carregado no mesmo SELECT (evita N+1)."""
+    return db.query(Transporte).options(joinedload(Transporte.gaiola).load_only(Gaiola.codigo))
+
+
 def _build_response(t: Transporte) -> dict:
     return {
         "id": t.id,
@@ -29,12 +36,17 @@ def _build_response(t: Transporte) -> dict:
 
 @router.get("/", response_model=List[TransporteResponse])
 def list_transportes(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    return [_build_response(t) for t in db.query(Transporte).offset(skip).limit(limit).all()]
+    transportes = paginar(
+        _query_transportes(db), Transporte.data_saida, Transporte.id, response, limit, cursor, skip
+    )
+    return [_build_response(t) for t in transportes]
 
 
 @router.post("/", response_model=TransporteResponse, status_code=201)
@@ -53,6 +65,7 @@ def create_transporte(
     elif transporte.tipo == TipoTransporte.VOLTA:
         gaiola.status = StatusGaiola.EM_TRANSPORTE_VOLTA
     db.commit()
+    resolvedor.atualizar_status(gaiola.codigo, gaiola.status)
     db.refresh(db_transporte)
     return _build_response(db_transporte)
 
@@ -70,12 +83,15 @@ def update_transporte(
     update_data = update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(transporte, key, value)
-    if update.status == StatusTransporte.ENTREGUE and transporte.gaiola:
+    entregue = update.status == StatusTransporte.ENTREGUE and transporte.gaiola is not None
+    if entregue:
         if transporte.tipo == TipoTransporte.VOLTA:
             transporte.gaiola.status = StatusGaiola.ENTREGUE
         if not transporte.data_chegada:
             transporte.data_chegada = datetime.now(timezone.utc)
     db.commit()
+    if entregue and transporte.tipo == TipoTransporte.VOLTA:
+        resolvedor.atualizar_status(transporte.gaiola.codigo, StatusGaiola.ENTREGUE)
     db.refresh(transporte)
     return _build_response(transporte)
 
@@ -83,10 +99,10 @@ def update_transporte(
 @router.get("/{transporte_id}", response_model=TransporteResponse)
 def get_transporte(
     transporte_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    t = db.query(Transporte).filter(Transporte.id == _uuid.UUID(transporte_id)).first()
+    t = _query_transportes(db).filter(Transporte.id == _uuid.UUID(transporte_id)).first()
     if not t:
         raise HTTPException(status_code=404, detail="Transporte não encontrado")
     return _build_response(t)
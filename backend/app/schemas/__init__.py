@@ -1,6 +1,8 @@
 from app.schemas.user import UsuarioBase, UsuarioCreate, UsuarioUpdate, UsuarioResponse, Token, TokenData, LoginRequest  # noqa: F401
 from app.schemas.hospital import HospitalBase, HospitalCreate, HospitalUpdate, HospitalResponse  # noqa: F401
 from app.schemas.gaiola import GaiolaBase, GaiolaCreate, GaiolaUpdate, GaiolaResponse  # noqa: F401
-from app.schemas.pesagem import PesagemBase, PesagemCreate, PesagemBalanca, PesagemResponse  # noqa: F401
+from app.schemas.pesagem import PesagemBase, PesagemCreate, PesagemBalanca, PesagemResponse, PesagemLoteItem, PesagemLoteResponse, PesagemAmostras, PesagemAmostrasResponse  # noqa: F401
 from app.schemas.transporte import TransporteBase, TransporteCreate, TransporteUpdate, TransporteResponse  # noqa: F401
 from app.schemas.processo import ProcessoBase, ProcessoCreate, ProcessoUpdate, ProcessoResponse  # noqa: F401
+from app.schemas.notificacao import NotificacaoResponse  # noqa: F401
+from app.schemas.webhook import WebhookBase, WebhookCreate, WebhookResponse  # noqa: F401
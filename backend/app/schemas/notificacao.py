@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+import uuid
+
+
+class NotificacaoResponse(BaseModel):
+    id: uuid.UUID
+    timestamp: datetime
+    gaiola_codigo: str
+    status_anterior: Optional[str] = None
+    status_novo: str
+    usuario: Optional[str] = None
+    observacoes: Optional[str] = None
+
+    model_config = {"from_attributes": True}
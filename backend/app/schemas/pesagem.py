@@ -1,15 +1,20 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
 from datetime import datetime
 import uuid
 from app.models.pesagem import TipoPesagem
 
+# Tamanhos das colunas ``pesagens.balanca_id`` e ``gaiolas.codigo``; a chave de
+# idempotência derivada (balanca_id + chave ou código + timestamp) cabe nos 400 da coluna
+BALANCA_ID_MAX = 100
+GAIOLA_CODIGO_MAX = 100
+
 
 class PesagemBase(BaseModel):
     gaiola_id: uuid.UUID
     tipo_pesagem: TipoPesagem
     peso: float
-    balanca_id: Optional[str] = None
+    balanca_id: Optional[str] = Field(default=None, max_length=BALANCA_ID_MAX)
     observacoes: Optional[str] = None
 
 
@@ -19,11 +24,22 @@ class PesagemCreate(PesagemBase):
 
 class PesagemBalanca(BaseModel):
     """Schema para receber dados direto da balança via API"""
-    gaiola_codigo: str
+    gaiola_codigo: str = Field(max_length=GAIOLA_CODIGO_MAX)
     peso: float
     tipo_pesagem: TipoPesagem
-    balanca_id: str
+    balanca_id: str = Field(max_length=BALANCA_ID_MAX)
     timestamp: Optional[datetime] = None
+    # Sem chave, reenvios com o mesmo timestamp são identificados por balança + gaiola + timestamp
+    chave_idempotencia: Optional[str] = Field(default=None, max_length=255)
+
+
+class PesagemAmostras(BaseModel):
+    """Lote de amostras brutas de uma balança que não estabiliza o peso sozinha"""
+    balanca_id: str = Field(max_length=BALANCA_ID_MAX)
+    gaiola_codigo: str = Field(max_length=GAIOLA_CODIGO_MAX)
+    tipo_pesagem: TipoPesagem
+    # Pares (t, peso): t em segundos no relógio da balança, em ordem crescente
+    amostras: List[Tuple[float, float]]
 
 
 class PesagemResponse(PesagemBase):
@@ -33,3 +49,25 @@ class PesagemResponse(PesagemBase):
     gaiola_codigo: Optional[str] = None
 
     model_config = {"from_attributes": True}
+
+
+class PesagemLoteItem(BaseModel):
+    """Resultado de uma leitura enviada em lote pela balança"""
+    indice: int
+    gaiola_codigo: str
+    pesagem_id: Optional[uuid.UUID] = None
+    status_gaiola: Optional[str] = None
+    duplicada: bool = False
+    erro: Optional[str] = None
+
+
+class PesagemLoteResponse(BaseModel):
+    total: int
+    registradas: int
+    erros: int
+    itens: List[PesagemLoteItem]
+
+
+class PesagemAmostrasResponse(BaseModel):
+    amostras: int
+    pesagens: List[PesagemResponse]
@@ -27,5 +27,6 @@ class ProcessoResponse(ProcessoBase):
     data_inicio: datetime
     data_fim: Optional[datetime] = None
     usuario_id: Optional[uuid.UUID] = None
+    gaiola_codigo: Optional[str] = None
 
     model_config = {"from_attributes": True}
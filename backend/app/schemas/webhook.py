@@ -0,0 +1,30 @@
+from pydantic import AnyHttpUrl, BaseModel, field_validator
+from typing import List, Optional
+from datetime import datetime
+import uuid
+from app.models.webhook import TipoEventoWebhook
+
+
+class WebhookBase(BaseModel):
+    url: AnyHttpUrl
+    eventos: List[TipoEventoWebhook] = [TipoEventoWebhook.ENTREGUE, TipoEventoWebhook.DIVERGENCIA]
+    ativo: bool = True
+
+    @field_validator("eventos", mode="before")
+    @classmethod
+    def _separar_eventos(cls, value):
+        # No banco os tipos ficam em uma coluna, separados por vírgula
+        return value.split(",") if isinstance(value, str) else value
+
+
+class WebhookCreate(WebhookBase):
+    # Se informado, cada entrega leva ``X-Webhook-Assinatura: sha256=<hmac do corpo>``
+    segredo: Optional[str] = None
+
+
+class WebhookResponse(WebhookBase):
+    id: uuid.UUID
+    hospital_id: uuid.UUID
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
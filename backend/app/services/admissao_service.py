@@ -0,0 +1,140 @@
+"""
+Controle de admissão das leituras da balança.
+
+Protege o banco (e as telas dos operadores, que usam o mesmo pool) de uma
+balança com firmware defeituoso ou de picos de reenvio:
+- Balde de tokens por ``balanca_id``: ``PESAGEM_TAXA_POR_BALANCA`` requisições
+  por segundo, com rajada de até ``PESAGEM_RAJADA_POR_BALANCA``
+- Limite global de requisições de ingestão em andamento
+  (``PESAGEM_CONCORRENCIA_MAX``), que deve ficar abaixo do tamanho do pool.
+  Com o buffer de group commit (``PESAGEM_BUFFER_ATIVO``) as requisições
+  aguardam o lote sem ocupar conexão, então o limite sobe para
+  ``PESAGEM_BUFFER_LOTE_MAX``; do contrário nenhum lote passaria de
+  ``PESAGEM_CONCORRENCIA_MAX`` leituras
+
+A vaga é ocupada antes de retirar o token: uma requisição recusada por
+capacidade (503) não gasta a taxa da balança.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from app.config import settings
+
+# Máximo de baldes mantidos; os de balanças inativas há mais tempo são descartados
+BALDES_MAX = 10000
+
+
+class TaxaExcedida(Exception):
+    def __init__(self, balanca_id: str, espera: float):
+        super().__init__(f"Taxa de leituras excedida para a balança '{balanca_id}'")
+        self.balanca_id = balanca_id
+        self.espera = espera
+
+
+class CapacidadeEsgotada(Exception):
+    pass
+
+
+def concorrencia_padrao() -> int:
+    if settings.PESAGEM_BUFFER_ATIVO and settings.PESAGEM_CONCORRENCIA_MAX > 0:
+        return max(settings.PESAGEM_CONCORRENCIA_MAX, settings.PESAGEM_BUFFER_LOTE_MAX)
+    return settings.PESAGEM_CONCORRENCIA_MAX
+
+
+class ControleAdmissao:
+    def __init__(
+        self,
+        taxa: float = settings.PESAGEM_TAXA_POR_BALANCA,
+        rajada: int = settings.PESAGEM_RAJADA_POR_BALANCA,
+        concorrencia_max: int | None = None,
+        espera_ms: int = settings.PESAGEM_CONCORRENCIA_ESPERA_MS,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        if concorrencia_max is None:
+            concorrencia_max = concorrencia_padrao()
+        self.taxa = taxa
+        self.rajada = rajada
+        self.concorrencia_max = concorrencia_max
+        self.espera = espera_ms / 1000.0
+        self._relogio = relogio
+        self._baldes: OrderedDict[str, list[float]] = OrderedDict()  # balanca_id → [tokens, instante]
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(concorrencia_max) if concorrencia_max > 0 else None
+        self._metricas = {"admitidas": 0, "rejeitadas_taxa": 0, "rejeitadas_concorrencia": 0, "em_andamento": 0}
+
+    def consumir(self, balanca_ids: Iterable[str]) -> None:
+        """
+        Retira um token do balde de cada balança. Levanta ``TaxaExcedida`` com o
+        tempo de espera sugerido se algum balde estiver vazio (sem consumir nenhum).
+        """
+        if self.taxa <= 0:
+            return
+        with self._lock:
+            agora = self._relogio()
+            baldes = []
+            for balanca_id in dict.fromkeys(balanca_ids):
+                balde = self._baldes.get(balanca_id)
+                if balde is None:
+                    balde = self._baldes[balanca_id] = [float(self.rajada), agora]
+                    if len(self._baldes) > BALDES_MAX:
+                        self._baldes.popitem(last=False)
+                else:
+                    self._baldes.move_to_end(balanca_id)
+                    balde[0] = min(self.rajada, balde[0] + (agora - balde[1]) * self.taxa)
+                    balde[1] = agora
+                if balde[0] < 1:
+                    self._metricas["rejeitadas_taxa"] += 1
+                    raise TaxaExcedida(balanca_id, (1 - balde[0]) / self.taxa)
+                baldes.append(balde)
+            for balde in baldes:
+                balde[0] -= 1
+
+    @contextmanager
+    def vaga(self):
+        """Ocupa uma das vagas de ingestão; levanta ``CapacidadeEsgotada`` se não liberar a tempo."""
+        self._ocupar()
+        try:
+            with self._lock:
+                self._metricas["admitidas"] += 1
+            yield
+        finally:
+            self._liberar()
+
+    @contextmanager
+    def admitir(self, balanca_ids: Iterable[str]):
+        self._ocupar()
+        try:
+            self.consumir(balanca_ids)
+            with self._lock:
+                self._metricas["admitidas"] += 1
+            yield
+        finally:
+            self._liberar()
+
+    def _ocupar(self) -> None:
+        if self._vagas is not None and not self._vagas.acquire(timeout=self.espera):
+            with self._lock:
+                self._metricas["rejeitadas_concorrencia"] += 1
+            raise CapacidadeEsgotada("Capacidade de ingestão esgotada")
+        with self._lock:
+            self._metricas["em_andamento"] += 1
+
+    def _liberar(self) -> None:
+        with self._lock:
+            self._metricas["em_andamento"] -= 1
+        if self._vagas is not None:
+            self._vagas.release()
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._baldes.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {**self._metricas, "balancas": len(self._baldes), "concorrencia_max": self.concorrencia_max}
+
+
+controle = ControleAdmissao()
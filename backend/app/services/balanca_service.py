@@ -5,12 +5,23 @@ Centraliza a lógica de:
 - Registrar pesagens recebidas via API REST da balança
 - Atualizar o status da gaiola de acordo com o tipo de pesagem
 - Calcular e registrar divergências automáticas
+- Manter o resumo de pesos por gaiola (última pesagem de cada tipo)
+- Registrar lotes de leituras da balança em uma única transação
+- Registrar leituras a partir da referência em cache da gaiola, sem buscá-la pelo código
+- Descartar reenvios da mesma leitura pela chave de idempotência
 """
+import uuid
 from datetime import datetime, timezone
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.models.gaiola import Gaiola, StatusGaiola
 from app.models.pesagem import Pesagem, TipoPesagem
+from app.models.resumo_pesagem import ResumoPesagem
+from app.services import idempotencia_service
+from app.services.gaiola_resolver import resolvedor
 
 # Mapeamento: tipo de pesagem → novo status da gaiola
 PESAGEM_STATUS_MAP: dict[TipoPesagem, StatusGaiola] = {
@@ -19,9 +30,24 @@ PESAGEM_STATUS_MAP: dict[TipoPesagem, StatusGaiola] = {
     TipoPesagem.EXPEDICAO: StatusGaiola.PRONTA_EXPEDICAO,
 }
 
+# INSERT ... ON CONFLICT DO NOTHING por dialeto, para criar resumos sem disputa
+_INSERT_SEM_CONFLITO = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 # Limite padrão de divergência (%) para emitir alerta
 LIMITE_DIVERGENCIA_PADRAO = 5.0
 
+# Mapeamento: tipo de pesagem → colunas (peso, timestamp) em ResumoPesagem
+RESUMO_CAMPOS: dict[TipoPesagem, tuple[str, str]] = {
+    TipoPesagem.SAIDA_HOSPITAL: ("peso_saida", "timestamp_saida"),
+    TipoPesagem.RECEBIMENTO_LAVANDERIA: ("peso_recebimento", "timestamp_recebimento"),
+    TipoPesagem.EXPEDICAO: ("peso_expedicao", "timestamp_expedicao"),
+}
+
+
+def _utc(dt: datetime) -> datetime:
+    # SQLite devolve datetimes sem fuso; tratamos como UTC para comparar.
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
 
 def registrar_pesagem(
     db: Session,
@@ -46,15 +72,250 @@ def registrar_pesagem(
     )
     db.add(pesagem)
 
+    atualizar_resumo(db, pesagem)
+
     novo_status = PESAGEM_STATUS_MAP.get(tipo_pesagem)
     if novo_status:
         gaiola.status = novo_status
 
     db.commit()
+    if novo_status:
+        # Só depois do commit: um rollback não pode deixar no cache um status que não foi gravado
+        resolvedor.atualizar_status(gaiola.codigo, novo_status)
     db.refresh(pesagem)
     return pesagem
 
 
+def registrar_pesagem_ref(
+    db: Session,
+    gaiola_id,
+    tipo_pesagem: TipoPesagem,
+    peso: float,
+    balanca_id: str | None = None,
+    timestamp: datetime | None = None,
+    chave_idempotencia: str | None = None,
+) -> tuple[uuid.UUID, StatusGaiola | None, StatusGaiola | None]:
+    """
+    Persiste uma pesagem a partir do id da gaiola, sem carregar a gaiola.
+
+    Só o status da gaiola é relido, com ``SELECT ... FOR UPDATE`` na mesma
+    transação, para que o status anterior seja o do banco e não o do cache.
+    O retorno é ``(pesagem_id, status_anterior, status_novo)`` quando o status
+    mudou, ou ``(pesagem_id, None, None)`` quando a gaiola já estava no status
+    de destino. Uma ``chave_idempotencia`` já gravada faz o commit levantar
+    ``IntegrityError``.
+    """
+    pesagem = Pesagem(
+        id=uuid.uuid4(),
+        gaiola_id=gaiola_id,
+        tipo_pesagem=tipo_pesagem,
+        peso=peso,
+        balanca_id=balanca_id,
+        timestamp=timestamp or datetime.now(timezone.utc),
+        chave_idempotencia=chave_idempotencia,
+    )
+    db.add(pesagem)
+    atualizar_resumo(db, pesagem)
+
+    status_anterior = status_novo = None
+    novo_status = PESAGEM_STATUS_MAP.get(tipo_pesagem)
+    if novo_status:
+        atual = db.execute(
+            select(Gaiola.status).where(Gaiola.id == gaiola_id).with_for_update()
+        ).scalar_one()
+        if atual != novo_status:
+            db.execute(
+                update(Gaiola)
+                .where(Gaiola.id == gaiola_id)
+                .values(status=novo_status)
+                .execution_options(synchronize_session=False)
+            )
+            status_anterior, status_novo = atual, novo_status
+
+    pesagem_id = pesagem.id
+    db.commit()
+    return pesagem_id, status_anterior, status_novo
+
+
+def atualizar_resumo(db: Session, pesagem: Pesagem) -> ResumoPesagem:
+    """
+    Aplica a pesagem ao resumo da gaiola, na mesma transação da pesagem.
+
+    Só substitui o peso do tipo se a pesagem for a mais recente daquele tipo,
+    de modo que leituras reenviadas fora de ordem não sobrescrevem valores novos.
+    """
+    garantir_resumos(db, [pesagem.gaiola_id])
+    resumo = db.get(ResumoPesagem, pesagem.gaiola_id, with_for_update=True)
+    _aplicar_no_resumo(resumo, pesagem)
+    return resumo
+
+
+def garantir_resumos(db: Session, gaiola_ids: list) -> None:
+    """
+    Cria as linhas de resumo que ainda não existem, antes do ``SELECT ... FOR UPDATE``.
+
+    Com ``ON CONFLICT DO NOTHING`` duas pesagens simultâneas da mesma gaiola
+    nova não disputam o INSERT: a segunda espera a primeira e segue para o lock.
+    """
+    if not gaiola_ids:
+        return
+    insert = _INSERT_SEM_CONFLITO[db.get_bind().dialect.name]
+    db.execute(
+        insert(ResumoPesagem)
+        .values([{"gaiola_id": gaiola_id} for gaiola_id in sorted(set(gaiola_ids))])
+        .on_conflict_do_nothing(index_elements=[ResumoPesagem.gaiola_id])
+    )
+
+
+def _aplicar_no_resumo(resumo: ResumoPesagem, pesagem: Pesagem) -> None:
+    campo_peso, campo_timestamp = RESUMO_CAMPOS[pesagem.tipo_pesagem]
+    ultimo = getattr(resumo, campo_timestamp)
+    if ultimo is None or _utc(pesagem.timestamp) >= _utc(ultimo):
+        setattr(resumo, campo_peso, pesagem.peso)
+        setattr(resumo, campo_timestamp, pesagem.timestamp)
+        resumo.divergencia = divergencia_percentual(resumo.peso_saida, resumo.peso_expedicao)
+
+
+def registrar_pesagens_lote(db: Session, leituras: list) -> list[dict]:
+    """
+    Registra um lote de leituras da balança em uma única transação.
+
+    Cada leitura tem ``gaiola_codigo``, ``peso``, ``tipo_pesagem``,
+    ``balanca_id`` e ``timestamp`` (como ``PesagemBalanca``). Todas as
+    gaiolas e resumos são resolvidos com uma consulta cada, as pesagens
+    são inseridas em lote e as transições de ``PESAGEM_STATUS_MAP`` são
+    aplicadas na ordem recebida, como se as leituras chegassem uma a uma.
+
+    Retorna um resultado por leitura, na mesma ordem. Leituras de gaiolas
+    inexistentes voltam com ``erro`` e não impedem as demais. Reenvios de
+    leituras já gravadas (mesma chave de idempotência, no lote ou antes dele)
+    voltam com ``duplicada`` e a pesagem original, sem nova gravação.
+    """
+    try:
+        return _registrar_pesagens_lote(db, leituras)
+    except IntegrityError:
+        # Outra transação gravou uma das chaves entre a verificação e o commit;
+        # na segunda tentativa a consulta de chaves já encontra a pesagem.
+        db.rollback()
+        return _registrar_pesagens_lote(db, leituras)
+
+
+def _registrar_pesagens_lote(db: Session, leituras: list) -> list[dict]:
+    chaves = [idempotencia_service.chave_de(leitura) for leitura in leituras]
+    gravadas: dict[str, idempotencia_service.PesagemRegistrada] = {}
+    consultar = []
+    for chave in chaves:
+        if chave is not None and chave not in gravadas:
+            registro = idempotencia_service.janela.obter(chave)
+            if registro is not None:
+                gravadas[chave] = registro
+            else:
+                consultar.append(chave)
+    gravadas.update(idempotencia_service.buscar_no_banco(db, consultar))
+
+    codigos = {leitura.gaiola_codigo for leitura in leituras}
+    gaiolas = {g.codigo: g for g in db.query(Gaiola).filter(Gaiola.codigo.in_(codigos))} if codigos else {}
+    resumos: dict = {}
+    if gaiolas:
+        ids = [g.id for g in gaiolas.values()]
+        garantir_resumos(db, ids)
+        resumos = {
+            r.gaiola_id: r
+            for r in db.query(ResumoPesagem).filter(ResumoPesagem.gaiola_id.in_(ids)).with_for_update()
+        }
+
+    agora = datetime.now(timezone.utc)
+    pesagens = []
+    novas: dict[str, idempotencia_service.PesagemRegistrada] = {}
+    status_alterados: dict[str, StatusGaiola] = {}
+    resultados = []
+    for indice, leitura in enumerate(leituras):
+        gaiola = gaiolas.get(leitura.gaiola_codigo)
+        registro = gravadas.get(chaves[indice])
+        if registro is not None:
+            status = gaiola.status.value if gaiola is not None else None
+            resultados.append({
+                "indice": indice,
+                "gaiola_codigo": registro.gaiola_codigo,
+                "gaiola_id": registro.gaiola_id,
+                "pesagem_id": registro.pesagem_id,
+                "timestamp": registro.timestamp,
+                "tipo_pesagem": registro.tipo_pesagem,
+                "peso": registro.peso,
+                "status_anterior": status,
+                "status_novo": status,
+                "duplicada": True,
+                "erro": None,
+            })
+            continue
+        if gaiola is None:
+            resultados.append({
+                "indice": indice,
+                "gaiola_codigo": leitura.gaiola_codigo,
+                "gaiola_id": None,
+                "pesagem_id": None,
+                "timestamp": None,
+                "tipo_pesagem": None,
+                "peso": None,
+                "status_anterior": None,
+                "status_novo": None,
+                "duplicada": False,
+                "erro": f"Gaiola '{leitura.gaiola_codigo}' não encontrada",
+            })
+            continue
+        pesagem = Pesagem(
+            id=uuid.uuid4(),
+            gaiola_id=gaiola.id,
+            tipo_pesagem=leitura.tipo_pesagem,
+            peso=leitura.peso,
+            balanca_id=leitura.balanca_id,
+            timestamp=leitura.timestamp or agora,
+            chave_idempotencia=chaves[indice],
+        )
+        pesagens.append(pesagem)
+        if chaves[indice] is not None:
+            gravadas[chaves[indice]] = novas[chaves[indice]] = idempotencia_service.PesagemRegistrada(
+                pesagem.id, gaiola.id, gaiola.codigo, pesagem.timestamp, leitura.tipo_pesagem, leitura.peso
+            )
+
+        _aplicar_no_resumo(resumos[gaiola.id], pesagem)
+
+        status_anterior = gaiola.status.value
+        novo_status = PESAGEM_STATUS_MAP.get(leitura.tipo_pesagem)
+        if novo_status:
+            gaiola.status = novo_status
+            status_alterados[gaiola.codigo] = novo_status
+        resultados.append({
+            "indice": indice,
+            "gaiola_codigo": gaiola.codigo,
+            "gaiola_id": gaiola.id,
+            "pesagem_id": pesagem.id,
+            "timestamp": pesagem.timestamp,
+            "tipo_pesagem": leitura.tipo_pesagem,
+            "peso": leitura.peso,
+            "status_anterior": status_anterior,
+            "status_novo": gaiola.status.value,
+            "duplicada": False,
+            "erro": None,
+        })
+
+    db.add_all(pesagens)
+    db.commit()
+    for codigo, status in status_alterados.items():
+        resolvedor.atualizar_status(codigo, status)
+    for chave, registro in novas.items():
+        idempotencia_service.janela.guardar(chave, registro)
+    return resultados
+
+
+def divergencia_percentual(peso_saida, peso_expedicao) -> float | None:
+    """Retorna a divergência percentual entre os dois pesos, ou None se faltar algum."""
+    if peso_saida and peso_expedicao:
+        peso_saida = float(peso_saida)
+        return round(abs(peso_saida - float(peso_expedicao)) / peso_saida * 100, 2)
+    return None
+
+
 def calcular_divergencia(pesagens: list[Pesagem]) -> float | None:
     """Retorna a divergência percentual entre saída do hospital e expedição, ou None."""
     peso_saida = None
@@ -64,9 +325,7 @@ def calcular_divergencia(pesagens: list[Pesagem]) -> float | None:
             peso_saida = float(p.peso)
         elif p.tipo_pesagem == TipoPesagem.EXPEDICAO:
             peso_expedicao = float(p.peso)
-    if peso_saida and peso_expedicao:
-        return round(abs(peso_saida - peso_expedicao) / peso_saida * 100, 2)
-    return None
+    return divergencia_percentual(peso_saida, peso_expedicao)
 
 
 def tem_divergencia_critica(
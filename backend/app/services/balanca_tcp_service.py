@@ -0,0 +1,278 @@
+"""
+Listener TCP para balanças que falam um protocolo de linhas (serial sobre TCP).
+
+Cada balança mantém uma conexão persistente e envia linhas UTF-8 terminadas
+em ``\\n``:
+
+    ID <balanca_id>                                   → OK ID
+    <gaiola_codigo>;<tipo_pesagem>;<peso>[;<timestamp ISO-8601>]
+                                                      → OK <pesagem_id> <status_gaiola>
+                                                      → ERR <mensagem>
+
+A linha ``ID`` é opcional; sem ela o ``balanca_id`` é o endereço do cliente.
+O peso aceita vírgula decimal e sufixo ``kg``. As leituras podem ser enviadas
+em sequência sem esperar resposta; as respostas saem na ordem das linhas e só
+depois do commit do lote no banco.
+
+As leituras são gravadas pelo ``BufferPesagens`` (group commit via
+``balanca_service.registrar_pesagens_lote``). Cada conexão tem no máximo
+``BALANCA_TCP_PENDENTES_MAX`` leituras aguardando commit; acima disso a
+conexão para de ler e o próprio TCP segura a balança.
+
+O listener tem o seu próprio buffer, separado do buffer global usado pelo
+``POST /pesagens/balanca`` (``PESAGEM_BUFFER_ATIVO``): ligar o TCP não muda
+o caminho de gravação das requisições HTTP.
+
+Pode rodar junto com a API (``BALANCA_TCP_ATIVO=true``) ou sozinho:
+
+    python -m app.services.balanca_tcp_service
+
+Com vários workers do uvicorn, só o primeiro processo consegue abrir a porta;
+nos demais o listener não sobe e um aviso é registrado no log. Em produção
+prefira ``BALANCA_TCP_ATIVO=false`` na API e o listener como processo próprio.
+"""
+import asyncio
+import errno
+import logging
+import queue
+from datetime import datetime
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.pesagem import TipoPesagem
+from app.schemas.pesagem import PesagemBalanca
+from app.services import ingestao_service, notificacao_service
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo de uma linha do protocolo, em bytes
+LINHA_MAX = 1024
+
+
+class ErroProtocolo(ValueError):
+    pass
+
+
+def interpretar_linha(linha: str, balanca_id: str) -> PesagemBalanca:
+    """Converte uma linha de leitura em ``PesagemBalanca``; levanta ``ErroProtocolo`` se inválida."""
+    partes = [p.strip() for p in linha.split(";")]
+    if len(partes) not in (3, 4) or not partes[0]:
+        raise ErroProtocolo("formato esperado: codigo;tipo;peso[;timestamp]")
+    codigo, tipo, peso = partes[:3]
+    try:
+        tipo_pesagem = TipoPesagem(tipo.lower())
+    except ValueError:
+        raise ErroProtocolo(f"tipo de pesagem inválido: {tipo}")
+    try:
+        valor = float(peso.lower().removesuffix("kg").strip().replace(",", "."))
+    except ValueError:
+        raise ErroProtocolo(f"peso inválido: {peso}")
+    timestamp = None
+    if len(partes) == 4 and partes[3]:
+        try:
+            timestamp = datetime.fromisoformat(partes[3])
+        except ValueError:
+            raise ErroProtocolo(f"timestamp inválido: {partes[3]}")
+    try:
+        return PesagemBalanca(
+            gaiola_codigo=codigo,
+            peso=valor,
+            tipo_pesagem=tipo_pesagem,
+            balanca_id=balanca_id,
+            timestamp=timestamp,
+        )
+    except ValidationError as exc:
+        erro = exc.errors()[0]
+        raise ErroProtocolo(f"{erro['loc'][0]} inválido: {erro['msg']}")
+
+
+class ServidorBalancas:
+    """Servidor asyncio que recebe leituras das balanças e as grava pelo buffer de pesagens."""
+
+    def __init__(
+        self,
+        buffer: ingestao_service.BufferPesagens,
+        host: str = settings.BALANCA_TCP_HOST,
+        porta: int = settings.BALANCA_TCP_PORTA,
+        pendentes_max: int = settings.BALANCA_TCP_PENDENTES_MAX,
+    ):
+        self.buffer = buffer
+        self.host = host
+        self.porta = porta
+        self.pendentes_max = pendentes_max
+        self._server: asyncio.AbstractServer | None = None
+        self._conexoes: set[asyncio.Task] = set()
+        self._metricas = {"conexoes_total": 0, "leituras": 0, "erros": 0}
+
+    async def iniciar(self) -> None:
+        self._server = await asyncio.start_server(self._atender, self.host, self.porta, limit=LINHA_MAX)
+        # Com porta 0 o sistema escolhe uma porta livre
+        self.porta = self._server.sockets[0].getsockname()[1]
+        logger.info("Listener de balanças em %s:%d", self.host, self.porta)
+
+    async def parar(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for tarefa in list(self._conexoes):
+                tarefa.cancel()
+            await asyncio.gather(*self._conexoes, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def metricas(self) -> dict:
+        return {"conexoes_ativas": len(self._conexoes), **self._metricas, "buffer": self.buffer.metricas()}
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tarefa = asyncio.current_task()
+        self._conexoes.add(tarefa)
+        self._metricas["conexoes_total"] += 1
+        peer = writer.get_extra_info("peername")
+        balanca_id = f"{peer[0]}:{peer[1]}" if peer else "tcp"
+        pendentes: asyncio.Queue = asyncio.Queue(maxsize=self.pendentes_max)
+        respondedor = asyncio.create_task(self._responder(pendentes, writer))
+        try:
+            while True:
+                try:
+                    bruta = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await pendentes.put(_resposta_pronta("ERR linha muito longa"))
+                    break
+                if not bruta:
+                    break
+                linha = bruta.decode("utf-8", errors="replace").strip()
+                if not linha:
+                    continue
+                if linha.upper().startswith("ID "):
+                    balanca_id = linha[3:].strip() or balanca_id
+                    await pendentes.put(_resposta_pronta("OK ID"))
+                    continue
+                await pendentes.put(self._enviar(linha, balanca_id))
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            await pendentes.put(None)
+            try:
+                await respondedor
+                await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            writer.close()
+            self._conexoes.discard(tarefa)
+
+    def _enviar(self, linha: str, balanca_id: str) -> asyncio.Future:
+        try:
+            leitura = interpretar_linha(linha, balanca_id)
+        except ErroProtocolo as exc:
+            self._metricas["erros"] += 1
+            return _resposta_pronta(f"ERR {exc}")
+        try:
+            futuro = self.buffer.enviar(leitura, timeout=0)
+        except queue.Full:
+            self._metricas["erros"] += 1
+            return _resposta_pronta("ERR fila de pesagens cheia")
+        return asyncio.wrap_future(futuro)
+
+    async def _responder(self, pendentes: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        # Continua consumindo a fila mesmo se a balança desconectar, para não
+        # travar a leitura nem deixar resultados de lote sem tratamento.
+        conectada = True
+        while True:
+            futuro = await pendentes.get()
+            if futuro is None:
+                break
+            try:
+                resultado = await futuro
+            except Exception:
+                logger.exception("Falha ao gravar leitura recebida por TCP")
+                self._metricas["erros"] += 1
+                resposta = "ERR falha ao gravar"
+            else:
+                resposta = self._formatar(resultado)
+            if not conectada:
+                continue
+            try:
+                writer.write(resposta.encode() + b"\n")
+                if pendentes.empty():
+                    await writer.drain()
+            except ConnectionError:
+                conectada = False
+
+    def _formatar(self, resultado) -> str:
+        if isinstance(resultado, str):
+            return resultado
+        if resultado["erro"]:
+            self._metricas["erros"] += 1
+            return f"ERR {resultado['erro']}"
+        self._metricas["leituras"] += 1
+        if resultado["status_novo"] != resultado["status_anterior"]:
+            notificacao_service.notificar_mudanca_status(
+                gaiola_codigo=resultado["gaiola_codigo"],
+                status_anterior=resultado["status_anterior"],
+                status_novo=resultado["status_novo"],
+            )
+        return f"OK {resultado['pesagem_id']} {resultado['status_novo']}"
+
+
+def _resposta_pronta(resposta: str) -> asyncio.Future:
+    futuro = asyncio.get_running_loop().create_future()
+    futuro.set_result(resposta)
+    return futuro
+
+
+_servidor: ServidorBalancas | None = None
+
+
+def get_servidor() -> ServidorBalancas | None:
+    """Retorna o listener ativo, ou None se não estiver rodando neste processo."""
+    return _servidor
+
+
+async def iniciar(
+    host: str = settings.BALANCA_TCP_HOST, porta: int = settings.BALANCA_TCP_PORTA
+) -> ServidorBalancas | None:
+    """Sobe o listener com um buffer próprio.
+
+    Retorna None se a porta já estiver em uso — tipicamente outro worker do
+    uvicorn que abriu o listener primeiro.
+    """
+    global _servidor
+    if _servidor is None:
+        buffer = ingestao_service.BufferPesagens()
+        buffer.iniciar()
+        servidor = ServidorBalancas(buffer, host, porta)
+        try:
+            await servidor.iniciar()
+        except OSError as exc:
+            buffer.parar()
+            if exc.errno != errno.EADDRINUSE:
+                raise
+            logger.warning("Porta %s:%d em uso; listener de balanças não iniciado neste processo", host, porta)
+            return None
+        _servidor = servidor
+    return _servidor
+
+
+async def parar() -> None:
+    global _servidor
+    if _servidor is not None:
+        await _servidor.parar()
+        _servidor.buffer.parar()
+        _servidor = None
+
+
+async def _main() -> None:
+    if await iniciar() is None:
+        raise SystemExit(f"Porta {settings.BALANCA_TCP_HOST}:{settings.BALANCA_TCP_PORTA} em uso")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await parar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
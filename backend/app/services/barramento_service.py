@@ -0,0 +1,189 @@
+"""
+Barramento de eventos entre workers.
+
+Cada worker do uvicorn é um processo; sem um barramento, um cliente SSE
+conectado a um worker não vê as mudanças de status feitas em outro.
+``notificacao_service`` publica cada evento aqui e a central SSE de cada
+worker assina o barramento.
+
+Implementações:
+- ``BarramentoLocal``: entrega apenas dentro do processo (testes, SQLite,
+  um único worker)
+- ``BarramentoPostgres``: ``NOTIFY``/``LISTEN`` do Postgres. Cada worker mantém
+  duas conexões dedicadas (fora do pool) em autocommit: uma só escuta, e uma
+  thread espera no socket dela com ``select`` e entrega os eventos assim que
+  chegam, sem polling do banco; a outra só publica. Publicar na conexão do
+  ``LISTEN`` faria o psycopg2 ler as notificações pendentes para
+  ``conexao.notifies`` durante o ``execute``, esvaziando o socket, e o
+  ``select`` não acordaria mais para elas. O próprio worker recebe de volta o
+  que publicou, então a entrega é igual para todos.
+
+A escolha vem de ``NOTIFICACOES_BARRAMENTO``.
+"""
+import json
+import logging
+import select
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Assinatura = Callable[[dict], None]
+
+
+def serializar(evento: dict) -> str:
+    return json.dumps(
+        {**evento, "id": str(evento["id"]), "timestamp": evento["timestamp"].isoformat()},
+        ensure_ascii=False,
+    )
+
+
+def desserializar(payload: str) -> dict:
+    evento = json.loads(payload)
+    evento["id"] = uuid.UUID(evento["id"])
+    evento["timestamp"] = datetime.fromisoformat(evento["timestamp"])
+    return evento
+
+
+class BarramentoLocal:
+    def __init__(self):
+        self._assinaturas: list[Assinatura] = []
+
+    def assinar(self, callback: Assinatura) -> None:
+        self._assinaturas.append(callback)
+
+    def publicar(self, evento: dict) -> None:
+        self._entregar(evento)
+
+    def iniciar(self) -> None:
+        pass
+
+    def parar(self) -> None:
+        pass
+
+    def _entregar(self, evento: dict) -> None:
+        for callback in list(self._assinaturas):
+            try:
+                callback(evento)
+            except Exception:
+                logger.exception("Falha ao entregar evento do barramento")
+
+
+class BarramentoPostgres(BarramentoLocal):
+    # Limite do payload do NOTIFY no Postgres é 8000 bytes
+    PAYLOAD_MAX = 7900
+
+    def __init__(self, dsn: str, canal: str = settings.NOTIFICACOES_CANAL, reconectar_s: float = 1.0):
+        super().__init__()
+        self.dsn = dsn
+        self.canal = canal
+        self.reconectar_s = reconectar_s
+        self._conexao = None
+        self._conexao_publicacao = None
+        self._lock = threading.Lock()
+        self._lock_publicacao = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._parar = threading.Event()
+
+    def iniciar(self) -> None:
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._escutar, name="barramento-postgres", daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._fechar()
+        self._fechar_publicacao()
+
+    def publicar(self, evento: dict) -> None:
+        payload = serializar(evento)
+        if len(payload.encode()) > self.PAYLOAD_MAX:
+            evento = {**evento, "observacoes": None}
+            payload = serializar(evento)
+        try:
+            with self._lock_publicacao:
+                if self._conexao_publicacao is None or self._conexao_publicacao.closed:
+                    self._conexao_publicacao = self._nova_conexao()
+                with self._conexao_publicacao.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.canal, payload))
+        except Exception:
+            logger.exception("Falha ao publicar evento no Postgres; entregando apenas neste worker")
+            self._fechar_publicacao()
+            self._entregar(evento)
+
+    def _nova_conexao(self):
+        import psycopg2
+
+        conexao = psycopg2.connect(self.dsn)
+        conexao.autocommit = True
+        return conexao
+
+    def _conectar(self):
+        if self._conexao is None or self._conexao.closed:
+            conexao = self._nova_conexao()
+            with conexao.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.canal}"')
+            self._conexao = conexao
+        return self._conexao
+
+    def _fechar_publicacao(self) -> None:
+        with self._lock_publicacao:
+            if self._conexao_publicacao is not None:
+                try:
+                    self._conexao_publicacao.close()
+                except Exception:
+                    pass
+                self._conexao_publicacao = None
+
+    def _fechar(self) -> None:
+        with self._lock:
+            if self._conexao is not None:
+                try:
+                    self._conexao.close()
+                except Exception:
+                    pass
+                self._conexao = None
+
+    def _escutar(self) -> None:
+        espera = self.reconectar_s
+        while not self._parar.is_set():
+            try:
+                with self._lock:
+                    conexao = self._conectar()
+                espera = self.reconectar_s
+                while not self._parar.is_set():
+                    # Timeout curto só para perceber o pedido de parada
+                    pronto = select.select([conexao], [], [], 1.0)[0]
+                    with self._lock:
+                        if pronto:
+                            conexao.poll()
+                        # Esvazia a cada volta: notificações lidas por outro comando na
+                        # conexão ficam em ``notifies`` sem acordar o select
+                        notificacoes, conexao.notifies[:] = list(conexao.notifies), []
+                    for notificacao in notificacoes:
+                        self._entregar(desserializar(notificacao.payload))
+            except Exception:
+                logger.exception("Conexão de LISTEN perdida; reconectando em %.1fs", espera)
+                self._fechar()
+                self._parar.wait(espera)
+                espera = min(espera * 2, 30.0)
+
+
+def criar_barramento(modo: str = settings.NOTIFICACOES_BARRAMENTO, database_url: str | None = None):
+    from app.database import engine
+
+    url = database_url or engine.url.render_as_string(hide_password=False)
+    if modo == "postgres" or (modo == "auto" and url.startswith("postgresql")):
+        return BarramentoPostgres(url.replace("postgresql+psycopg2://", "postgresql://"))
+    return BarramentoLocal()
+
+
+barramento = criar_barramento()
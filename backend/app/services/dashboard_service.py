@@ -0,0 +1,85 @@
+"""
+Serviço do dashboard.
+
+Centraliza a lógica de:
+- Contar gaiolas por grupo de status (agregação condicional em uma única consulta)
+- Somar o peso registrado no dia
+- Listar alertas de divergência de peso a partir do resumo de pesagens
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.gaiola import Gaiola, StatusGaiola
+from app.models.pesagem import Pesagem
+from app.models.resumo_pesagem import ResumoPesagem
+from app.services.balanca_service import LIMITE_DIVERGENCIA_PADRAO
+
+STATUS_EM_TRANSITO = (StatusGaiola.EM_TRANSPORTE_IDA, StatusGaiola.EM_TRANSPORTE_VOLTA)
+STATUS_EM_PROCESSAMENTO = (
+    StatusGaiola.EM_SEPARACAO,
+    StatusGaiola.EM_LAVAGEM,
+    StatusGaiola.EM_SECAGEM,
+    StatusGaiola.EM_DOBRA,
+)
+
+
+def _contar_se(condicao):
+    return func.coalesce(func.sum(case((condicao, 1), else_=0)), 0)
+
+
+def estatisticas(db: Session, agora: datetime | None = None) -> dict:
+    """Retorna os contadores do dashboard em um único round-trip ao banco."""
+    agora = agora or datetime.now(timezone.utc)
+    inicio_dia = datetime(agora.year, agora.month, agora.day, tzinfo=timezone.utc)
+    peso_hoje = (
+        select(func.coalesce(func.sum(Pesagem.peso), 0))
+        .where(Pesagem.timestamp >= inicio_dia)
+        .scalar_subquery()
+    )
+    row = db.query(
+        _contar_se(Gaiola.status.in_(STATUS_EM_TRANSITO)),
+        _contar_se(Gaiola.status.in_(STATUS_EM_PROCESSAMENTO)),
+        _contar_se(Gaiola.status == StatusGaiola.PRONTA_EXPEDICAO),
+        peso_hoje,
+    ).select_from(Gaiola).one()
+    em_transito, em_processamento, prontas_expedicao, peso = row
+    return {
+        "em_transito": int(em_transito),
+        "em_processamento": int(em_processamento),
+        "prontas_expedicao": int(prontas_expedicao),
+        "peso_hoje": round(float(peso or 0), 2),
+    }
+
+
+def alertas_divergencia(db: Session, limite: float = LIMITE_DIVERGENCIA_PADRAO) -> list[dict]:
+    """Retorna as gaiolas cuja divergência saída × expedição ultrapassa o limite (%)."""
+    rows = (
+        db.query(Gaiola.codigo, ResumoPesagem.divergencia)
+        .join(ResumoPesagem, ResumoPesagem.gaiola_id == Gaiola.id)
+        .filter(ResumoPesagem.divergencia > limite)
+        .order_by(ResumoPesagem.divergencia.desc())
+        .all()
+    )
+    return [{"gaiola": codigo, "divergencia": float(div)} for codigo, div in rows]
+
+
+def gaiolas_recentes(db: Session, limite: int = 10) -> list[Gaiola]:
+    """Retorna as gaiolas mais recentes já com o hospital carregado."""
+    return (
+        db.query(Gaiola)
+        .options(joinedload(Gaiola.hospital))
+        .order_by(Gaiola.data_criacao.desc())
+        .limit(limite)
+        .all()
+    )
+
+
+def contexto_dashboard(db: Session) -> dict:
+    """Monta o contexto consumido pelo template ``dashboard.html``."""
+    return {
+        "stats": estatisticas(db),
+        "gaiolas_recentes": gaiolas_recentes(db),
+        "alertas": alertas_divergencia(db),
+    }
@@ -0,0 +1,263 @@
+"""
+Despacho assíncrono de eventos para destinos (sinks).
+
+Quem gera o evento só o coloca em uma fila limitada e segue; um pool de
+threads retira os eventos em lotes (tamanho máximo e latência máxima) e
+entrega cada lote a todos os destinos registrados. Cada destino é
+independente:
+- Falhas são repetidas com espera exponencial, até ``tentativas`` vezes
+- Um lote que esgota as tentativas vai para a fila de mortos (dead letter)
+  daquele destino, com o erro, sem bloquear os demais destinos
+
+``descarregar_em`` entrega os pendentes a um único destino na thread
+chamadora (uma tentativa, sem espera) e deixa os demais destinos desses
+lotes para os workers: é o que o caminho de leitura usa para enxergar os
+próprios eventos sem esperar por webhooks ou pelo barramento. Sem workers
+rodando, ou com a fila de parciais cheia, os demais destinos também são
+atendidos na thread chamadora.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Protocol
+
+logger = logging.getLogger(__name__)
+
+_PARAR = object()
+# Acorda um worker para os lotes parciais (``descarregar_em``)
+_ACORDAR = object()
+
+# Quantos lotes mortos ficam guardados para inspeção
+MORTOS_MAX = 1000
+
+
+class Destino(Protocol):
+    nome: str
+
+    def entregar(self, eventos: list[dict], **contexto) -> None: ...
+
+
+class Despachante:
+    def __init__(
+        self,
+        destinos: list[Destino] | None = None,
+        workers: int = 2,
+        lote_max: int = 500,
+        latencia_max_ms: int = 50,
+        fila_max: int = 10000,
+        tentativas: int = 3,
+        espera_inicial_s: float = 0.1,
+    ):
+        self.destinos: list[Destino] = list(destinos or [])
+        self.workers = workers
+        self.lote_max = lote_max
+        self.latencia_max = latencia_max_ms / 1000.0
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial_s
+        self._fila: queue.Queue = queue.Queue(maxsize=fila_max)
+        # Lotes já entregues a parte dos destinos: (lote, destinos que faltam)
+        self._parciais: queue.Queue = queue.Queue(maxsize=fila_max)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._metricas = {"enviados": 0, "descartados": 0, "lotes": 0}
+        self._por_destino: dict[str, dict] = {}
+        self.mortos: deque[dict] = deque(maxlen=MORTOS_MAX)
+
+    def registrar(self, destino: Destino) -> None:
+        self.destinos.append(destino)
+
+    def enviar(self, evento: dict) -> bool:
+        """Enfileira o evento sem bloquear. Retorna False se a fila estiver cheia (evento descartado)."""
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            with self._lock:
+                self._metricas["descartados"] += 1
+            logger.warning("Fila de despacho cheia; evento descartado")
+            return False
+        with self._lock:
+            self._metricas["enviados"] += 1
+        return True
+
+    def iniciar(self) -> None:
+        if not self._threads:
+            self._threads = [
+                threading.Thread(target=self._executar, name=f"despacho-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """Entrega o que estiver na fila e encerra o pool."""
+        if self._threads:
+            for _ in self._threads:
+                self._fila.put(_PARAR)
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+            self.descarregar()
+
+    def descarregar(self, **contexto) -> int:
+        """Entrega agora, na thread chamadora, os eventos pendentes. Retorna quantos entregou."""
+        self._entregar_parciais(contexto)
+        total = 0
+        while True:
+            lote = self._retirar(self.lote_max)
+            if not lote:
+                return total
+            self._despachar(lote, contexto)
+            total += len(lote)
+
+    def descarregar_em(self, destino: Destino, **contexto) -> int:
+        """
+        Entrega agora ao ``destino``, na thread chamadora e em uma tentativa, os
+        eventos pendentes; os demais destinos recebem os lotes pelos workers.
+        Se a entrega falhar, o lote volta inteiro para os workers. Sem workers
+        rodando, ou com a fila de parciais cheia, os demais destinos são
+        atendidos aqui mesmo. Retorna quantos eventos entregou ao ``destino``.
+        """
+        total = 0
+        while True:
+            lote = self._retirar(self.lote_max)
+            if not lote:
+                break
+            restantes = [d for d in self.destinos if d is not destino]
+            try:
+                destino.entregar(lote, **contexto)
+            except Exception:
+                logger.warning("Falha ao entregar %d eventos a %s; ficam para os workers",
+                               len(lote), destino.nome, exc_info=True)
+                self._contar(destino, "falhas", 1)
+                restantes = self.destinos
+            else:
+                self._contar(destino, "entregues", len(lote))
+                total += len(lote)
+            with self._lock:
+                self._metricas["lotes"] += 1
+            if self._threads:
+                try:
+                    self._parciais.put_nowait((lote, restantes))
+                    continue
+                except queue.Full:
+                    pass  # Workers atrasados: entrega aqui em vez de acumular
+            for outro in restantes:
+                self._entregar(outro, lote, contexto)
+        if self._threads and not self._parciais.empty():
+            try:
+                self._fila.put_nowait(_ACORDAR)
+            except queue.Full:
+                pass  # Fila cheia: os workers já estão ocupados e passam pelos parciais a cada lote
+        return total
+
+    def limpar(self) -> None:
+        """Descarta os eventos pendentes, a fila de mortos e as métricas."""
+        self._retirar(None)
+        while not self._parciais.empty():
+            self._parciais.get_nowait()
+        with self._lock:
+            self.mortos.clear()
+            self._metricas = dict.fromkeys(self._metricas, 0)
+            self._por_destino.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                **self._metricas,
+                "fila": self._fila.qsize(),
+                "parciais": self._parciais.qsize(),
+                "destinos": {nome: dict(m) for nome, m in self._por_destino.items()},
+                "mortos": len(self.mortos),
+            }
+
+    def _retirar(self, maximo: int | None) -> list[dict]:
+        itens = []
+        while maximo is None or len(itens) < maximo:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is _PARAR:
+                # Devolve o pedido de parada para a thread que o aguarda
+                self._fila.put(_PARAR)
+                break
+            if item is not _ACORDAR:
+                itens.append(item)
+        return itens
+
+    def _entregar_parciais(self, contexto: dict) -> None:
+        while True:
+            try:
+                lote, destinos = self._parciais.get_nowait()
+            except queue.Empty:
+                return
+            for destino in destinos:
+                self._entregar(destino, lote, contexto)
+
+    def _executar(self) -> None:
+        while True:
+            self._entregar_parciais({})
+            item = self._fila.get()
+            if item is _PARAR:
+                break
+            if item is _ACORDAR:
+                continue
+            lote = [item]
+            prazo = time.monotonic() + self.latencia_max
+            parar = False
+            while len(lote) < self.lote_max:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _PARAR:
+                    parar = True
+                    break
+                if item is not _ACORDAR:
+                    lote.append(item)
+            self._despachar(lote, {})
+            if parar:
+                self._entregar_parciais({})
+                break
+
+    def _despachar(self, lote: list[dict], contexto: dict) -> None:
+        with self._lock:
+            self._metricas["lotes"] += 1
+        for destino in self.destinos:
+            self._entregar(destino, lote, contexto)
+
+    def _entregar(self, destino: Destino, lote: list[dict], contexto: dict) -> None:
+        espera = self.espera_inicial
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                destino.entregar(lote, **contexto)
+            except Exception as exc:
+                erro = exc
+                self._contar(destino, "falhas", 1)
+                if tentativa < self.tentativas:
+                    time.sleep(espera)
+                    espera *= 2
+                continue
+            self._contar(destino, "entregues", len(lote))
+            return
+        logger.error("Destino %s falhou %d vezes; %d eventos para a fila de mortos: %s",
+                     destino.nome, self.tentativas, len(lote), erro)
+        self._contar(destino, "mortos", len(lote))
+        with self._lock:
+            self.mortos.append({
+                "destino": destino.nome,
+                "eventos": lote,
+                "erro": repr(erro),
+                "timestamp": datetime.now(timezone.utc),
+            })
+
+    def _contar(self, destino: Destino, chave: str, n: int) -> None:
+        with self._lock:
+            m = self._por_destino.setdefault(destino.nome, {"entregues": 0, "falhas": 0, "mortos": 0})
+            m[chave] += n
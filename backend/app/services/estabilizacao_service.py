@@ -0,0 +1,152 @@
+"""
+Detecção de peso estável a partir de amostras brutas da balança.
+
+Balanças mais simples enviam um fluxo contínuo de leituras ruidosas em vez
+de um único ``peso``. Para cada ``balanca_id`` mantemos um detector com:
+- Janela deslizante de tamanho fixo (memória limitada por balança)
+- Média e variância incrementais (soma e soma dos quadrados, O(1) por amostra)
+- Tempo mínimo de acomodação: a janela precisa ficar estável por
+  ``ESTABILIZACAO_TEMPO_S`` segundos antes de emitir o peso
+
+Depois de emitir, o detector só volta a emitir quando a balança é esvaziada
+(média abaixo de ``ESTABILIZACAO_PESO_MIN_KG``), ou quando a gaiola ou o
+tipo de pesagem associados à balança mudam.
+
+Os detectores ficam em um LRU limitado (``ESTABILIZACAO_BALANCAS_MAX``) e o
+de uma balança sem amostras há ``ESTABILIZACAO_OCIOSA_S`` segundos é
+descartado: ``balanca_id`` vem do cliente, então a memória não pode crescer
+com ele.
+"""
+import math
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Iterable
+
+from app.config import settings
+
+
+class DetectorEstabilidade:
+    def __init__(
+        self,
+        janela: int = settings.ESTABILIZACAO_JANELA,
+        desvio_max: float = settings.ESTABILIZACAO_DESVIO_MAX_KG,
+        tempo_estavel: float = settings.ESTABILIZACAO_TEMPO_S,
+        peso_minimo: float = settings.ESTABILIZACAO_PESO_MIN_KG,
+    ):
+        self.janela = janela
+        self.desvio_max = desvio_max
+        self.tempo_estavel = tempo_estavel
+        self.peso_minimo = peso_minimo
+        self.contexto: tuple | None = None
+        self.lock = Lock()
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        self._amostras: deque[float] = deque(maxlen=self.janela)
+        self._soma = 0.0
+        self._soma_quadrados = 0.0
+        self._estavel_desde: float | None = None
+        self._emitido = False
+
+    def processar(self, amostras: Iterable[tuple[float, float]]) -> list[float]:
+        """
+        Processa amostras ``(t, peso)`` em ordem e retorna os pesos estáveis emitidos.
+
+        ``t`` é o relógio da balança em segundos; só precisa ser crescente.
+        """
+        emitidos = []
+        amostras_janela = self._amostras
+        for t, peso in amostras:
+            if len(amostras_janela) == self.janela:
+                antigo = amostras_janela[0]
+                self._soma -= antigo
+                self._soma_quadrados -= antigo * antigo
+            amostras_janela.append(peso)
+            self._soma += peso
+            self._soma_quadrados += peso * peso
+
+            n = len(amostras_janela)
+            media = self._soma / n
+            if self._emitido:
+                if media < self.peso_minimo:
+                    self._emitido = False
+                    self._estavel_desde = None
+                continue
+            if n < self.janela or media < self.peso_minimo:
+                self._estavel_desde = None
+                continue
+            variancia = max(self._soma_quadrados / n - media * media, 0.0)
+            if math.sqrt(variancia) > self.desvio_max:
+                self._estavel_desde = None
+                continue
+            if self._estavel_desde is None:
+                self._estavel_desde = t
+            if t - self._estavel_desde >= self.tempo_estavel:
+                emitidos.append(round(media, 3))
+                self._emitido = True
+        return emitidos
+
+
+class GestorBalancas:
+    """Mantém um detector por balança; cada detector é usado por um lote de cada vez."""
+
+    def __init__(
+        self,
+        tamanho: int = settings.ESTABILIZACAO_BALANCAS_MAX,
+        ociosa_s: float = settings.ESTABILIZACAO_OCIOSA_S,
+        **parametros,
+    ):
+        self.tamanho = tamanho
+        self.ociosa = ociosa_s
+        self._parametros = parametros
+        # balanca_id → (detector, último uso), do menos para o mais recente
+        self._detectores: OrderedDict[str, tuple[DetectorEstabilidade, float]] = OrderedDict()
+        self._lock = Lock()
+        self.amostras_processadas = 0
+        self.pesos_emitidos = 0
+        self.descartados = 0
+
+    def detector(self, balanca_id: str) -> DetectorEstabilidade:
+        agora = time.monotonic()
+        with self._lock:
+            item = self._detectores.pop(balanca_id, None)
+            detector = item[0] if item is not None else DetectorEstabilidade(**self._parametros)
+            self._detectores[balanca_id] = (detector, agora)
+            # Descarta os excedentes e os ociosos (os mais antigos ficam no início)
+            while self._detectores:
+                _, (_, ultimo_uso) = next(iter(self._detectores.items()))
+                if len(self._detectores) <= self.tamanho and agora - ultimo_uso < self.ociosa:
+                    break
+                self._detectores.popitem(last=False)
+                self.descartados += 1
+            return detector
+
+    def processar(self, balanca_id: str, contexto: tuple, amostras: list[tuple[float, float]]) -> list[float]:
+        """
+        Processa um lote de amostras da balança para o ``contexto`` informado
+        (ex.: código da gaiola e tipo de pesagem). Se o contexto mudar desde o
+        lote anterior, a janela é descartada antes de processar.
+        """
+        detector = self.detector(balanca_id)
+        with detector.lock:
+            if detector.contexto != contexto:
+                detector.reiniciar()
+                detector.contexto = contexto
+            emitidos = detector.processar(amostras)
+        with self._lock:
+            self.amostras_processadas += len(amostras)
+            self.pesos_emitidos += len(emitidos)
+        return emitidos
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "balancas": len(self._detectores),
+                "descartados": self.descartados,
+                "amostras_processadas": self.amostras_processadas,
+                "pesos_emitidos": self.pesos_emitidos,
+            }
+
+
+gestor = GestorBalancas()
@@ -0,0 +1,138 @@
+"""
+Distribuição de eventos em tempo real (Server-Sent Events).
+
+``notificacao_service`` publica aqui cada mudança de status; cada cliente
+conectado ao stream é um ``Assinante`` com fila própria e limitada
+(``SSE_FILA_MAX``). ``publicar`` pode ser chamado de qualquer thread: o evento
+é repassado ao event loop dos assinantes com um único ``call_soon_threadsafe``
+por loop, não por cliente.
+
+Um cliente que não consome a tempo (fila cheia) é desconectado; ao
+reconectar, o ``Last-Event-ID`` permite recuperar o que perdeu a partir do
+log persistente. Sem eventos, o stream envia um comentário de heartbeat a
+cada ``SSE_HEARTBEAT_S`` segundos para manter proxies e conexões vivas.
+"""
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Iterable
+
+from app.config import settings
+from app.utils.paginacao import encode_cursor
+
+
+class Assinante:
+    __slots__ = ("fila", "loop", "removido")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tamanho: int):
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=tamanho)
+        self.loop = loop
+        self.removido = False
+
+
+class CentralEventos:
+    def __init__(self, fila_max: int = settings.SSE_FILA_MAX):
+        self.fila_max = fila_max
+        self._assinantes: dict[asyncio.AbstractEventLoop, set[Assinante]] = {}
+        self._lock = threading.Lock()
+        self._metricas = {"publicados": 0, "entregues": 0, "desconectados_lentos": 0}
+
+    def assinar(self) -> Assinante:
+        """Registra um novo assinante no event loop corrente."""
+        loop = asyncio.get_running_loop()
+        assinante = Assinante(loop, self.fila_max)
+        with self._lock:
+            self._assinantes.setdefault(loop, set()).add(assinante)
+        return assinante
+
+    def cancelar(self, assinante: Assinante) -> None:
+        assinante.removido = True
+        with self._lock:
+            assinantes = self._assinantes.get(assinante.loop)
+            if assinantes is not None:
+                assinantes.discard(assinante)
+                if not assinantes:
+                    del self._assinantes[assinante.loop]
+
+    def publicar(self, evento: dict) -> None:
+        """Entrega o evento a todos os assinantes; seguro para chamar de qualquer thread."""
+        with self._lock:
+            loops = list(self._assinantes)
+            self._metricas["publicados"] += 1
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._distribuir, loop, evento)
+            except RuntimeError:
+                # Loop já encerrado; os assinantes dele não voltam mais
+                with self._lock:
+                    self._assinantes.pop(loop, None)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            conectados = sum(len(a) for a in self._assinantes.values())
+            return {**self._metricas, "conectados": conectados}
+
+    def _distribuir(self, loop: asyncio.AbstractEventLoop, evento: dict) -> None:
+        with self._lock:
+            assinantes = list(self._assinantes.get(loop, ()))
+        entregues = 0
+        for assinante in assinantes:
+            try:
+                assinante.fila.put_nowait(evento)
+                entregues += 1
+            except asyncio.QueueFull:
+                self.cancelar(assinante)
+                with self._lock:
+                    self._metricas["desconectados_lentos"] += 1
+        with self._lock:
+            self._metricas["entregues"] += entregues
+
+
+def formatar_evento(evento: dict) -> str:
+    """Formata o evento no protocolo SSE; o ``id`` é o cursor (timestamp, id) do log."""
+    dados = {
+        "id": str(evento["id"]),
+        "timestamp": evento["timestamp"].isoformat(),
+        "gaiola_codigo": evento["gaiola_codigo"],
+        "status_anterior": evento["status_anterior"],
+        "status_novo": evento["status_novo"],
+        "usuario": evento["usuario"],
+        "observacoes": evento["observacoes"],
+    }
+    return (
+        f"id: {encode_cursor(evento['timestamp'], evento['id'])}\n"
+        f"event: status\n"
+        f"data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+    )
+
+
+async def stream_eventos(
+    central: CentralEventos,
+    assinante: Assinante,
+    pendentes: Iterable[dict] = (),
+    heartbeat: float = settings.SSE_HEARTBEAT_S,
+) -> AsyncIterator[str]:
+    """
+    Gera o stream SSE de um assinante: primeiro os eventos ``pendentes``
+    (recuperados pelo ``Last-Event-ID``), depois os eventos ao vivo.
+    """
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        enviados = set()
+        for evento in pendentes:
+            enviados.add(evento["id"])
+            yield formatar_evento(evento)
+        while not assinante.removido:
+            try:
+                evento = await asyncio.wait_for(assinante.fila.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if evento["id"] in enviados:
+                continue
+            yield formatar_evento(evento)
+    finally:
+        central.cancelar(assinante)
+
+
+central = CentralEventos()
@@ -0,0 +1,98 @@
+"""
+Resolvedor de código de gaiola com cache LRU.
+
+As leituras da balança e de QR Code identificam a gaiola pelo ``codigo``.
+Este módulo guarda, por processo, o mapeamento
+``codigo → (id, hospital_id, status)`` em um cache LRU limitado
+(``GAIOLA_CACHE_TAMANHO``) com expiração (``GAIOLA_CACHE_TTL_S``).
+
+O ``status`` guardado é apenas uma referência: quem altera o status deve
+confirmar a mudança no banco (ver ``balanca_service.registrar_pesagem_ref``).
+As rotas que alteram código ou hospital invalidam a entrada.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import NamedTuple
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.gaiola import Gaiola, StatusGaiola
+
+
+class GaiolaRef(NamedTuple):
+    id: uuid.UUID
+    codigo: str
+    hospital_id: uuid.UUID
+    status: StatusGaiola
+
+
+class ResolvedorGaiolas:
+    def __init__(self, tamanho: int = settings.GAIOLA_CACHE_TAMANHO, ttl: float = settings.GAIOLA_CACHE_TTL_S):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._cache: OrderedDict[str, tuple[GaiolaRef, float]] = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def resolver(self, db: Session, codigo: str) -> GaiolaRef | None:
+        """Retorna a referência da gaiola, consultando o banco apenas em cache miss."""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._cache.get(codigo)
+            if item is not None and item[1] > agora:
+                self._cache.move_to_end(codigo)
+                self._hits += 1
+                return item[0]
+            self._misses += 1
+        row = (
+            db.query(Gaiola.id, Gaiola.codigo, Gaiola.hospital_id, Gaiola.status)
+            .filter(Gaiola.codigo == codigo)
+            .first()
+        )
+        if row is None:
+            return None
+        ref = GaiolaRef(*row)
+        self._guardar(ref)
+        return ref
+
+    def atualizar_status(self, codigo: str, status: StatusGaiola) -> None:
+        """Atualiza o status de uma entrada já em cache (não insere)."""
+        with self._lock:
+            item = self._cache.get(codigo)
+            if item is not None:
+                self._cache[codigo] = (item[0]._replace(status=status), item[1])
+
+    def invalidar(self, *codigos: str) -> None:
+        with self._lock:
+            for codigo in codigos:
+                self._cache.pop(codigo, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._hits = self._misses = 0
+
+    def metricas(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "tamanho": len(self._cache),
+                "capacidade": self.tamanho,
+            }
+
+    def _guardar(self, ref: GaiolaRef) -> None:
+        with self._lock:
+            self._cache[ref.codigo] = (ref, time.monotonic() + self.ttl)
+            self._cache.move_to_end(ref.codigo)
+            while len(self._cache) > self.tamanho:
+                self._cache.popitem(last=False)
+
+
+resolvedor = ResolvedorGaiolas()
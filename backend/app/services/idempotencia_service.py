@@ -0,0 +1,105 @@
+"""
+Idempotência das leituras da balança.
+
+Quando a rede oscila, a balança reenvia a mesma leitura. Cada leitura tem
+uma chave de idempotência — ``balanca_id`` + a chave enviada pela balança em
+``chave_idempotencia`` ou, na falta dela, ``balanca_id`` + código da gaiola +
+timestamp da leitura. A chave da balança vale só para ela: duas balanças que
+usem o mesmo contador não se confundem. Leituras sem chave e sem timestamp
+não são deduplicadas. O reenvio recebe a pesagem original (gaiola, peso e
+tipo gravados), não os dados da nova requisição.
+
+A chave é gravada em ``Pesagem.chave_idempotencia`` (índice único, a garantia
+final) e guardada em uma janela LRU em memória (``PESAGEM_DEDUP_TAMANHO``,
+``PESAGEM_DEDUP_TTL_S``), que responde os reenvios recentes sem passar pelo
+caminho de gravação.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Iterable, NamedTuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.gaiola import Gaiola
+from app.models.pesagem import Pesagem, TipoPesagem
+
+
+class PesagemRegistrada(NamedTuple):
+    pesagem_id: uuid.UUID
+    gaiola_id: uuid.UUID
+    gaiola_codigo: str
+    timestamp: datetime
+    tipo_pesagem: TipoPesagem
+    peso: float
+
+
+def chave_de(leitura) -> str | None:
+    """Retorna a chave de idempotência da leitura (``PesagemBalanca``), ou None."""
+    if leitura.chave_idempotencia:
+        return f"{leitura.balanca_id}|{leitura.chave_idempotencia}"
+    if leitura.timestamp is None:
+        return None
+    ts = leitura.timestamp if leitura.timestamp.tzinfo else leitura.timestamp.replace(tzinfo=timezone.utc)
+    return f"{leitura.balanca_id}|{leitura.gaiola_codigo}|{ts.astimezone(timezone.utc).isoformat()}"
+
+
+def buscar_no_banco(db: Session, chaves: Iterable[str]) -> dict[str, PesagemRegistrada]:
+    """Busca as pesagens já gravadas com as chaves informadas (uma consulta)."""
+    chaves = list(chaves)
+    if not chaves:
+        return {}
+    rows = (
+        db.query(
+            Pesagem.chave_idempotencia, Pesagem.id, Pesagem.gaiola_id, Gaiola.codigo, Pesagem.timestamp,
+            Pesagem.tipo_pesagem, Pesagem.peso,
+        )
+        .join(Gaiola, Gaiola.id == Pesagem.gaiola_id)
+        .filter(Pesagem.chave_idempotencia.in_(chaves))
+    )
+    return {
+        chave: PesagemRegistrada(pesagem_id, gaiola_id, codigo, timestamp, tipo, float(peso))
+        for chave, pesagem_id, gaiola_id, codigo, timestamp, tipo, peso in rows
+    }
+
+
+class JanelaDeduplicacao:
+    def __init__(self, tamanho: int = settings.PESAGEM_DEDUP_TAMANHO, ttl: float = settings.PESAGEM_DEDUP_TTL_S):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._itens: OrderedDict[str, tuple[PesagemRegistrada, float]] = OrderedDict()
+        self._lock = Lock()
+        self._duplicadas = 0
+
+    def obter(self, chave: str) -> PesagemRegistrada | None:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            if item[1] <= time.monotonic():
+                del self._itens[chave]
+                return None
+            self._duplicadas += 1
+            return item[0]
+
+    def guardar(self, chave: str, registro: PesagemRegistrada) -> None:
+        with self._lock:
+            self._itens[chave] = (registro, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+            self._duplicadas = 0
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"tamanho": len(self._itens), "capacidade": self.tamanho, "duplicadas": self._duplicadas}
+
+
+janela = JanelaDeduplicacao()
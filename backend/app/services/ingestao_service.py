@@ -0,0 +1,181 @@
+"""
+Serviço de ingestão em lote (group commit) das leituras da balança.
+
+Quando ativado (``PESAGEM_BUFFER_ATIVO``), ``/pesagens/balanca`` não grava
+cada leitura na própria transação: a leitura entra em uma fila em memória
+e uma thread de gravação junta as leituras em micro-lotes, limitados por
+tamanho (``PESAGEM_BUFFER_LOTE_MAX``) e pela latência máxima
+(``PESAGEM_BUFFER_LATENCIA_MAX_MS``), e grava cada lote com um único
+commit via ``balanca_service.registrar_pesagens_lote``. Quem enviou a
+leitura só recebe a resposta depois que o lote foi confirmado no banco.
+
+Se a confirmação não chegar em ``PESAGEM_BUFFER_TIMEOUT_S``, ``registrar``
+levanta ``concurrent.futures.TimeoutError``; a leitura pode ainda ser gravada pelo lote em
+andamento. Uma falha do lote é repassada a todas as leituras dele. Nos dois
+casos a balança pode reenviar a leitura: com ``chave_idempotencia`` ou
+``timestamp``, o reenvio de uma leitura já gravada devolve a pesagem
+original (``idempotencia_service``).
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from app.config import settings
+from app.database import SessionIngestao
+from app.services import balanca_service
+
+logger = logging.getLogger(__name__)
+
+_PARAR = object()
+
+
+def _gravar_no_banco(leituras: list) -> list[dict]:
+    db = SessionIngestao()
+    try:
+        return balanca_service.registrar_pesagens_lote(db, leituras)
+    finally:
+        db.close()
+
+
+class BufferPesagens:
+    """Fila de leituras gravadas em micro-lotes por uma thread dedicada."""
+
+    def __init__(
+        self,
+        gravar: Callable[[list], list[dict]] = _gravar_no_banco,
+        lote_max: int = settings.PESAGEM_BUFFER_LOTE_MAX,
+        latencia_max_ms: int = settings.PESAGEM_BUFFER_LATENCIA_MAX_MS,
+        fila_max: int = settings.PESAGEM_BUFFER_FILA_MAX,
+        timeout_s: float = settings.PESAGEM_BUFFER_TIMEOUT_S,
+    ):
+        self._gravar = gravar
+        self.timeout = timeout_s
+        self.lote_max = lote_max
+        self.latencia_max = latencia_max_ms / 1000.0
+        self._fila: queue.Queue = queue.Queue(maxsize=fila_max)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._metricas = {
+            "lotes": 0,
+            "leituras": 0,
+            "falhas": 0,
+            "maior_lote": 0,
+            "ultimo_lote": 0,
+            "tempo_gravacao_ms_total": 0.0,
+        }
+
+    def iniciar(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="buffer-pesagens", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """Grava o que estiver na fila e encerra a thread."""
+        if self._thread is not None:
+            self._fila.put(_PARAR)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def enviar(self, leitura, timeout: float | None = None) -> Future:
+        """Enfileira a leitura. Levanta ``queue.Full`` se a fila não liberar espaço a tempo."""
+        futuro: Future = Future()
+        self._fila.put((leitura, futuro), timeout=timeout)
+        return futuro
+
+    def registrar(self, leitura, timeout: float | None = None) -> dict:
+        """
+        Enfileira a leitura e aguarda o commit do lote em que ela foi gravada.
+        Levanta ``queue.Full``, ``concurrent.futures.TimeoutError`` (commit não confirmado a tempo)
+        ou a exceção da gravação do lote.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return self.enviar(leitura, timeout).result(timeout)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            m = dict(self._metricas)
+        m["tamanho_medio_lote"] = round(m["leituras"] / m["lotes"], 2) if m["lotes"] else 0.0
+        m["tempo_medio_gravacao_ms"] = round(m.pop("tempo_gravacao_ms_total") / m["lotes"], 2) if m["lotes"] else 0.0
+        m["fila"] = self._fila.qsize()
+        return m
+
+    def _executar(self) -> None:
+        parar = False
+        while not parar:
+            item = self._fila.get()
+            if item is _PARAR:
+                break
+            lote = [item]
+            prazo = time.monotonic() + self.latencia_max
+            while len(lote) < self.lote_max:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _PARAR:
+                    parar = True
+                    break
+                lote.append(item)
+            self._gravar_lote(lote)
+
+        # Esvazia o que chegou depois do pedido de parada
+        restantes = []
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _PARAR:
+                restantes.append(item)
+        for i in range(0, len(restantes), self.lote_max):
+            self._gravar_lote(restantes[i:i + self.lote_max])
+
+    def _gravar_lote(self, lote: list) -> None:
+        inicio = time.perf_counter()
+        try:
+            resultados = self._gravar([leitura for leitura, _ in lote])
+        except Exception as exc:
+            logger.exception("Falha ao gravar lote de %d pesagens", len(lote))
+            with self._lock:
+                self._metricas["falhas"] += 1
+            for _, futuro in lote:
+                futuro.set_exception(exc)
+            return
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self._metricas["lotes"] += 1
+            self._metricas["leituras"] += len(lote)
+            self._metricas["ultimo_lote"] = len(lote)
+            self._metricas["maior_lote"] = max(self._metricas["maior_lote"], len(lote))
+            self._metricas["tempo_gravacao_ms_total"] += duracao_ms
+        for (_, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+
+_buffer: BufferPesagens | None = None
+
+
+def get_buffer() -> BufferPesagens | None:
+    """Retorna o buffer ativo, ou None se a ingestão em lote estiver desligada."""
+    return _buffer
+
+
+def iniciar(buffer: BufferPesagens | None = None) -> BufferPesagens:
+    global _buffer
+    if _buffer is None:
+        _buffer = buffer or BufferPesagens()
+        _buffer.iniciar()
+    return _buffer
+
+
+def parar() -> None:
+    global _buffer
+    if _buffer is not None:
+        _buffer.parar()
+        _buffer = None
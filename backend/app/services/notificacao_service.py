@@ -1,21 +1,133 @@
 """
 Serviço de notificações.
 
-Mantém um log em memória das mudanças de status das gaiolas.
-Em produção, este serviço pode ser estendido para enviar e-mails,
-webhooks ou mensagens via WebSocket.
+``notificar_mudanca_status`` não executa nenhum efeito colateral no caminho
+da requisição: o evento entra na fila limitada do despachante
+(``despacho_service``) e um pool de workers o entrega, em lotes, a cada
+destino registrado:
+- ``DestinoPersistencia``: log persistente (tabela ``notificacoes``)
+- ``DestinoBarramento``: barramento entre workers (``barramento_service``),
+  que a central SSE (``eventos_service``) de cada worker assina
+- ``DestinoLog``: log de auditoria ``STATUS_CHANGE``
+- ``DestinoWebhook``: POST do lote em ``NOTIFICACOES_WEBHOOK_URL``, se configurada
+- ``webhook_service.DestinoWebhooksHospitais``: webhooks assinados pelos hospitais
+
+Cada destino tem suas próprias tentativas e fila de mortos. A consulta grava
+antes, em uma tentativa, os eventos pendentes do próprio worker
+(``descarregar_em(persistencia)``), para que ele sempre enxergue o que
+acabou de notificar; barramento e webhooks ficam com o pool de workers e
+nunca atrasam a leitura.
 """
-from datetime import datetime, timezone
-from collections import deque
-from threading import Lock
 import logging
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+from fastapi import Response
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionIngestao
+from app.models.notificacao import Notificacao
+from app.services import barramento_service, eventos_service, webhook_service
+from app.services.barramento_service import serializar
+from app.services.despacho_service import Despachante
+from app.utils.paginacao import paginar
 
 logger = logging.getLogger(__name__)
 
-# Capacidade máxima do log em memória (evita crescimento ilimitado)
-_MAX_NOTIFICACOES = 500
-_notificacoes: deque[dict] = deque(maxlen=_MAX_NOTIFICACOES)
-_lock = Lock()
+
+def _gravar_no_banco(eventos: list[dict], db: Session | None = None) -> None:
+    sessao = db or SessionIngestao()
+    try:
+        sessao.execute(insert(Notificacao), eventos)
+        sessao.commit()
+    except Exception:
+        sessao.rollback()
+        raise
+    finally:
+        if db is None:
+            sessao.close()
+
+
+class DestinoPersistencia:
+    nome = "persistencia"
+
+    def entregar(self, eventos: list[dict], db: Session | None = None) -> None:
+        _gravar_no_banco(eventos, db)
+
+
+class DestinoBarramento:
+    nome = "barramento"
+
+    def entregar(self, eventos: list[dict], **_) -> None:
+        for evento in eventos:
+            barramento_service.barramento.publicar(evento)
+
+
+class DestinoLog:
+    nome = "log"
+
+    def entregar(self, eventos: list[dict], **_) -> None:
+        for evento in eventos:
+            logger.info(
+                "STATUS_CHANGE gaiola=%s %s → %s usuario=%s",
+                evento["gaiola_codigo"],
+                evento["status_anterior"],
+                evento["status_novo"],
+                evento["usuario"] or "sistema",
+            )
+
+
+class DestinoWebhook:
+    nome = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self._cliente = httpx.Client(timeout=timeout)
+
+    def entregar(self, eventos: list[dict], **_) -> None:
+        corpo = "[" + ",".join(serializar(evento) for evento in eventos) + "]"
+        resposta = self._cliente.post(self.url, content=corpo, headers={"Content-Type": "application/json"})
+        resposta.raise_for_status()
+
+
+def _destinos() -> list:
+    destinos = [
+        DestinoBarramento(),
+        DestinoLog(),
+        webhook_service.DestinoWebhooksHospitais(webhook_service.entregador),
+    ]
+    if settings.NOTIFICACOES_WEBHOOK_URL:
+        destinos.append(DestinoWebhook(settings.NOTIFICACOES_WEBHOOK_URL))
+    return destinos
+
+
+persistencia = DestinoPersistencia()
+despachante = Despachante(
+    [persistencia, *_destinos()],
+    workers=settings.NOTIFICACOES_WORKERS,
+    lote_max=settings.NOTIFICACOES_LOTE_MAX,
+    latencia_max_ms=settings.NOTIFICACOES_LATENCIA_MAX_MS,
+    fila_max=settings.NOTIFICACOES_FILA_MAX,
+    tentativas=settings.NOTIFICACOES_TENTATIVAS,
+)
+barramento_service.barramento.assinar(eventos_service.central.publicar)
+
+
+def iniciar(despachar: bool = True) -> None:
+    """Inicia a escuta do barramento, o entregador de webhooks e, se ``despachar``, o pool de workers do despachante."""
+    barramento_service.barramento.iniciar()
+    webhook_service.entregador.iniciar()
+    if despachar:
+        despachante.iniciar()
+
+
+def parar() -> None:
+    despachante.parar()
+    webhook_service.entregador.parar()
+    barramento_service.barramento.parar()
 
 
 def notificar_mudanca_status(
@@ -26,36 +138,63 @@ def notificar_mudanca_status(
     observacoes: str | None = None,
 ) -> None:
     """
-    Registra uma mudança de status de gaiola no log de notificações
-    e emite um log de auditoria.
+    Enfileira uma mudança de status de gaiola para os destinos de notificação.
+    Retorna imediatamente; a entrega é feita pelos workers do despachante.
     """
     evento = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "id": uuid.uuid4(),
+        "timestamp": datetime.now(timezone.utc),
         "gaiola_codigo": gaiola_codigo,
         "status_anterior": status_anterior,
         "status_novo": status_novo,
         "usuario": usuario,
         "observacoes": observacoes,
     }
-    with _lock:
-        _notificacoes.appendleft(evento)
-
-    logger.info(
-        "STATUS_CHANGE gaiola=%s %s → %s usuario=%s",
-        gaiola_codigo,
-        status_anterior,
-        status_novo,
-        usuario or "sistema",
+    despachante.enviar(evento)
+
+
+def listar_notificacoes(
+    db: Session,
+    response: Response,
+    since: datetime | None = None,
+    gaiola_codigo: str | None = None,
+    status_novo: str | None = None,
+    limite: int = 50,
+    cursor: str | None = None,
+) -> list[Notificacao]:
+    """
+    Consulta o log de notificações.
+
+    Sem ``since``, retorna as mais recentes primeiro e o cursor avança para
+    as mais antigas. Com ``since``, retorna em ordem cronológica a partir do
+    instante informado (exclusivo), para quem acompanha o log por polling.
+    """
+    despachante.descarregar_em(persistencia, db=db)
+    query = db.query(Notificacao)
+    if since is not None:
+        query = query.filter(Notificacao.timestamp > since)
+    if gaiola_codigo:
+        query = query.filter(Notificacao.gaiola_codigo == gaiola_codigo)
+    if status_novo:
+        query = query.filter(Notificacao.status_novo == status_novo)
+    return paginar(
+        query, Notificacao.timestamp, Notificacao.id, response, limite, cursor, descendente=since is None
     )
 
 
-def get_notificacoes_recentes(limite: int = 50) -> list[dict]:
-    """Retorna as notificações mais recentes (mais nova primeiro)."""
-    with _lock:
-        return list(_notificacoes)[:limite]
+def eventos_apos(db: Session, cursor: str, limite: int) -> list[dict]:
+    """Eventos gravados depois do cursor (``Last-Event-ID`` do stream), em ordem cronológica."""
+    despachante.descarregar_em(persistencia, db=db)
+    notificacoes = paginar(
+        db.query(Notificacao), Notificacao.timestamp, Notificacao.id, Response(), limite, cursor
+    )
+    return [
+        {coluna.key: getattr(n, coluna.key) for coluna in Notificacao.__table__.columns}
+        for n in notificacoes
+    ]
 
 
 def limpar_notificacoes() -> None:
-    """Limpa o log em memória (útil em testes)."""
-    with _lock:
-        _notificacoes.clear()
+    """Descarta os eventos ainda não entregues e a fila de mortos (útil em testes)."""
+    despachante.limpar()
+    webhook_service.entregador.limpar()
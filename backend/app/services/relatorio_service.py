@@ -3,96 +3,183 @@ Serviço de relatórios.
 
 Centraliza a lógica de:
 - Montar linhas de dados para exportação (Excel / CSV)
-- Calcular métricas de produtividade por período
+- Exportar CSV em streaming e Excel em modo write-only, lendo as gaiolas em lotes
+- Calcular métricas de produtividade por período (agregadas no banco)
 - Relatório de divergências de peso
 """
 import io
 import csv
+import tempfile
+import uuid as _uuid
 from datetime import date, datetime, timezone
-from typing import Optional
+from typing import IO, Iterable, Iterator, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from sqlalchemy.orm import Query, Session, joinedload
 
 from app.models.gaiola import Gaiola, StatusGaiola
-from app.models.pesagem import TipoPesagem
+from app.models.hospital import Hospital
 from app.models.processo import Processo
-from app.services.balanca_service import calcular_divergencia
+from app.models.resumo_pesagem import ResumoPesagem
 
+# Quantidade de gaiolas lidas do banco (e linhas emitidas) por lote na exportação
+LOTE_EXPORTACAO = 1000
 
-def _get_peso(pesagens, tipo: TipoPesagem) -> Optional[float]:
-    for p in pesagens:
-        if p.tipo_pesagem == tipo:
-            return float(p.peso)
-    return None
+# Tamanho dos blocos (bytes) ao transmitir arquivos gerados em disco
+TAMANHO_BLOCO_ARQUIVO = 64 * 1024
 
+COLUNAS_EXPEDICAO = [
+    "ID Gaiola",
+    "Código",
+    "Hospital",
+    "Peso Saída (kg)",
+    "Peso Recebimento (kg)",
+    "Peso Expedição (kg)",
+    "Divergência (%)",
+    "Status",
+    "Data Criação",
+]
 
-def _query_gaiolas(
-    db: Session,
-    hospital_id: Optional[str] = None,
-    data_inicio: Optional[date] = None,
-    data_fim: Optional[date] = None,
-) -> list[Gaiola]:
-    query = db.query(Gaiola)
-    if hospital_id:
-        query = query.filter(Gaiola.hospital_id == hospital_id)
+
+def _float(valor) -> Optional[float]:
+    return float(valor) if valor is not None else None
+
+
+def _get_peso(resumo: Optional[ResumoPesagem], campo: str) -> Optional[float]:
+    return _float(getattr(resumo, campo)) if resumo is not None else None
+
+
+def _filtrar_periodo(query: Query, coluna, data_inicio: Optional[date], data_fim: Optional[date]) -> Query:
     if data_inicio:
         query = query.filter(
-            Gaiola.data_criacao >= datetime(data_inicio.year, data_inicio.month, data_inicio.day, tzinfo=timezone.utc)
+            coluna >= datetime(data_inicio.year, data_inicio.month, data_inicio.day, tzinfo=timezone.utc)
         )
     if data_fim:
         query = query.filter(
-            Gaiola.data_criacao <= datetime(data_fim.year, data_fim.month, data_fim.day, 23, 59, 59, tzinfo=timezone.utc)
+            coluna <= datetime(data_fim.year, data_fim.month, data_fim.day, 23, 59, 59, tzinfo=timezone.utc)
         )
-    return query.all()
+    return query
+
+
+def _filtrar_gaiolas(
+    query: Query,
+    hospital_id: Optional[str] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+) -> Query:
+    if hospital_id:
+        query = query.filter(Gaiola.hospital_id == _uuid.UUID(str(hospital_id)))
+    return _filtrar_periodo(query, Gaiola.data_criacao, data_inicio, data_fim)
+
+
+def _query_gaiolas(
+    db: Session,
+    hospital_id: Optional[str] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+) -> Query:
+    query = db.query(Gaiola).options(
+        joinedload(Gaiola.hospital),
+        joinedload(Gaiola.resumo_pesagem),
+    )
+    return _filtrar_gaiolas(query, hospital_id, data_inicio, data_fim)
+
+
+def _row_expedicao(g: Gaiola) -> dict:
+    resumo = g.resumo_pesagem
+    peso_saida = _get_peso(resumo, "peso_saida")
+    peso_rec = _get_peso(resumo, "peso_recebimento")
+    peso_exp = _get_peso(resumo, "peso_expedicao")
+    divergencia = _get_peso(resumo, "divergencia")
+    return {
+        "ID Gaiola": str(g.id),
+        "Código": g.codigo,
+        "Hospital": g.hospital.nome if g.hospital else "",
+        "Peso Saída (kg)": peso_saida or "",
+        "Peso Recebimento (kg)": peso_rec or "",
+        "Peso Expedição (kg)": peso_exp or "",
+        "Divergência (%)": divergencia or "",
+        "Status": g.status.value,
+        "Data Criação": g.data_criacao.strftime("%d/%m/%Y %H:%M") if g.data_criacao else "",
+    }
 
 
 def build_rows_expedicao(gaiolas: list[Gaiola]) -> list[dict]:
     """Monta linhas para o relatório de expedição."""
-    rows = []
-    for g in gaiolas:
-        peso_saida = _get_peso(g.pesagens, TipoPesagem.SAIDA_HOSPITAL)
-        peso_rec = _get_peso(g.pesagens, TipoPesagem.RECEBIMENTO_LAVANDERIA)
-        peso_exp = _get_peso(g.pesagens, TipoPesagem.EXPEDICAO)
-        divergencia = calcular_divergencia(g.pesagens)
-        rows.append({
-            "ID Gaiola": str(g.id),
-            "Código": g.codigo,
-            "Hospital": g.hospital.nome if g.hospital else "",
-            "Peso Saída (kg)": peso_saida or "",
-            "Peso Recebimento (kg)": peso_rec or "",
-            "Peso Expedição (kg)": peso_exp or "",
-            "Divergência (%)": divergencia or "",
-            "Status": g.status.value,
-            "Data Criação": g.data_criacao.strftime("%d/%m/%Y %H:%M") if g.data_criacao else "",
-        })
-    return rows
-
-
-def gerar_excel(rows: list[dict]) -> io.BytesIO:
-    """Gera um arquivo Excel em memória a partir das linhas fornecidas."""
+    return [_row_expedicao(g) for g in gaiolas]
+
+
+def iter_gaiolas_em_lotes(query: Query, lote: int = LOTE_EXPORTACAO) -> Iterator[Gaiola]:
+    """
+    Percorre a consulta com cursor no servidor, carregando ``lote`` gaiolas por vez.
+
+    A ordenação estável garante que a exportação seja determinística.
+    """
+    return iter(query.order_by(Gaiola.data_criacao, Gaiola.id).yield_per(lote))
+
+
+def gerar_excel(
+    rows: Iterable[dict],
+    colunas: Optional[list[str]] = None,
+    titulo: str = "Relatório Expedição",
+) -> IO[bytes]:
+    """
+    Gera um arquivo Excel em modo write-only, gravado em arquivo temporário.
+
+    As linhas são consumidas uma a uma e não ficam retidas como células,
+    então a memória usada não depende do total de linhas. Sem ``colunas``,
+    o cabeçalho vem das chaves da primeira linha.
+    """
     import openpyxl
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Relatório Expedição"
-    if rows:
-        ws.append(list(rows[0].keys()))
-        for row in rows:
-            ws.append(list(row.values()))
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return buf
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    rows = iter(rows)
+    if colunas is None:
+        primeira = next(rows, None)
+        if primeira is not None:
+            colunas = list(primeira.keys())
+            ws.append(colunas)
+            ws.append([primeira[c] for c in colunas])
+    elif colunas:
+        ws.append(colunas)
+    for row in rows:
+        ws.append([row[c] for c in colunas])
+    arquivo = tempfile.TemporaryFile()
+    wb.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+
+def iter_arquivo(arquivo: IO[bytes], tamanho: int = TAMANHO_BLOCO_ARQUIVO) -> Iterator[bytes]:
+    """Lê o arquivo em blocos para transmissão e o fecha ao final."""
+    try:
+        while bloco := arquivo.read(tamanho):
+            yield bloco
+    finally:
+        arquivo.close()
 
 
-def gerar_csv(rows: list[dict]) -> io.BytesIO:
-    """Gera um arquivo CSV em memória a partir das linhas fornecidas."""
+def stream_csv(rows: Iterator[dict], colunas: list[str], lote: int = LOTE_EXPORTACAO) -> Iterator[bytes]:
+    """
+    Emite um CSV em blocos de bytes UTF-8 (com BOM no primeiro bloco).
+
+    O buffer é esvaziado a cada ``lote`` linhas, então a memória usada
+    não depende do total de linhas.
+    """
     buf = io.StringIO()
-    if rows:
-        writer = csv.DictWriter(buf, fieldnames=list(rows[0].keys()))
-        writer.writeheader()
-        writer.writerows(rows)
+    writer = csv.DictWriter(buf, fieldnames=colunas)
+    writer.writeheader()
+    yield buf.getvalue().encode("utf-8-sig")
     buf.seek(0)
-    return io.BytesIO(buf.getvalue().encode("utf-8-sig"))
+    buf.truncate()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % lote == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
 
 
 def relatorio_expedicao_excel(
@@ -100,10 +187,12 @@ def relatorio_expedicao_excel(
     hospital_id: Optional[str] = None,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
-) -> io.BytesIO:
-    gaiolas = _query_gaiolas(db, hospital_id, data_inicio, data_fim)
-    rows = build_rows_expedicao(gaiolas)
-    return gerar_excel(rows)
+    lote: int = LOTE_EXPORTACAO,
+) -> Iterator[bytes]:
+    """Gera o Excel de expedição em disco e o devolve em blocos para streaming."""
+    gaiolas = iter_gaiolas_em_lotes(_query_gaiolas(db, hospital_id, data_inicio, data_fim), lote)
+    rows = (_row_expedicao(g) for g in gaiolas)
+    return iter_arquivo(gerar_excel(rows, COLUNAS_EXPEDICAO))
 
 
 def relatorio_expedicao_csv(
@@ -111,30 +200,115 @@ def relatorio_expedicao_csv(
     hospital_id: Optional[str] = None,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
-) -> io.BytesIO:
-    gaiolas = _query_gaiolas(db, hospital_id, data_inicio, data_fim)
-    rows = build_rows_expedicao(gaiolas)
-    return gerar_csv(rows)
+    lote: int = LOTE_EXPORTACAO,
+) -> Iterator[bytes]:
+    """Gera o CSV de expedição em streaming, sem materializar o relatório."""
+    gaiolas = iter_gaiolas_em_lotes(_query_gaiolas(db, hospital_id, data_inicio, data_fim), lote)
+    rows = (_row_expedicao(g) for g in gaiolas)
+    return stream_csv(rows, COLUNAS_EXPEDICAO, lote)
 
 
 def relatorio_divergencias(
     db: Session,
     limite_percentual: float = 5.0,
+    hospital_id: Optional[str] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    ordem: str = "desc",
+    skip: int = 0,
+    limit: Optional[int] = None,
 ) -> list[dict]:
-    """Retorna gaiolas com divergência de peso acima do limite."""
+    """
+    Retorna gaiolas com divergência de peso acima do limite.
+
+    A consulta parte do índice de ``resumos_pesagem.divergencia`` e devolve
+    as gaiolas ordenadas pela divergência (``ordem`` = ``desc`` ou ``asc``).
+    """
+    ordenacao = ResumoPesagem.divergencia.asc() if ordem == "asc" else ResumoPesagem.divergencia.desc()
+    query = (
+        db.query(
+            Gaiola.codigo,
+            Hospital.nome,
+            ResumoPesagem.peso_saida,
+            ResumoPesagem.peso_expedicao,
+            ResumoPesagem.divergencia,
+        )
+        .join(ResumoPesagem, ResumoPesagem.gaiola_id == Gaiola.id)
+        .outerjoin(Hospital, Hospital.id == Gaiola.hospital_id)
+        .filter(ResumoPesagem.divergencia >= limite_percentual)
+    )
+    query = _filtrar_gaiolas(query, hospital_id, data_inicio, data_fim)
+    query = query.order_by(ordenacao, Gaiola.codigo).offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = query.all()
+    return [
+        {
+            "gaiola_codigo": codigo,
+            "hospital": hospital or "",
+            "peso_saida": _float(peso_saida),
+            "peso_expedicao": _float(peso_exp),
+            "divergencia_percentual": _float(div),
+        }
+        for codigo, hospital, peso_saida, peso_exp, div in rows
+    ]
+
+
+def _duracao_minutos(db: Session, inicio, fim):
+    """Expressão SQL com a duração ``fim - inicio`` em minutos, conforme o dialeto."""
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(fim) - func.julianday(inicio)) * 1440.0
+    return func.extract("epoch", fim - inicio) / 60.0
+
+
+def _agregados_gaiolas(query: Query):
+    peso_exp = func.coalesce(func.sum(ResumoPesagem.peso_expedicao), 0)
+    entregues = func.coalesce(func.sum(case((Gaiola.status == StatusGaiola.ENTREGUE, 1), else_=0)), 0)
+    return query.add_columns(func.count(Gaiola.id), entregues, peso_exp).outerjoin(
+        ResumoPesagem, ResumoPesagem.gaiola_id == Gaiola.id
+    )
+
+
+def _produtividade_por_grupo(
+    db: Session,
+    group_by: str,
+    data_inicio: Optional[date],
+    data_fim: Optional[date],
+) -> list[dict]:
+    if group_by == "maquina":
+        duracao = _duracao_minutos(db, Processo.data_inicio, Processo.data_fim)
+        query = (
+            db.query(Processo.maquina_id, func.count(Processo.id), func.avg(duracao))
+            .filter(Processo.data_inicio.isnot(None), Processo.data_fim.isnot(None))
+            .group_by(Processo.maquina_id)
+            .order_by(Processo.maquina_id)
+        )
+        query = _filtrar_periodo(query, Processo.data_inicio, data_inicio, data_fim)
+        return [
+            {"grupo": maquina, "processos_concluidos": total, "tempo_medio_min": round(float(media), 1)}
+            for maquina, total, media in query.all()
+        ]
+
+    if group_by == "hospital":
+        chave = (Hospital.id, Hospital.nome)
+        query = db.query(*chave).select_from(Gaiola).join(Hospital, Hospital.id == Gaiola.hospital_id)
+    else:
+        chave = (func.date(Gaiola.data_criacao),)
+        query = db.query(*chave).select_from(Gaiola)
+    query = _agregados_gaiolas(query).group_by(*chave).order_by(*chave[::-1])
+    query = _filtrar_periodo(query, Gaiola.data_criacao, data_inicio, data_fim)
     resultado = []
-    for g in db.query(Gaiola).all():
-        div = calcular_divergencia(g.pesagens)
-        if div is not None and div >= limite_percentual:
-            peso_saida = _get_peso(g.pesagens, TipoPesagem.SAIDA_HOSPITAL)
-            peso_exp = _get_peso(g.pesagens, TipoPesagem.EXPEDICAO)
-            resultado.append({
-                "gaiola_codigo": g.codigo,
-                "hospital": g.hospital.nome if g.hospital else "",
-                "peso_saida": peso_saida,
-                "peso_expedicao": peso_exp,
-                "divergencia_percentual": div,
-            })
+    for row in query.all():
+        *grupo, total, entregues, peso = row
+        item = {
+            "grupo": str(grupo[-1]),
+            "total_gaiolas": total,
+            "entregues": int(entregues),
+            "peso_total_expedido_kg": round(float(peso), 3),
+        }
+        if group_by == "hospital":
+            item["hospital_id"] = str(grupo[0])
+        resultado.append(item)
     return resultado
 
 
@@ -142,6 +316,7 @@ def relatorio_produtividade(
     db: Session,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
+    group_by: Optional[str] = None,
 ) -> dict:
     """
     Relatório de produtividade por período.
@@ -152,51 +327,57 @@ def relatorio_produtividade(
     - peso total expedido
     - número de processos concluídos por etapa
     - tempo médio de processamento por etapa (em minutos)
-    """
-    gaiola_query = db.query(Gaiola)
-    processo_query = db.query(Processo)
+    - percentis 50/90 do tempo por etapa (somente PostgreSQL)
+    - quebra opcional por ``hospital``, ``day`` ou ``maquina`` (``group_by``)
 
-    if data_inicio:
-        dt_ini = datetime(data_inicio.year, data_inicio.month, data_inicio.day, tzinfo=timezone.utc)
-        gaiola_query = gaiola_query.filter(Gaiola.data_criacao >= dt_ini)
-        processo_query = processo_query.filter(Processo.data_inicio >= dt_ini)
-    if data_fim:
-        dt_fim = datetime(data_fim.year, data_fim.month, data_fim.day, 23, 59, 59, tzinfo=timezone.utc)
-        gaiola_query = gaiola_query.filter(Gaiola.data_criacao <= dt_fim)
-        processo_query = processo_query.filter(Processo.data_inicio <= dt_fim)
-
-    gaiolas = gaiola_query.all()
-    processos = processo_query.all()
+    Todas as métricas são agregadas no banco (GROUP BY), sem carregar
+    gaiolas ou processos em memória.
+    """
+    status_query = _agregados_gaiolas(db.query(Gaiola.status)).group_by(Gaiola.status)
+    status_query = _filtrar_periodo(status_query, Gaiola.data_criacao, data_inicio, data_fim)
 
-    # Contagem por status
     por_status: dict[str, int] = {}
     peso_total_expedido = 0.0
-    for g in gaiolas:
-        s = g.status.value
-        por_status[s] = por_status.get(s, 0) + 1
-        peso_exp = _get_peso(g.pesagens, TipoPesagem.EXPEDICAO)
-        if peso_exp:
-            peso_total_expedido += peso_exp
-
-    # Tempo médio por etapa (processos concluídos)
-    etapa_tempos: dict[str, list[float]] = {}
-    for p in processos:
-        if p.data_inicio and p.data_fim:
-            duracao = (p.data_fim - p.data_inicio).total_seconds() / 60.0
-            etapa = p.etapa.value
-            etapa_tempos.setdefault(etapa, []).append(duracao)
-
-    tempo_medio_por_etapa = {
-        etapa: round(sum(tempos) / len(tempos), 1)
-        for etapa, tempos in etapa_tempos.items()
-    }
-    processos_por_etapa = {etapa: len(tempos) for etapa, tempos in etapa_tempos.items()}
+    for status, total, _, peso in status_query.all():
+        por_status[status.value] = total
+        peso_total_expedido += float(peso)
 
-    return {
-        "total_gaiolas": len(gaiolas),
+    # Processos concluídos por etapa
+    duracao = _duracao_minutos(db, Processo.data_inicio, Processo.data_fim)
+    colunas = [Processo.etapa, func.count(Processo.id), func.avg(duracao)]
+    com_percentis = db.get_bind().dialect.name == "postgresql"
+    if com_percentis:
+        colunas += [
+            func.percentile_cont(0.5).within_group(duracao),
+            func.percentile_cont(0.9).within_group(duracao),
+        ]
+    etapa_query = (
+        db.query(*colunas)
+        .filter(Processo.data_inicio.isnot(None), Processo.data_fim.isnot(None))
+        .group_by(Processo.etapa)
+    )
+    etapa_query = _filtrar_periodo(etapa_query, Processo.data_inicio, data_inicio, data_fim)
+
+    processos_por_etapa: dict[str, int] = {}
+    tempo_medio_por_etapa: dict[str, float] = {}
+    percentis_por_etapa: dict[str, dict] = {}
+    for etapa, total, media, *percentis in etapa_query.all():
+        processos_por_etapa[etapa.value] = total
+        tempo_medio_por_etapa[etapa.value] = round(float(media), 1)
+        if percentis:
+            p50, p90 = percentis
+            percentis_por_etapa[etapa.value] = {"p50": round(float(p50), 1), "p90": round(float(p90), 1)}
+
+    resultado = {
+        "total_gaiolas": sum(por_status.values()),
         "entregues": por_status.get("ENTREGUE", 0),
         "peso_total_expedido_kg": round(peso_total_expedido, 3),
         "por_status": por_status,
         "processos_concluidos_por_etapa": processos_por_etapa,
         "tempo_medio_min_por_etapa": tempo_medio_por_etapa,
     }
+    if com_percentis:
+        resultado["percentis_min_por_etapa"] = percentis_por_etapa
+    if group_by:
+        resultado["por_grupo"] = _produtividade_por_grupo(db, group_by, data_inicio, data_fim)
+    return resultado
@@ -0,0 +1,72 @@
+"""
+Lista de revogação dos tokens de acesso.
+
+Os tokens carregam ``uid``, ``tipo`` e ``ver`` (``Usuario.versao_token``),
+o que basta para autorizar a requisição sem consultar o banco. Para revogar
+os tokens de um usuário (desativação, troca de perfil, e-mail ou senha), a
+rota incrementa ``versao_token``; a partir daí tokens com versão menor são
+recusados.
+
+Cada worker mantém em memória ``uid → versao_token`` dos usuários com versão
+maior que zero. O worker que fez a alteração registra a nova versão na hora;
+os demais recarregam a lista com uma consulta a cada
+``REVOGACAO_INTERVALO_S`` segundos, feita pela primeira requisição
+autenticada após o intervalo.
+"""
+import time
+import uuid
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.user import Usuario
+
+
+class RevogacaoTokens:
+    def __init__(self, intervalo: float = settings.REVOGACAO_INTERVALO_S):
+        self.intervalo = intervalo
+        self._versoes: dict[uuid.UUID, int] = {}
+        self._proxima_carga = 0.0
+        self._lock = Lock()
+        self._metricas = {"verificados": 0, "recusados": 0, "cargas": 0}
+
+    def revogado(self, db: Session, uid: uuid.UUID, versao: int) -> bool:
+        """True se o token com essa versão não vale mais para o usuário."""
+        if time.monotonic() >= self._proxima_carga:
+            self._carregar(db)
+        with self._lock:
+            self._metricas["verificados"] += 1
+            recusado = versao < self._versoes.get(uid, 0)
+            if recusado:
+                self._metricas["recusados"] += 1
+        return recusado
+
+    def registrar(self, uid: uuid.UUID, versao: int) -> None:
+        """Registra a nova versão do usuário, recusando já neste worker os tokens anteriores."""
+        with self._lock:
+            self._versoes[uid] = max(versao, self._versoes.get(uid, 0))
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._versoes.clear()
+            self._proxima_carga = 0.0
+            self._metricas = dict.fromkeys(self._metricas, 0)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {**self._metricas, "usuarios": len(self._versoes)}
+
+    def _carregar(self, db: Session) -> None:
+        versoes = dict(db.query(Usuario.id, Usuario.versao_token).filter(Usuario.versao_token > 0))
+        with self._lock:
+            # Mantém registros locais mais novos que o banco ainda não confirmou para esta sessão
+            for uid, versao in self._versoes.items():
+                if versao > versoes.get(uid, 0):
+                    versoes[uid] = versao
+            self._versoes = versoes
+            self._proxima_carga = time.monotonic() + self.intervalo
+            self._metricas["cargas"] += 1
+
+
+revogacao = RevogacaoTokens()
@@ -0,0 +1,110 @@
+"""
+Pool dedicado para hash e verificação de senhas (bcrypt).
+
+Cada verificação custa centenas de milissegundos de CPU (``BCRYPT_ROUNDS``).
+Em vez de rodar no event loop (``/login`` da interface web) ou ocupar o pool
+de threads das rotas síncronas, as operações vão para um pool próprio de
+``SENHA_POOL_WORKERS`` threads (o bcrypt libera o GIL durante o hash, então
+threads bastam para usar todos os núcleos). O pool é limitado: com
+``SENHA_POOL_WORKERS + SENHA_POOL_FILA_MAX`` operações em andamento, as
+seguintes são recusadas com ``PoolSenhasCheio`` em vez de acumular logins
+esperando.
+
+As rotas assíncronas aguardam o resultado com ``await``; as síncronas
+bloqueiam apenas a própria thread.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from app.config import settings
+from app.utils.security import get_password_hash, verificar_e_atualizar
+
+
+class PoolSenhasCheio(Exception):
+    def __init__(self):
+        super().__init__("Muitos logins simultâneos, tente novamente")
+
+
+class PoolSenhas:
+    def __init__(self, workers: int = settings.SENHA_POOL_WORKERS, fila_max: int = settings.SENHA_POOL_FILA_MAX):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacidade = self.workers + fila_max
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="senha")
+        self._vagas = threading.BoundedSemaphore(self.capacidade)
+        self._lock = threading.Lock()
+        self._em_andamento = 0
+        self._metricas = {"verificacoes": 0, "hashes": 0, "rehashes": 0, "recusadas": 0}
+        self._tempo_total = 0.0
+
+    def verificar(self, senha: str, senha_hash: str) -> tuple[bool, str | None]:
+        """Verifica a senha; o segundo item é o novo hash se o atual usa outro custo."""
+        return self._submeter(self._verificar, senha, senha_hash).result()
+
+    async def verificar_async(self, senha: str, senha_hash: str) -> tuple[bool, str | None]:
+        return await asyncio.wrap_future(self._submeter(self._verificar, senha, senha_hash))
+
+    def gerar_hash(self, senha: str) -> str:
+        return self._submeter(self._gerar_hash, senha).result()
+
+    async def gerar_hash_async(self, senha: str) -> str:
+        return await asyncio.wrap_future(self._submeter(self._gerar_hash, senha))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            concluidas = self._metricas["verificacoes"] + self._metricas["hashes"]
+            return {
+                **self._metricas,
+                "em_andamento": self._em_andamento,
+                "workers": self.workers,
+                "capacidade": self.capacidade,
+                "tempo_medio_ms": round(self._tempo_total / concluidas * 1000, 1) if concluidas else 0.0,
+            }
+
+    def _submeter(self, fn: Callable, *args) -> Future:
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self._metricas["recusadas"] += 1
+            raise PoolSenhasCheio()
+        with self._lock:
+            self._em_andamento += 1
+        try:
+            return self._executor.submit(self._executar, fn, *args)
+        except RuntimeError:
+            self._liberar()
+            raise
+
+    def _executar(self, fn: Callable, *args):
+        # Libera a vaga antes de entregar o resultado, para quem aguarda já encontrá-la livre
+        try:
+            return fn(*args)
+        finally:
+            self._liberar()
+
+    def _liberar(self) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+        self._vagas.release()
+
+    def _verificar(self, senha: str, senha_hash: str) -> tuple[bool, str | None]:
+        inicio = time.perf_counter()
+        valida, novo_hash = verificar_e_atualizar(senha, senha_hash)
+        with self._lock:
+            self._metricas["verificacoes"] += 1
+            self._metricas["rehashes"] += novo_hash is not None
+            self._tempo_total += time.perf_counter() - inicio
+        return valida, novo_hash
+
+    def _gerar_hash(self, senha: str) -> str:
+        inicio = time.perf_counter()
+        senha_hash = get_password_hash(senha)
+        with self._lock:
+            self._metricas["hashes"] += 1
+            self._tempo_total += time.perf_counter() - inicio
+        return senha_hash
+
+
+senhas = PoolSenhas()
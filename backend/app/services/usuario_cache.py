@@ -0,0 +1,82 @@
+"""
+Cache do usuário autenticado.
+
+Toda requisição autenticada resolve o ``sub`` do token (e-mail) para o
+``Usuario``. Este módulo guarda, por processo, os dados do usuário ativo em
+um cache LRU limitado (``USUARIO_CACHE_TAMANHO``) com expiração curta
+(``USUARIO_CACHE_TTL_S``), compartilhado por ``get_current_user``,
+``get_optional_user``, ``require_web_user`` e ``get_stream_user``.
+
+Em um acerto, a dependência recebe uma instância nova de ``Usuario``, fora
+de qualquer sessão, montada a partir das colunas guardadas: serve para ler
+``id``, ``email``, ``tipo_usuario`` etc., mas não para navegar
+relacionamentos. Só usuários ativos entram no cache. As rotas de
+``/auth/usuarios`` que desativam o usuário ou mudam seu ``tipo_usuario``
+invalidam a entrada; nos demais workers ela expira pelo TTL.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.user import Usuario
+
+_COLUNAS = [coluna.key for coluna in Usuario.__table__.columns]
+
+
+class CacheUsuarios:
+    def __init__(self, tamanho: int = settings.USUARIO_CACHE_TAMANHO, ttl: float = settings.USUARIO_CACHE_TTL_S):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._cache: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def obter(self, db: Session, email: str) -> Usuario | None:
+        """Retorna o usuário ativo com esse e-mail, consultando o banco apenas em cache miss."""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._cache.get(email)
+            if item is not None and item[1] > agora:
+                self._cache.move_to_end(email)
+                self._hits += 1
+                return Usuario(**item[0])
+            self._misses += 1
+        user = db.query(Usuario).filter(Usuario.email == email, Usuario.ativo == True).first()  # noqa: E712
+        if user is not None:
+            self._guardar(email, {coluna: getattr(user, coluna) for coluna in _COLUNAS})
+        return user
+
+    def invalidar(self, *emails: str) -> None:
+        with self._lock:
+            for email in emails:
+                self._cache.pop(email, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._hits = self._misses = 0
+
+    def metricas(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "consultas_evitadas": self._hits,
+                "consultas": self._misses,
+                "consultas_evitadas_por_requisicao": round(self._hits / total, 4) if total else 0.0,
+                "tamanho": len(self._cache),
+                "capacidade": self.tamanho,
+            }
+
+    def _guardar(self, email: str, dados: dict) -> None:
+        with self._lock:
+            self._cache[email] = (dados, time.monotonic() + self.ttl)
+            self._cache.move_to_end(email)
+            while len(self._cache) > self.tamanho:
+                self._cache.popitem(last=False)
+
+
+usuarios = CacheUsuarios()
@@ -0,0 +1,319 @@
+"""
+Webhooks de integração com os hospitais.
+
+Os hospitais assinam (``WebhookHospital``) os eventos das suas gaiolas:
+- ``ENTREGUE``: a gaiola voltou ao hospital
+- ``DIVERGENCIA``: a gaiola ficou pronta para expedição com divergência de
+  peso (saída × expedição) acima de ``LIMITE_DIVERGENCIA_PADRAO``
+
+``DestinoWebhooksHospitais`` é um destino do despacho de notificações
+(``notificacao_service``): para cada lote de mudanças de status, resolve em
+uma consulta as gaiolas e as assinaturas dos seus hospitais e entrega os
+eventos ao ``EntregadorWebhooks``.
+
+O entregador não faz uma chamada por evento. Os eventos de cada assinatura
+são acumulados por ``WEBHOOK_JANELA_MS`` (ou até ``WEBHOOK_LOTE_MAX``) e
+enviados juntos em um POST. As entregas rodam em paralelo em um pool de
+``WEBHOOK_CONCORRENCIA`` threads, com um cliente HTTP compartilhado (conexões
+reaproveitadas), e cada assinatura tem no máximo um lote em voo, o que
+preserva a ordem dos eventos. Falhas são repetidas com espera exponencial
+(``WEBHOOK_ESPERA_INICIAL_S`` dobrando até ``WEBHOOK_ESPERA_MAX_S``); após
+``WEBHOOK_TENTATIVAS`` o lote é descartado e contado.
+
+Remover a assinatura (``remover``) descarta a fila dela na hora, inclusive
+as novas tentativas de um lote em voo. Filas vazias e sem uso há
+``FILA_OCIOSA_S`` segundos são descartadas pelo próprio entregador.
+
+Só são aceitas URLs ``https`` cujo host resolva para endereços públicos
+(``validar_url``): o servidor não faz POST para a própria rede interna.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionIngestao
+from app.models.gaiola import Gaiola, StatusGaiola
+from app.models.resumo_pesagem import ResumoPesagem
+from app.models.webhook import TipoEventoWebhook, WebhookHospital
+from app.services.balanca_service import LIMITE_DIVERGENCIA_PADRAO
+
+logger = logging.getLogger(__name__)
+
+ASSINATURA_HEADER = "X-Webhook-Assinatura"
+# Tempo sem eventos até a fila de uma assinatura ser descartada
+FILA_OCIOSA_S = 300.0
+
+
+def validar_url(url: str) -> None:
+    """Recusa URLs que não sejam ``https`` ou cujo host resolva para loopback, link-local ou rede privada."""
+    partes = urlsplit(url)
+    if partes.scheme != "https":
+        raise ValueError("A URL do webhook deve usar https")
+    try:
+        enderecos = {info[4][0] for info in socket.getaddrinfo(partes.hostname, partes.port or 443,
+                                                               type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Host '{partes.hostname}' não encontrado")
+    for endereco in enderecos:
+        # Endereços IPv6 com escopo vêm como "fe80::1%eth0"
+        if not ipaddress.ip_address(endereco.split("%")[0]).is_global:
+            raise ValueError("A URL do webhook não pode apontar para a rede interna")
+
+
+@dataclass
+class _FilaAssinatura:
+    url: str
+    segredo: str | None
+    hospital_id: str
+    eventos: deque = field(default_factory=deque)
+    prazo: float = 0.0
+    espera_ate: float = 0.0
+    tentativas: int = 0
+    ocupada: bool = False
+    removida: bool = False
+    ultimo_uso: float = field(default_factory=time.monotonic)
+
+
+class EntregadorWebhooks:
+    def __init__(
+        self,
+        janela_ms: int = settings.WEBHOOK_JANELA_MS,
+        lote_max: int = settings.WEBHOOK_LOTE_MAX,
+        concorrencia: int = settings.WEBHOOK_CONCORRENCIA,
+        tentativas: int = settings.WEBHOOK_TENTATIVAS,
+        espera_inicial_s: float = settings.WEBHOOK_ESPERA_INICIAL_S,
+        espera_max_s: float = settings.WEBHOOK_ESPERA_MAX_S,
+        pendentes_max: int = settings.WEBHOOK_PENDENTES_MAX,
+        timeout_s: float = settings.WEBHOOK_TIMEOUT_S,
+        transporte: httpx.BaseTransport | None = None,
+    ):
+        self.janela = janela_ms / 1000.0
+        self.lote_max = lote_max
+        self.concorrencia = concorrencia
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial_s
+        self.espera_max = espera_max_s
+        self.pendentes_max = pendentes_max
+        self._timeout = timeout_s
+        self._transporte = transporte
+        self._cliente: httpx.Client | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._parar = False
+        self._cond = threading.Condition()
+        self._filas: dict[uuid.UUID, _FilaAssinatura] = {}
+        self._metricas = {
+            "eventos": 0, "lotes_enviados": 0, "eventos_entregues": 0,
+            "falhas": 0, "lotes_descartados": 0, "eventos_descartados": 0,
+        }
+
+    def adicionar(self, assinatura: WebhookHospital, eventos: list[dict]) -> None:
+        """Acumula eventos para a assinatura; o envio acontece ao fim da janela."""
+        with self._cond:
+            fila = self._filas.get(assinatura.id)
+            if fila is None:
+                fila = self._filas[assinatura.id] = _FilaAssinatura(
+                    assinatura.url, assinatura.segredo, str(assinatura.hospital_id)
+                )
+            fila.url, fila.segredo = assinatura.url, assinatura.segredo
+            fila.ultimo_uso = time.monotonic()
+            if not fila.eventos:
+                fila.prazo = time.monotonic() + self.janela
+            fila.eventos.extend(eventos)
+            self._metricas["eventos"] += len(eventos)
+            excesso = len(fila.eventos) - self.pendentes_max
+            for _ in range(max(excesso, 0)):
+                fila.eventos.popleft()
+                self._metricas["eventos_descartados"] += 1
+            self._cond.notify()
+
+    def remover(self, assinatura_id: uuid.UUID) -> None:
+        """Descarta a fila da assinatura removida; um lote em voo não é repetido."""
+        with self._cond:
+            fila = self._filas.pop(assinatura_id, None)
+            if fila is not None:
+                fila.removida = True
+                self._metricas["eventos_descartados"] += len(fila.eventos)
+                fila.eventos.clear()
+
+    def iniciar(self) -> None:
+        if self._thread is None:
+            self._parar = False
+            self._cliente = httpx.Client(
+                timeout=self._timeout,
+                transport=self._transporte,
+                limits=httpx.Limits(max_connections=self.concorrencia, max_keepalive_connections=self.concorrencia),
+            )
+            self._executor = ThreadPoolExecutor(self.concorrencia, thread_name_prefix="webhook")
+            self._thread = threading.Thread(target=self._executar, name="webhooks-hospitais", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """Envia o que estiver acumulado (uma tentativa) e encerra o pool."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._parar = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._cliente.close()
+        self._thread = self._executor = self._cliente = None
+
+    def limpar(self) -> None:
+        with self._cond:
+            self._filas.clear()
+            self._metricas = dict.fromkeys(self._metricas, 0)
+
+    def metricas(self) -> dict:
+        with self._cond:
+            return {
+                **self._metricas,
+                "assinaturas": len(self._filas),
+                "pendentes": sum(len(f.eventos) for f in self._filas.values()),
+                "em_voo": sum(1 for f in self._filas.values() if f.ocupada),
+            }
+
+    def _executar(self) -> None:
+        with self._cond:
+            while True:
+                agora = time.monotonic()
+                proximo = None
+                for assinatura_id, fila in list(self._filas.items()):
+                    if not fila.ocupada and not fila.eventos:
+                        expira_em = fila.ultimo_uso + FILA_OCIOSA_S
+                        if expira_em <= agora:
+                            del self._filas[assinatura_id]
+                        elif proximo is None or expira_em < proximo:
+                            proximo = expira_em
+                        continue
+                    if fila.ocupada:
+                        continue
+                    pronto_em = fila.espera_ate if len(fila.eventos) >= self.lote_max else max(fila.prazo, fila.espera_ate)
+                    if self._parar or pronto_em <= agora:
+                        self._despachar(fila)
+                    elif proximo is None or pronto_em < proximo:
+                        proximo = pronto_em
+                if self._parar and not any(f.ocupada for f in self._filas.values()):
+                    return
+                self._cond.wait(None if proximo is None else proximo - agora)
+
+    def _despachar(self, fila: _FilaAssinatura) -> None:
+        # Chamado com o lock: retira o lote e agenda o envio no pool
+        lote = [fila.eventos.popleft() for _ in range(min(self.lote_max, len(fila.eventos)))]
+        fila.ocupada = True
+        self._executor.submit(self._enviar, fila, lote)
+
+    def _enviar(self, fila: _FilaAssinatura, lote: list[dict]) -> None:
+        corpo = json.dumps({"hospital_id": fila.hospital_id, "eventos": lote}, ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json"}
+        if fila.segredo:
+            assinatura = hmac.new(fila.segredo.encode(), corpo, hashlib.sha256).hexdigest()
+            headers[ASSINATURA_HEADER] = f"sha256={assinatura}"
+        try:
+            self._cliente.post(fila.url, content=corpo, headers=headers).raise_for_status()
+            erro = None
+        except httpx.HTTPError as exc:
+            erro = exc
+        with self._cond:
+            fila.ocupada = False
+            fila.ultimo_uso = time.monotonic()
+            if erro is None:
+                fila.tentativas = 0
+                self._metricas["lotes_enviados"] += 1
+                self._metricas["eventos_entregues"] += len(lote)
+            else:
+                fila.tentativas += 1
+                self._metricas["falhas"] += 1
+                if fila.tentativas >= self.tentativas or self._parar or fila.removida:
+                    logger.error("Webhook %s falhou %d vezes; %d eventos descartados: %s",
+                                 fila.url, fila.tentativas, len(lote), erro)
+                    fila.tentativas = 0
+                    self._metricas["lotes_descartados"] += 1
+                    self._metricas["eventos_descartados"] += len(lote)
+                else:
+                    # Devolve o lote à frente da fila para manter a ordem dos eventos
+                    fila.eventos.extendleft(reversed(lote))
+                    espera = min(self.espera_inicial * 2 ** (fila.tentativas - 1), self.espera_max)
+                    fila.espera_ate = time.monotonic() + espera
+            if fila.eventos:
+                # O que chegou enquanto o lote estava em voo já esperou o bastante
+                fila.prazo = time.monotonic()
+            self._cond.notify()
+
+
+def _evento_webhook(evento: dict, tipo: TipoEventoWebhook, divergencia) -> dict:
+    return {
+        "id": str(evento["id"]),
+        "tipo": tipo.value,
+        "timestamp": evento["timestamp"].isoformat(),
+        "gaiola_codigo": evento["gaiola_codigo"],
+        "status_novo": evento["status_novo"],
+        "divergencia": float(divergencia) if divergencia is not None else None,
+    }
+
+
+class DestinoWebhooksHospitais:
+    """Destino do despacho de notificações que alimenta o entregador de webhooks."""
+
+    nome = "webhooks_hospitais"
+
+    def __init__(self, entregador: EntregadorWebhooks, limite_divergencia: float = LIMITE_DIVERGENCIA_PADRAO):
+        self.entregador = entregador
+        self.limite_divergencia = limite_divergencia
+
+    def entregar(self, eventos: list[dict], db: Session | None = None) -> None:
+        relevantes = [
+            e for e in eventos
+            if e["status_novo"] in (StatusGaiola.ENTREGUE.value, StatusGaiola.PRONTA_EXPEDICAO.value)
+        ]
+        if not relevantes:
+            return
+        sessao = db or SessionIngestao()
+        try:
+            rows = (
+                sessao.query(Gaiola.codigo, ResumoPesagem.divergencia, WebhookHospital)
+                .join(WebhookHospital, WebhookHospital.hospital_id == Gaiola.hospital_id)
+                .outerjoin(ResumoPesagem, ResumoPesagem.gaiola_id == Gaiola.id)
+                .filter(Gaiola.codigo.in_({e["gaiola_codigo"] for e in relevantes}), WebhookHospital.ativo.is_(True))
+                .all()
+            )
+        finally:
+            if db is None:
+                sessao.close()
+        por_gaiola: dict[str, list] = {}
+        for codigo, divergencia, assinatura in rows:
+            por_gaiola.setdefault(codigo, []).append((divergencia, assinatura))
+
+        por_assinatura: dict[uuid.UUID, tuple[WebhookHospital, list[dict]]] = {}
+        for evento in relevantes:
+            for divergencia, assinatura in por_gaiola.get(evento["gaiola_codigo"], ()):
+                if evento["status_novo"] == StatusGaiola.ENTREGUE.value:
+                    tipo = TipoEventoWebhook.ENTREGUE
+                elif divergencia is not None and float(divergencia) > self.limite_divergencia:
+                    tipo = TipoEventoWebhook.DIVERGENCIA
+                else:
+                    continue
+                if tipo.value in assinatura.tipos:
+                    por_assinatura.setdefault(assinatura.id, (assinatura, []))[1].append(
+                        _evento_webhook(evento, tipo, divergencia)
+                    )
+        for assinatura, lote in por_assinatura.values():
+            self.entregador.adicionar(assinatura, lote)
+
+
+entregador = EntregadorWebhooks()
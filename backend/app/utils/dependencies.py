@@ -1,8 +1,11 @@
+import uuid as _uuid
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import Usuario
+from app.models.user import Usuario, TipoUsuario
+from app.services.revogacao_tokens import revogacao
+from app.services.usuario_cache import usuarios
 from app.utils.security import decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
@@ -20,10 +23,7 @@ def get_current_user(
     payload = decode_token(token)
     if payload is None:
         raise credentials_exception
-    email: str = payload.get("sub")
-    if email is None:
-        raise credentials_exception
-    user = db.query(Usuario).filter(Usuario.email == email, Usuario.ativo == True).first()  # noqa: E712
+    user = _principal(payload, db)
     if user is None:
         raise credentials_exception
     return user
@@ -37,7 +37,65 @@ def get_current_active_user(current_user: Usuario = Depends(get_current_user)) -
 
 def get_optional_user(request: Request, db: Session = Depends(get_db)) -> Usuario | None:
     """Get user from session cookie for web routes."""
-    token = request.cookies.get("access_token")
+    return _user_from_token(request.cookies.get("access_token"), db)
+
+
+def get_stream_user(request: Request, db: Session = Depends(get_db)) -> Usuario:
+    """Require a user from the Bearer header or, for browser EventSource clients, the session cookie."""
+    auth = request.headers.get("Authorization", "")
+    token = auth[7:] if auth.lower().startswith("bearer ") else request.cookies.get("access_token")
+    payload = decode_token(token) if token else None
+    user = _principal(payload, db) if payload else None
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciais inválidas",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+def _principal(payload: dict, db: Session) -> Usuario | None:
+    """
+    Monta o usuário a partir das claims do token, sem consultar o banco.
+
+    O resultado é uma instância de ``Usuario`` fora da sessão, só com ``id``,
+    ``email``, ``tipo_usuario`` e ``versao_token``. Tokens emitidos antes das
+    claims (apenas ``sub``) são resolvidos pelo cache de usuários e valem
+    como versão 0, revogados como os demais.
+    """
+    email = payload.get("sub")
+    if email is None:
+        return None
+    uid, tipo, versao = payload.get("uid"), payload.get("tipo"), payload.get("ver")
+    if uid is None or tipo is None or versao is None:
+        return _usuario_sem_claims(db, email, versao)
+    try:
+        user = Usuario(id=_uuid.UUID(uid), email=email, tipo_usuario=TipoUsuario(tipo), ativo=True,
+                       versao_token=int(versao))
+    except (TypeError, ValueError):
+        return None
+    if revogacao.revogado(db, user.id, user.versao_token):
+        return None
+    return user
+
+
+def _usuario_sem_claims(db: Session, email: str, versao) -> Usuario | None:
+    """Usuário do cache para um token sem todas as claims, recusado se a versão dele foi revogada."""
+    user = usuarios.obter(db, email)
+    if user is None:
+        return None
+    try:
+        versao = int(versao or 0)
+    except (TypeError, ValueError):
+        return None
+    if versao < (user.versao_token or 0) or revogacao.revogado(db, user.id, versao):
+        return None
+    return user
+
+
+def _user_from_token(token: str | None, db: Session) -> Usuario | None:
+    """Usuário completo (com ``nome`` etc.) do token, para as páginas web."""
     if not token:
         return None
     payload = decode_token(token)
@@ -46,7 +104,7 @@ def get_optional_user(request: Request, db: Session = Depends(get_db)) -> Usuari
     email: str = payload.get("sub")
     if email is None:
         return None
-    return db.query(Usuario).filter(Usuario.email == email, Usuario.ativo == True).first()  # noqa: E712
+    return _usuario_sem_claims(db, email, payload.get("ver"))
 
 
 def require_web_user(request: Request, db: Session = Depends(get_db)) -> Usuario:
@@ -0,0 +1,70 @@
+"""
+Paginação por cursor (keyset).
+
+O cursor é opaco para o cliente: codifica em base64 o par (coluna de
+ordenação, id) da última linha da página. A página seguinte é obtida com
+``WHERE (coluna, id) > (:valor, :id)`` (ou ``<`` na ordem decrescente),
+apoiada por um índice composto, então o custo não cresce com a profundidade
+da página.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(valor: datetime, id_: uuid.UUID) -> str:
+    payload = json.dumps([valor.isoformat(), str(id_)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, id_ = json.loads(payload)
+        return datetime.fromisoformat(valor), uuid.UUID(id_)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def paginar(
+    query: Query,
+    coluna,
+    coluna_id,
+    response: Response,
+    limit: int,
+    cursor: str | None = None,
+    skip: int = 0,
+    descendente: bool = False,
+) -> list:
+    """
+    Aplica ordenação estável por (coluna, id) e a página pedida.
+
+    Com ``cursor``, usa keyset e ignora ``skip``. Quando há mais linhas,
+    o cursor da próxima página vai no cabeçalho ``X-Next-Cursor``.
+    """
+    if descendente:
+        query = query.order_by(coluna.desc(), coluna_id.desc())
+    else:
+        query = query.order_by(coluna, coluna_id)
+    if cursor:
+        valor, id_ = decode_cursor(cursor)
+        chave = tuple_(coluna, coluna_id)
+        limite = tuple_(literal(valor, coluna.type), literal(id_, coluna_id.type))
+        query = query.filter(chave < limite if descendente else chave > limite)
+    elif skip:
+        query = query.offset(skip)
+    itens = query.limit(limit + 1).all()
+    if len(itens) > limit:
+        itens = itens[:limit]
+        ultimo = itens[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(ultimo, coluna.key), getattr(ultimo, coluna_id.key)
+        )
+    return itens
@@ -4,17 +4,32 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verificar_e_atualizar(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verifica a senha e, se o hash usa outro custo que ``BCRYPT_ROUNDS``, devolve o hash refeito."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def claims_usuario(user) -> dict:
+    """Claims que permitem autorizar a requisição sem consultar o banco."""
+    return {
+        "sub": user.email,
+        "uid": str(user.id),
+        "tipo": user.tipo_usuario.value,
+        "ver": user.versao_token or 0,
+    }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,56 @@
+"""
+Benchmark do detector de peso estável.
+
+Gera um fluxo sintético de amostras (balança vazia, carga com ruído,
+acomodação, retirada) para várias balanças e mede quantas amostras por
+segundo o ``GestorBalancas`` processa em um único worker.
+
+Uso:
+    cd backend
+    python benchmarks/bench_estabilizacao.py [amostras_por_balanca] [balancas] [tamanho_lote]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.estabilizacao_service import GestorBalancas  # noqa: E402
+
+TAXA_HZ = 50
+
+
+def _fluxo(total: int, semente: int) -> list[tuple[float, float]]:
+    rnd = random.Random(semente)
+    amostras = []
+    for i in range(total):
+        fase = i % 500
+        if fase < 50:
+            peso = 0.0
+        elif fase < 100:
+            peso = 45.0 + rnd.uniform(-5, 5)
+        elif fase < 450:
+            peso = 45.0 + rnd.gauss(0, 0.01)
+        else:
+            peso = 0.0
+        amostras.append((i / TAXA_HZ, peso))
+    return amostras
+
+
+def main(por_balanca: int, balancas: int, tamanho_lote: int) -> None:
+    gestor = GestorBalancas()
+    fluxos = {f"BAL-{b}": _fluxo(por_balanca, b) for b in range(balancas)}
+    inicio = time.perf_counter()
+    for pos in range(0, por_balanca, tamanho_lote):
+        for balanca_id, fluxo in fluxos.items():
+            gestor.processar(balanca_id, ("GAIOLA", "saida_hospital"), fluxo[pos:pos + tamanho_lote])
+    duracao = time.perf_counter() - inicio
+    m = gestor.metricas()
+    print(f"{m['amostras_processadas']} amostras de {balancas} balanças em {duracao:.2f}s "
+          f"({m['amostras_processadas'] / duracao:,.0f} amostras/s), {m['pesos_emitidos']} pesos emitidos")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [100_000, 10, 250][len(args):]))
@@ -0,0 +1,58 @@
+"""
+Benchmark da exportação Excel em modo write-only.
+
+Mede tempo e pico de RSS do processo ao gerar, com
+``relatorio_service.gerar_excel``, volumes crescentes de linhas
+sintéticas, sem banco de dados. Como o pico de RSS só cresce, um
+valor estável entre 10 mil e 1 milhão de linhas indica memória constante.
+
+Uso:
+    cd backend
+    python benchmarks/bench_exportacao_excel.py [10000 100000 1000000]
+"""
+import os
+import resource
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.relatorio_service import COLUNAS_EXPEDICAO, gerar_excel  # noqa: E402
+
+
+def _rows(total: int):
+    for i in range(total):
+        yield {
+            "ID Gaiola": str(uuid.uuid4()),
+            "Código": f"GAI-{i:07d}",
+            "Hospital": "Hospital São Lucas",
+            "Peso Saída (kg)": 45.5,
+            "Peso Recebimento (kg)": 45.2,
+            "Peso Expedição (kg)": 44.9,
+            "Divergência (%)": 1.32,
+            "Status": "ENTREGUE",
+            "Data Criação": "17/10/2026 08:00",
+        }
+
+
+def _pico_rss_mib() -> float:
+    # ru_maxrss é em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(tamanhos: list[int]) -> None:
+    gerar_excel(_rows(100), COLUNAS_EXPEDICAO).close()  # aquecimento (imports do openpyxl)
+    print(f"{'linhas':>10} {'tempo (s)':>10} {'pico RSS (MiB)':>15} {'arquivo (MiB)':>14}")
+    for total in sorted(tamanhos):
+        inicio = time.perf_counter()
+        arquivo = gerar_excel(_rows(total), COLUNAS_EXPEDICAO)
+        duracao = time.perf_counter() - inicio
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        arquivo.close()
+        print(f"{total:>10} {duracao:>10.2f} {_pico_rss_mib():>15.1f} {tamanho / 2**20:>14.2f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,83 @@
+"""
+Benchmark de ingestão de leituras da balança.
+
+Compara o caminho de uma leitura por requisição (``POST /pesagens/balanca``)
+com o envio em lote (``POST /pesagens/balanca/lote``), usando um banco
+SQLite temporário e o TestClient do FastAPI.
+
+Uso:
+    cd backend
+    python benchmarks/bench_ingestao_balanca.py [leituras] [tamanho_lote]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+# O benchmark mede o caminho de gravação: sem limite de taxa por balança nem de concorrência
+os.environ["PESAGEM_TAXA_POR_BALANCA"] = "0"
+os.environ["PESAGEM_CONCORRENCIA_MAX"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.gaiola import Gaiola, StatusGaiola  # noqa: E402
+from app.models.hospital import Hospital  # noqa: E402
+
+TIPOS = ["saida_hospital", "recebimento_lavanderia", "expedicao"]
+
+
+def _preparar(total_gaiolas: int) -> list[str]:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    hospital = Hospital(id=uuid.uuid4(), nome="Hospital Benchmark", ativo=True)
+    codigos = [f"BENCH-{i:05d}" for i in range(total_gaiolas)]
+    db.add_all([
+        Gaiola(id=uuid.uuid4(), codigo=c, hospital=hospital, status=StatusGaiola.CRIADA) for c in codigos
+    ])
+    db.commit()
+    db.close()
+    return codigos
+
+
+def _leituras(codigos: list[str], total: int) -> list[dict]:
+    return [
+        {
+            "gaiola_codigo": codigos[i % len(codigos)],
+            "peso": 40.0 + i % 10,
+            "tipo_pesagem": TIPOS[i % len(TIPOS)],
+            "balanca_id": f"BAL-{i % 8}",
+        }
+        for i in range(total)
+    ]
+
+
+def main(total: int, tamanho_lote: int) -> None:
+    client = TestClient(app)
+    print(f"{'caminho':>10} {'leituras':>9} {'tempo (s)':>10} {'leituras/s':>11}")
+
+    leituras = _leituras(_preparar(200), total)
+    inicio = time.perf_counter()
+    for leitura in leituras:
+        assert client.post("/api/v1/pesagens/balanca", json=leitura).status_code == 201
+    duracao = time.perf_counter() - inicio
+    print(f"{'unitário':>10} {total:>9} {duracao:>10.2f} {total / duracao:>11.0f}")
+
+    leituras = _leituras(_preparar(200), total)
+    inicio = time.perf_counter()
+    for i in range(0, total, tamanho_lote):
+        resp = client.post("/api/v1/pesagens/balanca/lote", json=leituras[i:i + tamanho_lote])
+        assert resp.status_code == 200 and resp.json()["erros"] == 0
+    duracao = time.perf_counter() - inicio
+    print(f"{'lote':>10} {total:>9} {duracao:>10.2f} {total / duracao:>11.0f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [2000, 500][len(args):]))
@@ -0,0 +1,120 @@
+"""
+Benchmark de logins simultâneos (troca de turno).
+
+Sobe a API com uvicorn (um worker, banco SQLite temporário) em um
+subprocesso, cria ``--usuarios`` operadores e dispara todos os logins de uma
+vez pelo formulário web (``POST /login``, rota assíncrona) ou pela API
+(``POST /api/v1/auth/token``). Enquanto isso, uma sonda pede ``GET /login`` a
+cada 20 ms: se o bcrypt rodasse no event loop, a latência da sonda subiria
+para a soma das verificações.
+
+Uso:
+    cd backend
+    python benchmarks/bench_login.py --usuarios 60 --rounds 12 --rota web
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+
+
+def _preparar(total: int, rounds: int) -> None:
+    os.environ["BCRYPT_ROUNDS"] = str(rounds)
+    from app.database import Base, SessionLocal, engine
+    from app.models.user import Usuario, TipoUsuario
+    from app.utils.security import get_password_hash
+
+    Base.metadata.create_all(bind=engine)
+    senha_hash = get_password_hash("turno123")
+    db = SessionLocal()
+    db.add_all([
+        Usuario(id=uuid.uuid4(), nome=f"Operador {i}", email=f"op{i}@bench.com", senha_hash=senha_hash,
+                tipo_usuario=TipoUsuario.OPERADOR_LAVANDERIA, ativo=True)
+        for i in range(total)
+    ])
+    db.commit()
+    db.close()
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _sonda(cliente: httpx.AsyncClient, parar: asyncio.Event, latencias: list[float]) -> None:
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await cliente.get("/login")
+        latencias.append(time.perf_counter() - inicio)
+        await asyncio.sleep(0.02)
+
+
+async def _login(cliente: httpx.AsyncClient, i: int, rota: str) -> tuple[int, float]:
+    inicio = time.perf_counter()
+    if rota == "web":
+        r = await cliente.post("/login", data={"email": f"op{i}@bench.com", "senha": "turno123"})
+    else:
+        r = await cliente.post("/api/v1/auth/token", json={"email": f"op{i}@bench.com", "senha": "turno123"})
+    return r.status_code, time.perf_counter() - inicio
+
+
+async def main(args) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_login.db')}"
+    _preparar(args.usuarios, args.rounds)
+    porta = _porta_livre()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta), "--log-level", "warning"],
+        cwd=_BACKEND, env=os.environ.copy(),
+    )
+    try:
+        limites = httpx.Limits(max_connections=args.usuarios + 10)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", limits=limites, timeout=120) as cliente:
+            for _ in range(100):
+                try:
+                    await cliente.get("/login")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            parar, sonda = asyncio.Event(), []
+            tarefa_sonda = asyncio.create_task(_sonda(cliente, parar, sonda))
+            inicio = time.perf_counter()
+            resultados = await asyncio.gather(*(_login(cliente, i, args.rota) for i in range(args.usuarios)))
+            duracao = time.perf_counter() - inicio
+            parar.set()
+            await tarefa_sonda
+            metricas = (await cliente.get("/api/v1/auth/cache", headers={
+                "Authorization": "Bearer " + (await cliente.post("/api/v1/auth/token", json={
+                    "email": "op0@bench.com", "senha": "turno123"})).json()["access_token"]
+            })).json().get("senhas", {})
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    ok = sum(1 for status, _ in resultados if status in (200, 302))
+    tempos = sorted(t for _, t in resultados)
+    print(f"{ok}/{args.usuarios} logins ({args.rota}, bcrypt {args.rounds} rounds) em {duracao:.2f}s "
+          f"→ {ok / duracao:.1f} logins/s")
+    print(f"latência do login: mediana {statistics.median(tempos) * 1000:.0f} ms, máx {tempos[-1] * 1000:.0f} ms")
+    print(f"sonda GET /login durante os logins: mediana {statistics.median(sonda) * 1000:.1f} ms, "
+          f"máx {max(sonda) * 1000:.1f} ms ({len(sonda)} amostras)")
+    print(f"pool de senhas: {metricas}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--rota", choices=["web", "api"], default="web")
+    asyncio.run(main(parser.parse_args()))
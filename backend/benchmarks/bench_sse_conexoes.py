@@ -0,0 +1,128 @@
+"""
+Benchmark de conexões ociosas no stream SSE de notificações.
+
+Sobe a API com uvicorn (um worker, banco SQLite temporário) em um
+subprocesso, abre N conexões em ``/api/v1/notificacoes/stream`` e mede a
+memória (RSS) do servidor antes e depois. Em seguida altera o status de uma
+gaiola e mede quanto tempo o evento leva para chegar a todas as conexões.
+
+Uso:
+    cd backend
+    python benchmarks/bench_sse_conexoes.py [conexoes]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+_DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_sse.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.gaiola import Gaiola, StatusGaiola  # noqa: E402
+from app.models.hospital import Hospital  # noqa: E402
+from app.models.user import Usuario, TipoUsuario  # noqa: E402
+from app.utils.security import create_access_token, get_password_hash  # noqa: E402
+
+
+def _preparar() -> tuple[str, str]:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(Usuario(id=uuid.uuid4(), nome="Bench", email="bench@test.com",
+                   senha_hash=get_password_hash("bench"), tipo_usuario=TipoUsuario.ADMIN, ativo=True))
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="SSE-BENCH", status=StatusGaiola.CRIADA,
+                    hospital=Hospital(id=uuid.uuid4(), nome="Hospital SSE", ativo=True))
+    db.add(gaiola)
+    db.commit()
+    gaiola_id = str(gaiola.id)
+    db.close()
+    return create_access_token({"sub": "bench@test.com"}), gaiola_id
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for linha in f:
+            if linha.startswith("VmRSS:"):
+                return int(linha.split()[1]) / 1024
+    return 0.0
+
+
+async def _conectar(porta: int, token: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    writer.write(
+        f"GET /api/v1/notificacoes/stream HTTP/1.1\r\nHost: bench\r\n"
+        f"Authorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+
+async def _aguardar_evento(reader: asyncio.StreamReader) -> float:
+    while True:
+        linha = await reader.readline()
+        if b"SSE-BENCH" in linha:
+            return time.perf_counter()
+
+
+async def main(total: int) -> None:
+    token, gaiola_id = _preparar()
+    porta = _porta_livre()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta), "--log-level", "warning",
+         "--limit-concurrency", str(total + 100), "--backlog", str(total + 100)],
+        cwd=_BACKEND, env={**os.environ, "SSE_HEARTBEAT_S": "30"},
+    )
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", porta)).close()
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        rss_inicial = _rss_mib(servidor.pid)
+
+        inicio = time.perf_counter()
+        conexoes = []
+        for i in range(0, total, 200):
+            conexoes += await asyncio.gather(*(_conectar(porta, token) for _ in range(min(200, total - i))))
+        print(f"{total} conexões abertas em {time.perf_counter() - inicio:.2f}s")
+        await asyncio.sleep(1)
+        rss_final = _rss_mib(servidor.pid)
+        print(f"RSS do servidor: {rss_inicial:.1f} MiB → {rss_final:.1f} MiB "
+              f"({(rss_final - rss_inicial) * 1024 / total:.1f} KiB por conexão)")
+
+        esperas = [asyncio.create_task(_aguardar_evento(r)) for r, _ in conexoes]
+        reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+        corpo = b'{"status": "EM_LAVAGEM"}'
+        enviado = time.perf_counter()
+        writer.write(
+            f"PUT /api/v1/gaiolas/{gaiola_id} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n".encode() + corpo
+        )
+        chegadas = await asyncio.wait_for(asyncio.gather(*esperas), timeout=60)
+        print(f"evento entregue às {total} conexões em {(max(chegadas) - enviado) * 1000:.0f} ms "
+              f"(primeira em {(min(chegadas) - enviado) * 1000:.0f} ms)")
+        writer.close()
+        for _, w in conexoes:
+            w.close()
+    finally:
+        # O shutdown gracioso do uvicorn espera os streams abertos; não precisamos dele aqui
+        servidor.kill()
+        servidor.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000))
@@ -0,0 +1,66 @@
+"""
+Benchmark da entrega de webhooks aos hospitais.
+
+Sobe o receptor local (``receptor_webhooks.py``) e alimenta o
+``EntregadorWebhooks`` com eventos espalhados entre várias assinaturas, como
+o despacho de notificações faria. Mede quantas chamadas HTTP foram feitas
+(contra uma por evento sem agrupamento) e a vazão até o último evento ser
+entregue.
+
+Uso:
+    cd backend
+    python benchmarks/bench_webhooks.py --assinaturas 200 --eventos 20000 --latencia-ms 20 --falhas 0.05
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.webhook import WebhookHospital  # noqa: E402
+from app.services.webhook_service import EntregadorWebhooks  # noqa: E402
+from receptor_webhooks import ReceptorWebhooks  # noqa: E402
+
+
+def main(args) -> None:
+    receptor = ReceptorWebhooks(latencia_ms=args.latencia_ms, falhas=args.falhas)
+    threading.Thread(target=receptor.serve_forever, daemon=True).start()
+    assinaturas = [
+        WebhookHospital(id=uuid.uuid4(), hospital_id=uuid.uuid4(), url=f"http://127.0.0.1:{receptor.porta}/h{i}")
+        for i in range(args.assinaturas)
+    ]
+    entregador = EntregadorWebhooks(
+        janela_ms=args.janela_ms, concorrencia=args.concorrencia, espera_inicial_s=0.05, espera_max_s=1,
+    )
+    entregador.iniciar()
+
+    inicio = time.perf_counter()
+    for i in range(args.eventos):
+        entregador.adicionar(assinaturas[i % args.assinaturas], [{"id": str(uuid.uuid4()), "n": i}])
+    while receptor.totais()["eventos"] + entregador.metricas()["eventos_descartados"] < args.eventos:
+        time.sleep(0.01)
+    duracao = time.perf_counter() - inicio
+    entregador.parar()
+    receptor.shutdown()
+
+    totais, metricas = receptor.totais(), entregador.metricas()
+    print(f"{totais['eventos']} eventos em {totais['lotes']} chamadas "
+          f"({args.eventos / max(totais['lotes'], 1):.0f} eventos por chamada, {totais['recusados']} recusadas)")
+    print(f"vazão: {totais['eventos'] / duracao:.0f} eventos/s em {duracao:.2f}s "
+          f"(janela {args.janela_ms} ms, {args.concorrencia} envios simultâneos)")
+    print(f"descartados após {entregador.tentativas} tentativas: {metricas['eventos_descartados']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assinaturas", type=int, default=200)
+    parser.add_argument("--eventos", type=int, default=20000)
+    parser.add_argument("--janela-ms", type=int, default=500)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--falhas", type=float, default=0.05)
+    main(parser.parse_args())
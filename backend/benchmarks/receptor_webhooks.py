@@ -0,0 +1,87 @@
+"""
+Receptor de webhooks para testes locais.
+
+Servidor HTTP que aceita os POSTs do ``webhook_service`` e conta lotes e
+eventos por caminho. Pode simular um hospital lento (``--latencia-ms``) ou
+instável (``--falhas``: fração das chamadas respondidas com 503).
+
+Uso:
+    cd backend
+    python benchmarks/receptor_webhooks.py --porta 9200 --latencia-ms 50 --falhas 0.1
+
+Assinaturas apontando para ``http://127.0.0.1:9200/<qualquer caminho>`` passam
+a ser entregues aqui; a cada segundo o receptor imprime o total recebido.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ReceptorWebhooks(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, porta: int = 0, latencia_ms: float = 0.0, falhas: float = 0.0):
+        super().__init__(("127.0.0.1", porta), _Handler)
+        self.latencia = latencia_ms / 1000.0
+        self.falhas = falhas
+        self.lock = threading.Lock()
+        self.lotes: Counter = Counter()
+        self.eventos: Counter = Counter()
+        self.recusados = 0
+
+    @property
+    def porta(self) -> int:
+        return self.server_address[1]
+
+    def totais(self) -> dict:
+        with self.lock:
+            return {
+                "lotes": sum(self.lotes.values()),
+                "eventos": sum(self.eventos.values()),
+                "recusados": self.recusados,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: ReceptorWebhooks
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+        if random.random() < self.server.falhas:
+            with self.server.lock:
+                self.server.recusados += 1
+            self.send_response(503)
+        else:
+            eventos = len(json.loads(corpo)["eventos"])
+            with self.server.lock:
+                self.server.lotes[self.path] += 1
+                self.server.eventos[self.path] += eventos
+            self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=9200)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--falhas", type=float, default=0.0)
+    args = parser.parse_args()
+    receptor = ReceptorWebhooks(args.porta, args.latencia_ms, args.falhas)
+    threading.Thread(target=receptor.serve_forever, daemon=True).start()
+    print(f"receptor em http://127.0.0.1:{receptor.porta}/")
+    try:
+        while True:
+            time.sleep(1)
+            print(receptor.totais())
+    except KeyboardInterrupt:
+        receptor.shutdown()
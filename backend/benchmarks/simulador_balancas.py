@@ -0,0 +1,110 @@
+"""
+Simulador de balanças para o listener TCP.
+
+Abre várias conexões simultâneas, cada uma se identificando como uma balança
+(``ID BAL-<n>``) e enviando leituras em sequência, com até ``--janela``
+leituras aguardando resposta por conexão. Mede vazão e latência (envio da
+linha → ``OK``/``ERR``).
+
+Sem ``--host``, sobe um banco SQLite temporário, cria as gaiolas e inicia o
+listener no próprio processo. Com ``--host``/``--porta``, aponta para um
+listener já rodando; as gaiolas ``<prefixo>-00000``… precisam existir.
+
+Uso:
+    cd backend
+    python benchmarks/simulador_balancas.py --conexoes 200 --leituras 50
+    python benchmarks/simulador_balancas.py --host 127.0.0.1 --porta 9100 --prefixo SIM
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if "--host" not in sys.argv:
+    _DB_PATH = os.path.join(tempfile.mkdtemp(), "simulador.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+
+TIPOS = ["saida_hospital", "recebimento_lavanderia", "expedicao"]
+
+
+def _preparar(prefixo: str, total_gaiolas: int) -> None:
+    from app.database import Base, SessionLocal, engine
+    from app.models.gaiola import Gaiola, StatusGaiola
+    from app.models.hospital import Hospital
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    hospital = Hospital(id=uuid.uuid4(), nome="Hospital Simulador", ativo=True)
+    db.add_all([
+        Gaiola(id=uuid.uuid4(), codigo=f"{prefixo}-{i:05d}", hospital=hospital, status=StatusGaiola.CRIADA)
+        for i in range(total_gaiolas)
+    ])
+    db.commit()
+    db.close()
+
+
+async def _balanca(n: int, host: str, porta: int, args, latencias: list[float], erros: list[str]) -> None:
+    reader, writer = await asyncio.open_connection(host, porta)
+    writer.write(f"ID BAL-{n:04d}\n".encode())
+    await reader.readline()
+    enviados: asyncio.Queue = asyncio.Queue(maxsize=args.janela)
+
+    async def ler():
+        for _ in range(args.leituras):
+            inicio = await enviados.get()
+            resposta = (await reader.readline()).decode().strip()
+            latencias.append(time.perf_counter() - inicio)
+            if not resposta.startswith("OK"):
+                erros.append(resposta)
+
+    leitor = asyncio.create_task(ler())
+    for i in range(args.leituras):
+        codigo = f"{args.prefixo}-{(n * args.leituras + i) % args.gaiolas:05d}"
+        await enviados.put(time.perf_counter())
+        writer.write(f"{codigo};{TIPOS[i % len(TIPOS)]};{40 + i % 10},5\n".encode())
+        await writer.drain()
+    await leitor
+    writer.close()
+
+
+async def main(args) -> None:
+    servidor = None
+    host, porta = args.host, args.porta
+    if host is None:
+        from app.services import balanca_tcp_service
+        _preparar(args.prefixo, args.gaiolas)
+        servidor = await balanca_tcp_service.iniciar("127.0.0.1", 0)
+        host, porta = "127.0.0.1", servidor.porta
+
+    latencias: list[float] = []
+    erros: list[str] = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_balanca(n, host, porta, args, latencias, erros) for n in range(args.conexoes)))
+    duracao = time.perf_counter() - inicio
+
+    total = args.conexoes * args.leituras
+    latencias.sort()
+    print(f"{args.conexoes} conexões, {total} leituras em {duracao:.2f}s ({total / duracao:,.0f} leituras/s)")
+    print(f"latência ms: p50={statistics.median(latencias) * 1000:.1f} "
+          f"p99={latencias[int(len(latencias) * 0.99) - 1] * 1000:.1f} max={latencias[-1] * 1000:.1f}")
+    print(f"erros: {len(erros)}" + (f" (ex.: {erros[0]})" if erros else ""))
+    if servidor is not None:
+        print(f"buffer: {servidor.buffer.metricas()}")
+        await balanca_tcp_service.parar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--conexoes", type=int, default=200)
+    parser.add_argument("--leituras", type=int, default=50, help="leituras por conexão")
+    parser.add_argument("--janela", type=int, default=8, help="leituras sem resposta por conexão")
+    parser.add_argument("--gaiolas", type=int, default=500)
+    parser.add_argument("--prefixo", default="SIM")
+    parser.add_argument("--host")
+    parser.add_argument("--porta", type=int, default=9100)
+    asyncio.run(main(parser.parse_args()))
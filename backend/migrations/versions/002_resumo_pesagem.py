@@ -0,0 +1,65 @@
+"""resumo de pesagens por gaiola
+
+Revision ID: 002_resumo_pesagem
+Revises: 001_initial
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "002_resumo_pesagem"
+down_revision: Union[str, None] = "001_initial"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "resumos_pesagem",
+        sa.Column("gaiola_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("gaiolas.id"), primary_key=True),
+        sa.Column("peso_saida", sa.Numeric(10, 3), nullable=True),
+        sa.Column("timestamp_saida", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("peso_recebimento", sa.Numeric(10, 3), nullable=True),
+        sa.Column("timestamp_recebimento", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("peso_expedicao", sa.Numeric(10, 3), nullable=True),
+        sa.Column("timestamp_expedicao", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("divergencia", sa.Numeric(8, 2), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_resumos_pesagem_divergencia", "resumos_pesagem", ["divergencia"])
+
+    # Backfill: última pesagem de cada tipo por gaiola
+    op.execute("""
+        INSERT INTO resumos_pesagem (
+            gaiola_id, peso_saida, timestamp_saida, peso_recebimento, timestamp_recebimento,
+            peso_expedicao, timestamp_expedicao, updated_at
+        )
+        SELECT
+            gaiola_id,
+            MAX(peso) FILTER (WHERE tipo_pesagem = 'saida_hospital'),
+            MAX(timestamp) FILTER (WHERE tipo_pesagem = 'saida_hospital'),
+            MAX(peso) FILTER (WHERE tipo_pesagem = 'recebimento_lavanderia'),
+            MAX(timestamp) FILTER (WHERE tipo_pesagem = 'recebimento_lavanderia'),
+            MAX(peso) FILTER (WHERE tipo_pesagem = 'expedicao'),
+            MAX(timestamp) FILTER (WHERE tipo_pesagem = 'expedicao'),
+            now()
+        FROM (
+            SELECT DISTINCT ON (gaiola_id, tipo_pesagem) gaiola_id, tipo_pesagem, peso, timestamp
+            FROM pesagens
+            ORDER BY gaiola_id, tipo_pesagem, timestamp DESC
+        ) ultimas
+        GROUP BY gaiola_id
+    """)
+    op.execute("""
+        UPDATE resumos_pesagem
+        SET divergencia = ROUND(ABS(peso_saida - peso_expedicao) / peso_saida * 100, 2)
+        WHERE peso_saida > 0 AND peso_expedicao > 0
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_resumos_pesagem_divergencia", table_name="resumos_pesagem")
+    op.drop_table("resumos_pesagem")
@@ -0,0 +1,33 @@
+"""índices compostos para paginação por cursor
+
+Revision ID: 003_indices_paginacao
+Revises: 002_resumo_pesagem
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "003_indices_paginacao"
+down_revision: Union[str, None] = "002_resumo_pesagem"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = [
+    ("ix_gaiolas_data_criacao_id", "gaiolas", ["data_criacao", "id"]),
+    ("ix_pesagens_timestamp_id", "pesagens", ["timestamp", "id"]),
+    ("ix_pesagens_gaiola_id_timestamp_id", "pesagens", ["gaiola_id", "timestamp", "id"]),
+    ("ix_transportes_data_saida_id", "transportes", ["data_saida", "id"]),
+    ("ix_processos_data_inicio_id", "processos", ["data_inicio", "id"]),
+    ("ix_hospitais_created_at_id", "hospitais", ["created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas)
+
+
+def downgrade() -> None:
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
@@ -0,0 +1,25 @@
+"""chave de idempotência das pesagens da balança
+
+Revision ID: 004_idempotencia_pesagens
+Revises: 003_indices_paginacao
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "004_idempotencia_pesagens"
+down_revision: Union[str, None] = "003_indices_paginacao"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("pesagens", sa.Column("chave_idempotencia", sa.String(255), nullable=True))
+    op.create_index("ix_pesagens_chave_idempotencia", "pesagens", ["chave_idempotencia"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pesagens_chave_idempotencia", table_name="pesagens")
+    op.drop_column("pesagens", "chave_idempotencia")
@@ -0,0 +1,43 @@
+"""log persistente de notificações de mudança de status
+
+Revision ID: 005_notificacoes
+Revises: 004_idempotencia_pesagens
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "005_notificacoes"
+down_revision: Union[str, None] = "004_idempotencia_pesagens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = [
+    ("ix_notificacoes_timestamp_id", ["timestamp", "id"]),
+    ("ix_notificacoes_gaiola_codigo_timestamp", ["gaiola_codigo", "timestamp"]),
+    ("ix_notificacoes_status_novo_timestamp", ["status_novo", "timestamp"]),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "notificacoes",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("gaiola_codigo", sa.String(100), nullable=False),
+        sa.Column("status_anterior", sa.String(50), nullable=True),
+        sa.Column("status_novo", sa.String(50), nullable=False),
+        sa.Column("usuario", sa.String(255), nullable=True),
+        sa.Column("observacoes", sa.Text, nullable=True),
+    )
+    for nome, colunas in INDICES:
+        op.create_index(nome, "notificacoes", colunas)
+
+
+def downgrade() -> None:
+    for nome, _ in reversed(INDICES):
+        op.drop_index(nome, table_name="notificacoes")
+    op.drop_table("notificacoes")
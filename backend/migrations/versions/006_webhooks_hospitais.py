@@ -0,0 +1,35 @@
+"""assinaturas de webhook por hospital
+
+Revision ID: 006_webhooks_hospitais
+Revises: 005_notificacoes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "006_webhooks_hospitais"
+down_revision: Union[str, None] = "005_notificacoes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "webhooks_hospitais",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("hospital_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("hospitais.id"), nullable=False),
+        sa.Column("url", sa.String(500), nullable=False),
+        sa.Column("eventos", sa.String(100), nullable=False),
+        sa.Column("segredo", sa.String(200), nullable=True),
+        sa.Column("ativo", sa.Boolean, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_webhooks_hospitais_hospital_id", "webhooks_hospitais", ["hospital_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhooks_hospitais_hospital_id", table_name="webhooks_hospitais")
+    op.drop_table("webhooks_hospitais")
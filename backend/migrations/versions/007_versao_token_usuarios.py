@@ -0,0 +1,23 @@
+"""versão dos tokens do usuário (revogação por incremento)
+
+Revision ID: 007_versao_token_usuarios
+Revises: 006_webhooks_hospitais
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "007_versao_token_usuarios"
+down_revision: Union[str, None] = "006_webhooks_hospitais"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("usuarios", sa.Column("versao_token", sa.Integer, nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("usuarios", "versao_token")
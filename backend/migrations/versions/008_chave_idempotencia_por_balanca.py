@@ -0,0 +1,24 @@
+"""chave de idempotência prefixada pela balança
+
+Revision ID: 008_chave_idempotencia_por_balanca
+Revises: 007_versao_token_usuarios
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008_chave_idempotencia_por_balanca"
+down_revision: Union[str, None] = "007_versao_token_usuarios"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # balanca_id (100) + "|" + chave enviada pela balança (255)
+    op.alter_column("pesagens", "chave_idempotencia", type_=sa.String(400), existing_type=sa.String(255))
+
+
+def downgrade() -> None:
+    op.alter_column("pesagens", "chave_idempotencia", type_=sa.String(255), existing_type=sa.String(400))
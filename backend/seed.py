@@ -13,9 +13,16 @@ from app.models.hospital import Hospital
 from app.models.gaiola import Gaiola, StatusGaiola
 from app.models.pesagem import Pesagem, TipoPesagem
 from app.utils.security import get_password_hash
+from app.services.balanca_service import atualizar_resumo
 from datetime import datetime, timezone
 import uuid
 
+def _add_pesagem(db, **kwargs):
+    pesagem = Pesagem(id=uuid.uuid4(), **kwargs)
+    db.add(pesagem)
+    atualizar_resumo(db, pesagem)
+
+
 def seed():
     Base.metadata.create_all(bind=engine)
     db = SessionLocal()
@@ -86,16 +93,16 @@ def seed():
             db.add(g1)
             db.flush()
             # Pesagens
-            db.add(Pesagem(
-                id=uuid.uuid4(), gaiola_id=g1.id,
+            _add_pesagem(
+                db, gaiola_id=g1.id,
                 tipo_pesagem=TipoPesagem.SAIDA_HOSPITAL, peso=45.500,
                 balanca_id="BAL-001", timestamp=datetime.now(timezone.utc),
-            ))
-            db.add(Pesagem(
-                id=uuid.uuid4(), gaiola_id=g1.id,
+            )
+            _add_pesagem(
+                db, gaiola_id=g1.id,
                 tipo_pesagem=TipoPesagem.RECEBIMENTO_LAVANDERIA, peso=45.200,
                 balanca_id="BAL-002", timestamp=datetime.now(timezone.utc),
-            ))
+            )
             print("✓ Gaiola 1 criada: GAI-001 (Em Lavagem)")
         else:
             print("- Gaiola GAI-001 já existe")
@@ -112,21 +119,21 @@ def seed():
             )
             db.add(g2)
             db.flush()
-            db.add(Pesagem(
-                id=uuid.uuid4(), gaiola_id=g2.id,
+            _add_pesagem(
+                db, gaiola_id=g2.id,
                 tipo_pesagem=TipoPesagem.SAIDA_HOSPITAL, peso=62.000,
                 balanca_id="BAL-001", timestamp=datetime.now(timezone.utc),
-            ))
-            db.add(Pesagem(
-                id=uuid.uuid4(), gaiola_id=g2.id,
+            )
+            _add_pesagem(
+                db, gaiola_id=g2.id,
                 tipo_pesagem=TipoPesagem.RECEBIMENTO_LAVANDERIA, peso=61.800,
                 balanca_id="BAL-002", timestamp=datetime.now(timezone.utc),
-            ))
-            db.add(Pesagem(
-                id=uuid.uuid4(), gaiola_id=g2.id,
+            )
+            _add_pesagem(
+                db, gaiola_id=g2.id,
                 tipo_pesagem=TipoPesagem.EXPEDICAO, peso=58.500,
                 balanca_id="BAL-003", timestamp=datetime.now(timezone.utc),
-            ))
+            )
             print("✓ Gaiola 2 criada: GAI-002 (Pronta Expedição)")
         else:
             print("- Gaiola GAI-002 já existe")
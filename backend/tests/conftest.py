@@ -1,18 +1,38 @@
 import os
 os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+# Sem thread de gravação: as notificações são gravadas pela sessão do teste ao consultar
+os.environ["NOTIFICACOES_GRAVADOR_ATIVO"] = "false"
+# Custo mínimo do bcrypt: os testes criam e autenticam muitos usuários
+os.environ["BCRYPT_ROUNDS"] = "4"
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
+from app.database import Base, get_db, get_db_ingestao, get_db_leitura, get_db_relatorios
 from app.main import app
+from app.services import admissao_service, idempotencia_service, notificacao_service
+from app.services.gaiola_resolver import resolvedor
+from app.services.revogacao_tokens import revogacao
+from app.services.usuario_cache import usuarios
 
 SQLALCHEMY_TEST_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_TEST_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# pysqlite não emite BEGIN sozinho, o que quebra os SAVEPOINTs usados para isolar
+# cada teste; seguimos a receita do SQLAlchemy e controlamos o BEGIN manualmente.
+@event.listens_for(engine, "connect")
+def _sqlite_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _sqlite_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
 @pytest.fixture(scope="session")
 def db_engine():
     Base.metadata.create_all(bind=engine)
@@ -20,11 +40,29 @@ def db_engine():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def limpar_caches():
+    # Cada teste desfaz seus dados; os caches em memória não podem sobreviver entre eles.
+    resolvedor.limpar()
+    idempotencia_service.janela.limpar()
+    admissao_service.controle.limpar()
+    notificacao_service.limpar_notificacoes()
+    usuarios.limpar()
+    revogacao.limpar()
+    yield
+    resolvedor.limpar()
+    idempotencia_service.janela.limpar()
+    admissao_service.controle.limpar()
+    notificacao_service.limpar_notificacoes()
+    usuarios.limpar()
+    revogacao.limpar()
+
+
 @pytest.fixture
 def db(db_engine):
     connection = db_engine.connect()
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
     yield session
     session.close()
     transaction.rollback()
@@ -35,7 +73,25 @@ def db(db_engine):
 def client(db):
     def override_get_db():
         yield db
-    app.dependency_overrides[get_db] = override_get_db
+    for dependencia in (get_db, get_db_ingestao, get_db_leitura, get_db_relatorios):
+        app.dependency_overrides[dependencia] = override_get_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+_CONTROLE_TRANSACAO = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT")
+
+
+@pytest.fixture
+def query_counter(db_engine):
+    """Coleta os comandos SQL executados enquanto a fixture está ativa, exceto os de controle de transação."""
+    comandos = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(_CONTROLE_TRANSACAO):
+            comandos.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+    yield comandos
+    event.remove(db_engine, "before_cursor_execute", _before_cursor_execute)
@@ -1,8 +1,13 @@
+import time
 import uuid
 from app.models.user import Usuario, TipoUsuario
 from app.models.hospital import Hospital
 from app.models.gaiola import Gaiola, StatusGaiola
+from app.models.pesagem import Pesagem, TipoPesagem
+from app.models.processo import Processo, EtapaProcesso
+from app.models.transporte import Transporte, TipoTransporte
 from app.utils.security import get_password_hash, create_access_token
+from app.services import admissao_service, idempotencia_service, notificacao_service
 
 
 def create_test_admin(db):
@@ -45,6 +50,21 @@ def test_login_wrong_password(client, db):
     assert response.status_code == 401
 
 
+def test_login_refaz_hash_com_custo_atual(client, db):
+    from passlib.hash import bcrypt
+
+    user = create_test_admin(db)
+    user.senha_hash = bcrypt.using(rounds=5).hash("test123")
+    db.commit()
+    assert client.post("/api/v1/auth/token", json={"email": "test@test.com", "senha": "test123"}).status_code == 200
+    db.refresh(user)
+    assert user.senha_hash.startswith("$2b$04$")
+    response = client.post("/login", data={"email": "test@test.com", "senha": "test123"}, follow_redirects=False)
+    assert response.status_code == 302
+    senhas = client.get("/api/v1/auth/cache", headers={"Authorization": f"Bearer {get_auth_token(user)}"}).json()["senhas"]
+    assert senhas["rehashes"] >= 1 and senhas["em_andamento"] == 0
+
+
 def test_get_me(client, db):
     user = create_test_admin(db)
     token = get_auth_token(user)
@@ -54,6 +74,69 @@ def test_get_me(client, db):
     assert data["email"] == "test@test.com"
 
 
+def test_usuario_autenticado_em_cache_e_invalidado(client, db, query_counter):
+    admin = create_test_admin(db)
+    operador = Usuario(id=uuid.uuid4(), nome="Operador", email="op@test.com", senha_hash="x",
+                       tipo_usuario=TipoUsuario.OPERADOR_LAVANDERIA, ativo=True)
+    db.add(operador)
+    db.commit()
+    admin_headers = {"Authorization": f"Bearer {get_auth_token(admin)}"}
+    op_headers = {"Authorization": f"Bearer {get_auth_token(operador)}"}
+
+    assert client.get("/api/v1/auth/me", headers=op_headers).status_code == 200
+    query_counter.clear()
+    assert client.get("/api/v1/auth/me", headers=op_headers).json()["email"] == "op@test.com"
+    assert not [q for q in query_counter if "usuarios" in q]
+
+    response = client.put(f"/api/v1/auth/usuarios/{operador.id}", json={"ativo": False}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/v1/auth/me", headers=op_headers).status_code == 401
+    metricas = client.get("/api/v1/auth/cache", headers=admin_headers).json()
+    assert metricas["consultas_evitadas"] >= 2 and metricas["tamanho"] == 1
+    assert client.put(f"/api/v1/auth/usuarios/{admin.id}", json={"ativo": False}, headers=op_headers).status_code == 401
+
+
+def test_token_com_claims_autoriza_sem_consulta_e_revoga(client, db, query_counter):
+    admin = create_test_admin(db)
+    operador = Usuario(id=uuid.uuid4(), nome="Operador", email="op@test.com", senha_hash=get_password_hash("op123"),
+                       tipo_usuario=TipoUsuario.OPERADOR_LAVANDERIA, ativo=True)
+    db.add(operador)
+    db.commit()
+    token = client.post("/api/v1/auth/token", json={"email": "op@test.com", "senha": "op123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.get("/api/v1/gaiolas/", headers=headers)  # primeira requisição carrega a lista de revogação
+    query_counter.clear()
+    assert client.get("/api/v1/gaiolas/", headers=headers).status_code == 200
+    assert not [q for q in query_counter if "usuarios" in q]
+    # O perfil vem do token: a checagem de admin não precisa do banco
+    novo = {"nome": "X", "email": "x@test.com", "senha": "x"}
+    assert client.post("/api/v1/auth/usuarios", json=novo, headers=headers).status_code == 403
+    assert client.get("/api/v1/auth/me", headers=headers).json()["nome"] == "Operador"
+
+    admin_headers = {"Authorization": f"Bearer {get_auth_token(admin)}"}
+    client.put(f"/api/v1/auth/usuarios/{operador.id}", json={"tipo_usuario": "admin"}, headers=admin_headers)
+    # Token antigo (ainda com perfil de operador) é recusado após a troca de perfil
+    assert client.get("/api/v1/gaiolas/", headers=headers).status_code == 401
+    token = client.post("/api/v1/auth/token", json={"email": "op@test.com", "senha": "op123"}).json()["access_token"]
+    assert client.post("/api/v1/auth/usuarios", json=novo, headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+def test_token_so_com_sub_e_revogado_na_troca_de_senha(client, db):
+    admin = create_test_admin(db)
+    operador = Usuario(id=uuid.uuid4(), nome="Legado", email="legado@test.com", senha_hash=get_password_hash("x"),
+                       tipo_usuario=TipoUsuario.OPERADOR_LAVANDERIA, ativo=True)
+    db.add(operador)
+    db.commit()
+    # Token emitido antes das claims uid/tipo/ver
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'legado@test.com'})}"}
+    assert client.get("/api/v1/gaiolas/", headers=headers).status_code == 200
+
+    admin_headers = {"Authorization": f"Bearer {get_auth_token(admin)}"}
+    client.put(f"/api/v1/auth/usuarios/{operador.id}", json={"senha": "nova"}, headers=admin_headers)
+    assert client.get("/api/v1/gaiolas/", headers=headers).status_code == 401
+
+
 def test_create_hospital(client, db):
     user = create_test_admin(db)
     token = get_auth_token(user)
@@ -79,6 +162,72 @@ def test_list_hospitais(client, db):
     assert isinstance(response.json(), list)
 
 
+def _resolver_hospital_publico(monkeypatch):
+    """Faz ``hooks.hospital.example`` resolver para um IP público, sem depender de DNS nos testes."""
+    from app.services import webhook_service
+    resolver = webhook_service.socket.getaddrinfo
+
+    def getaddrinfo(host, *args, **kwargs):
+        if host == "hooks.hospital.example":
+            return [(2, 1, 6, "", ("93.184.216.34", 443))]
+        return resolver(host, *args, **kwargs)
+
+    monkeypatch.setattr(webhook_service.socket, "getaddrinfo", getaddrinfo)
+
+
+def test_webhooks_hospital(client, db, monkeypatch):
+    _resolver_hospital_publico(monkeypatch)
+    user = create_test_admin(db)
+    headers = {"Authorization": f"Bearer {get_auth_token(user)}"}
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Webhook", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="WH-001", hospital=hospital, status=StatusGaiola.EM_TRANSPORTE_VOLTA)
+    db.add(gaiola)
+    db.commit()
+    base = f"/api/v1/hospitais/{hospital.id}/webhooks"
+    entrega = client.post(base, json={"url": "https://hooks.hospital.example/entregas", "eventos": ["ENTREGUE"]},
+                          headers=headers)
+    assert entrega.status_code == 201 and entrega.json()["eventos"] == ["ENTREGUE"]
+    divergencia = client.post(base, json={"url": "https://hooks.hospital.example/alertas", "eventos": ["DIVERGENCIA"]},
+                              headers=headers).json()
+    assert len(client.get(base, headers=headers).json()) == 2
+
+    client.put(f"/api/v1/gaiolas/{gaiola.id}", json={"status": "ENTREGUE"}, headers=headers)
+    # Sem o pool de workers nos testes, o despacho aos webhooks é feito aqui
+    notificacao_service.despachante.descarregar(db=db)
+    webhooks = client.get("/api/v1/notificacoes/despacho", headers=headers).json()["webhooks_hospitais"]
+    # Só a assinatura de ENTREGUE recebe o evento, que aguarda a janela de envio
+    assert (webhooks["eventos"], webhooks["pendentes"], webhooks["assinaturas"]) == (1, 1, 1)
+
+    # Remover a assinatura descarta o que estava acumulado para ela
+    assert client.delete(f"{base}/{entrega.json()['id']}", headers=headers).status_code == 200
+    webhooks = client.get("/api/v1/notificacoes/despacho", headers=headers).json()["webhooks_hospitais"]
+    assert (webhooks["pendentes"], webhooks["assinaturas"], webhooks["eventos_descartados"]) == (0, 0, 1)
+    notificacao_service.limpar_notificacoes()
+
+    assert client.delete(f"{base}/{divergencia['id']}", headers=headers).status_code == 200
+    assert client.delete(f"{base}/{divergencia['id']}", headers=headers).status_code == 404
+
+
+def test_webhook_exige_admin_e_url_publica_https(client, db, monkeypatch):
+    _resolver_hospital_publico(monkeypatch)
+    admin = create_test_admin(db)
+    operador = Usuario(id=uuid.uuid4(), nome="Operador", email="op-wh@test.com", senha_hash="x",
+                       tipo_usuario=TipoUsuario.OPERADOR_LAVANDERIA, ativo=True)
+    hospital = Hospital(id=uuid.uuid4(), nome="H. SSRF", ativo=True)
+    db.add_all([operador, hospital])
+    db.commit()
+    base = f"/api/v1/hospitais/{hospital.id}/webhooks"
+    headers = {"Authorization": f"Bearer {get_auth_token(admin)}"}
+
+    publica = {"url": "https://hooks.hospital.example/eventos"}
+    op_headers = {"Authorization": f"Bearer {get_auth_token(operador)}"}
+    assert client.post(base, json=publica, headers=op_headers).status_code == 403
+    for url in ("http://hooks.hospital.example/eventos", "https://127.0.0.1/", "https://localhost:8000/",
+                "https://169.254.169.254/latest/meta-data", "https://10.0.0.5/", "https://[::1]/"):
+        assert client.post(base, json={"url": url}, headers=headers).status_code == 422, url
+    assert client.post(base, json=publica, headers=headers).status_code == 201
+
+
 def test_create_gaiola(client, db):
     user = create_test_admin(db)
     token = get_auth_token(user)
@@ -131,3 +280,298 @@ def test_pesagem_balanca_endpoint(client, db):
     assert response.status_code == 201
     data = response.json()
     assert data["peso"] == 45.5
+
+
+def test_pesagem_balanca_usa_cache_de_codigo(client, db, query_counter):
+    user = create_test_admin(db)
+    token = get_auth_token(user)
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Cache", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="CACHE-001", hospital=hospital, status=StatusGaiola.CRIADA)
+    db.add(gaiola)
+    db.commit()
+    leitura = {"gaiola_codigo": "CACHE-001", "peso": 40.0, "balanca_id": "BALANCA-1"}
+
+    assert client.post("/api/v1/pesagens/balanca", json={**leitura, "tipo_pesagem": "saida_hospital"}).status_code == 201
+    query_counter.clear()
+    response = client.post("/api/v1/pesagens/balanca", json={**leitura, "tipo_pesagem": "recebimento_lavanderia"})
+    assert response.status_code == 201
+    assert response.json()["gaiola_codigo"] == "CACHE-001"
+    # A gaiola não é buscada pelo código; só o status é relido, travado, para a notificação
+    assert not any(q.lstrip().upper().startswith("SELECT") and "gaiolas.codigo" in q for q in query_counter)
+    db.refresh(gaiola)
+    assert gaiola.status == StatusGaiola.RECEBIDA_LAVANDERIA
+
+    # Renomear a gaiola invalida o código antigo
+    client.put(f"/api/v1/gaiolas/{gaiola.id}", json={"codigo": "CACHE-002"},
+               headers={"Authorization": f"Bearer {token}"})
+    assert client.post("/api/v1/pesagens/balanca", json={**leitura, "tipo_pesagem": "expedicao"}).status_code == 404
+    metricas = client.get("/api/v1/pesagens/balanca/metricas",
+                          headers={"Authorization": f"Bearer {token}"}).json()["resolvedor_gaiolas"]
+    assert (metricas["hits"], metricas["misses"]) == (1, 2)
+
+
+def test_pesagem_balanca_status_anterior_vem_do_banco(client, db):
+    from fastapi import Response
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Anterior", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="ANT-001", hospital=hospital, status=StatusGaiola.CRIADA)
+    db.add(gaiola)
+    db.commit()
+    leitura = {"gaiola_codigo": "ANT-001", "peso": 40.0, "balanca_id": "BALANCA-1"}
+    assert client.post("/api/v1/pesagens/balanca", json={**leitura, "tipo_pesagem": "saida_hospital"}).status_code == 201
+
+    # Mudança de status que não passou pelo cache de códigos (ex.: outro worker)
+    db.query(Gaiola).filter(Gaiola.id == gaiola.id).update({"status": StatusGaiola.EM_TRANSPORTE_VOLTA})
+    db.commit()
+    assert client.post("/api/v1/pesagens/balanca", json={**leitura, "tipo_pesagem": "expedicao"}).status_code == 201
+
+    ultima = notificacao_service.listar_notificacoes(db, Response(), limite=1)[0]
+    assert (ultima.status_anterior, ultima.status_novo) == ("EM_TRANSPORTE_VOLTA", "PRONTA_EXPEDICAO")
+
+
+def test_pesagem_balanca_amostras(client, db):
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Amostras", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="AMS-001", hospital=hospital, status=StatusGaiola.CRIADA)
+    db.add(gaiola)
+    db.commit()
+    dados = {"balanca_id": "BAL-AMS", "gaiola_codigo": "AMS-001", "tipo_pesagem": "saida_hospital"}
+
+    ruido = [[i * 0.02, 30.0 + (i % 7)] for i in range(50)]
+    response = client.post("/api/v1/pesagens/balanca/amostras", json={**dados, "amostras": ruido})
+    assert response.json() == {"amostras": 50, "pesagens": []}
+    estavel = [[1 + i * 0.02, 33.5] for i in range(100)]
+    response = client.post("/api/v1/pesagens/balanca/amostras", json={**dados, "amostras": estavel})
+    pesagens = response.json()["pesagens"]
+    assert [p["peso"] for p in pesagens] == [33.5]
+    db.refresh(gaiola)
+    assert gaiola.status == StatusGaiola.EM_TRANSPORTE_IDA
+
+    response = client.post("/api/v1/pesagens/balanca/amostras",
+                           json={**dados, "gaiola_codigo": "NAO-EXISTE", "amostras": estavel})
+    assert response.status_code == 404
+
+
+def test_pesagem_balanca_reenvio_idempotente(client, db):
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Reenvio", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="DUP-BAL", hospital=hospital, status=StatusGaiola.CRIADA)
+    db.add(gaiola)
+    db.commit()
+    leitura = {"gaiola_codigo": "DUP-BAL", "peso": 40.0, "tipo_pesagem": "saida_hospital",
+               "balanca_id": "BALANCA-1", "timestamp": "2026-10-17T08:00:00+00:00"}
+
+    primeira = client.post("/api/v1/pesagens/balanca", json=leitura)
+    reenvio = client.post("/api/v1/pesagens/balanca", json=leitura)
+    assert primeira.status_code == reenvio.status_code == 201
+    assert reenvio.json()["id"] == primeira.json()["id"]
+
+    # Fora da janela em memória, o índice único ainda impede a duplicata
+    idempotencia_service.janela.limpar()
+    assert client.post("/api/v1/pesagens/balanca", json=leitura).json()["id"] == primeira.json()["id"]
+
+    com_chave = {**leitura, "timestamp": None, "chave_idempotencia": "BALANCA-1:000123"}
+    response = client.post("/api/v1/pesagens/balanca/lote", json=[com_chave, com_chave, leitura])
+    itens = response.json()["itens"]
+    assert [i["duplicada"] for i in itens] == [False, True, True]
+    assert itens[1]["pesagem_id"] == itens[0]["pesagem_id"]
+    assert itens[2]["pesagem_id"] == primeira.json()["id"]
+    assert db.query(Pesagem).filter(Pesagem.gaiola_id == gaiola.id).count() == 2
+
+
+def test_pesagem_balanca_chave_idempotencia_por_balanca(client, db):
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Chave", ativo=True)
+    db.add_all([
+        Gaiola(id=uuid.uuid4(), codigo="CHV-1", hospital=hospital, status=StatusGaiola.CRIADA),
+        Gaiola(id=uuid.uuid4(), codigo="CHV-2", hospital=hospital, status=StatusGaiola.CRIADA),
+    ])
+    db.commit()
+    leitura = {"gaiola_codigo": "CHV-1", "peso": 40.0, "tipo_pesagem": "saida_hospital",
+               "balanca_id": "BAL-A", "chave_idempotencia": "123"}
+
+    primeira = client.post("/api/v1/pesagens/balanca", json=leitura).json()
+    # Outra balança com o mesmo contador grava a própria leitura
+    outra = client.post("/api/v1/pesagens/balanca",
+                        json={**leitura, "gaiola_codigo": "CHV-2", "balanca_id": "BAL-B", "peso": 55.0}).json()
+    assert outra["id"] != primeira["id"] and outra["gaiola_codigo"] == "CHV-2"
+    assert db.query(Pesagem).filter(Pesagem.chave_idempotencia.in_(["BAL-A|123", "BAL-B|123"])).count() == 2
+
+    # balanca_id maior que a coluna (e que o espaço reservado na chave) é recusado na validação
+    longa = client.post("/api/v1/pesagens/balanca",
+                        json={**leitura, "balanca_id": "B" * 101, "chave_idempotencia": "X" * 255})
+    assert longa.status_code == 422
+
+    # O reenvio devolve a pesagem original, mesmo com outro peso na requisição
+    reenvio = client.post("/api/v1/pesagens/balanca", json={**leitura, "peso": 99.0}).json()
+    assert (reenvio["id"], float(reenvio["peso"])) == (primeira["id"], 40.0)
+
+
+def test_pesagem_balanca_admissao(client, db, monkeypatch):
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Admissao", ativo=True)
+    db.add(Gaiola(id=uuid.uuid4(), codigo="ADM-001", hospital=hospital, status=StatusGaiola.CRIADA))
+    db.commit()
+    controle = admissao_service.ControleAdmissao(taxa=0.5, rajada=1, concorrencia_max=1, espera_ms=0)
+    monkeypatch.setattr(admissao_service, "controle", controle)
+    leitura = {"gaiola_codigo": "ADM-001", "peso": 40.0, "tipo_pesagem": "saida_hospital", "balanca_id": "BAL-X"}
+
+    assert client.post("/api/v1/pesagens/balanca", json=leitura).status_code == 201
+    response = client.post("/api/v1/pesagens/balanca", json=leitura)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+
+    # Com a única vaga ocupada, outra balança recebe 503 sem chegar ao banco
+    with controle.vaga():
+        response = client.post("/api/v1/pesagens/balanca", json={**leitura, "balanca_id": "BAL-Y"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_notificacoes_filtros_e_cursor(client, db):
+    user = create_test_admin(db)
+    headers = {"Authorization": f"Bearer {get_auth_token(user)}"}
+    for i in range(5):
+        notificacao_service.notificar_mudanca_status(f"NOT-{i % 2}", "CRIADA", "EM_TRANSPORTE_IDA")
+    notificacao_service.notificar_mudanca_status("NOT-0", "EM_TRANSPORTE_IDA", "RECEBIDA_LAVANDERIA")
+
+    response = client.get("/api/v1/notificacoes/?limite=4", headers=headers)
+    recentes = response.json()
+    assert len(recentes) == 4 and recentes[0]["status_novo"] == "RECEBIDA_LAVANDERIA"
+    cursor = response.headers["X-Next-Cursor"]
+    resto = client.get(f"/api/v1/notificacoes/?limite=4&cursor={cursor}", headers=headers).json()
+    assert len(resto) == 2
+    assert not {n["id"] for n in recentes} & {n["id"] for n in resto}
+
+    filtradas = client.get("/api/v1/notificacoes/", headers=headers,
+                           params={"gaiola_codigo": "NOT-0", "status_novo": "EM_TRANSPORTE_IDA"}).json()
+    assert len(filtradas) == 3
+    desde = client.get("/api/v1/notificacoes/", headers=headers,
+                       params={"since": resto[0]["timestamp"]}).json()
+    assert [n["id"] for n in desde] == [n["id"] for n in reversed(recentes)]
+
+    despacho = client.get("/api/v1/notificacoes/despacho", headers=headers).json()
+    assert despacho["destinos"]["persistencia"]["entregues"] == 6
+    assert despacho["fila"] == 0 and despacho["ultimos_mortos"] == []
+
+
+def test_metricas_pools_do_banco(client, db):
+    headers = {"Authorization": f"Bearer {get_auth_token(create_test_admin(db))}"}
+    pools = client.get("/api/v1/metricas/banco", headers=headers).json()
+    assert set(pools) == {"interativo", "ingestao", "relatorios", "roteamento_leitura"}
+    assert {"em_uso", "ociosas", "espera_media_ms", "espera_max_ms", "timeouts"} <= set(pools["ingestao"])
+    assert pools["roteamento_leitura"]["listagens"]["replica_configurada"] is False
+
+
+def test_escrita_leva_leituras_ao_primario_com_replica(client, db, monkeypatch):
+    from app import database
+
+    headers = {"Authorization": f"Bearer {get_auth_token(create_test_admin(db))}"}
+    response = client.post("/api/v1/hospitais/", json={"nome": "Sem réplica"}, headers=headers)
+    assert response.status_code == 201 and database.PRIMARIO_COOKIE not in response.cookies
+
+    monkeypatch.setattr(database.leitura, "replica", database.SessionLocal)
+    response = client.post("/api/v1/hospitais/", json={"nome": "Com réplica"}, headers=headers)
+    assert response.status_code == 201
+    assert float(response.cookies[database.PRIMARIO_COOKIE]) > time.time()
+    assert database.PRIMARIO_COOKIE not in client.get("/api/v1/hospitais/", headers=headers).cookies
+
+
+def test_stream_notificacoes_exige_autenticacao(client):
+    assert client.get("/api/v1/notificacoes/stream").status_code == 401
+    response = client.get("/api/v1/notificacoes/stream", cookies={"access_token": "invalido"})
+    assert response.status_code == 401
+
+
+def _popular_listagens(db, hospital_id, quantidade):
+    for _ in range(quantidade):
+        g = Gaiola(id=uuid.uuid4(), codigo=f"NQ-{uuid.uuid4().hex[:8]}", hospital_id=hospital_id,
+                   status=StatusGaiola.CRIADA)
+        db.add(g)
+        db.add(Pesagem(id=uuid.uuid4(), gaiola=g, tipo_pesagem=TipoPesagem.SAIDA_HOSPITAL, peso=10))
+        db.add(Transporte(id=uuid.uuid4(), gaiola=g, tipo=TipoTransporte.IDA))
+        db.add(Processo(id=uuid.uuid4(), gaiola=g, etapa=EtapaProcesso.LAVAGEM))
+    db.commit()
+    db.expunge_all()
+
+
+def test_list_endpoints_query_count_fixo(client, db, query_counter):
+    """Cada página custa um número fixo de queries, independente do número de linhas."""
+    user = create_test_admin(db)
+    headers = {"Authorization": f"Bearer {get_auth_token(user)}"}
+    hospital = Hospital(id=uuid.uuid4(), nome="H. N+1", ativo=True)
+    db.add(hospital)
+    db.commit()
+    hospital_id = hospital.id
+    urls = ["/api/v1/gaiolas/", "/api/v1/pesagens/", "/api/v1/transportes/", "/api/v1/processos/"]
+    # Aquece o cache do usuário autenticado para todas as medições partirem do mesmo estado
+    client.get("/api/v1/auth/me", headers=headers)
+
+    def contar(url):
+        query_counter.clear()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return len(query_counter), response.json()
+
+    _popular_listagens(db, hospital_id, 2)
+    base = {url: contar(url)[0] for url in urls}
+    _popular_listagens(db, hospital_id, 8)
+    for url in urls:
+        total, data = contar(url)
+        assert len(data) == 10
+        assert total == base[url] <= 2, url
+        assert all(item.get("hospital_nome") or item.get("gaiola_codigo") for item in data)
+
+
+def test_list_pesagens_paginacao_por_cursor(client, db):
+    from datetime import datetime, timedelta, timezone
+    user = create_test_admin(db)
+    headers = {"Authorization": f"Bearer {get_auth_token(user)}"}
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Cursor", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="CURSOR-001", hospital=hospital, status=StatusGaiola.CRIADA)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Dois pares com o mesmo timestamp para exercitar o desempate por id
+    for i in range(5):
+        db.add(Pesagem(id=uuid.uuid4(), gaiola=gaiola, tipo_pesagem=TipoPesagem.SAIDA_HOSPITAL,
+                       peso=i, timestamp=base + timedelta(minutes=i // 2)))
+    db.commit()
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        params = {"gaiola_id": str(gaiola.id), "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/pesagens/", params=params, headers=headers)
+        assert response.status_code == 200
+        vistos += [p["id"] for p in response.json()]
+        paginas += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert paginas == 3
+    assert len(vistos) == len(set(vistos)) == 5
+
+
+def test_list_cursor_invalido(client, db):
+    user = create_test_admin(db)
+    response = client.get("/api/v1/gaiolas/", params={"cursor": "xyz"},
+                          headers={"Authorization": f"Bearer {get_auth_token(user)}"})
+    assert response.status_code == 400
+
+
+def test_pesagem_balanca_lote(client, db):
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Lote", ativo=True)
+    gaiola = Gaiola(id=uuid.uuid4(), codigo="LOTE-001", hospital=hospital, status=StatusGaiola.CRIADA)
+    db.add(gaiola)
+    db.commit()
+    leitura = {"gaiola_codigo": "LOTE-001", "balanca_id": "BALANCA-1"}
+    response = client.post("/api/v1/pesagens/balanca/lote", json=[
+        {**leitura, "peso": 50.0, "tipo_pesagem": "saida_hospital"},
+        {**leitura, "gaiola_codigo": "NAO-EXISTE", "peso": 1.0, "tipo_pesagem": "saida_hospital"},
+        {**leitura, "peso": 49.0, "tipo_pesagem": "recebimento_lavanderia"},
+    ])
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["total"], data["registradas"], data["erros"]) == (3, 2, 1)
+    assert [i["status_gaiola"] for i in data["itens"]] == ["EM_TRANSPORTE_IDA", None, "RECEBIDA_LAVANDERIA"]
+    assert "NAO-EXISTE" in data["itens"][1]["erro"]
+
+    db.refresh(gaiola)
+    assert gaiola.status == StatusGaiola.RECEBIDA_LAVANDERIA
+    assert sorted(float(p.peso) for p in gaiola.pesagens) == [49.0, 50.0]
+    assert float(gaiola.resumo_pesagem.peso_recebimento) == 49.0
@@ -2,15 +2,19 @@
 import uuid
 import pytest
 from datetime import datetime, timezone, timedelta
+from fastapi import Response
 
 from app.models.user import Usuario, TipoUsuario
 from app.models.hospital import Hospital
+from app.models.resumo_pesagem import ResumoPesagem
 from app.models.gaiola import Gaiola, StatusGaiola
 from app.models.pesagem import Pesagem, TipoPesagem
 from app.models.processo import Processo, EtapaProcesso
 from app.models.transporte import Transporte, TipoTransporte, StatusTransporte
 from app.utils.security import get_password_hash, create_access_token
-from app.services import balanca_service, notificacao_service, relatorio_service
+from app.services import (
+    balanca_service, dashboard_service, ingestao_service, notificacao_service, relatorio_service,
+)
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────────────
@@ -161,6 +165,30 @@ def test_relatorio_divergencias_empty(client, db):
     assert isinstance(resp.json(), list)
 
 
+def test_relatorio_divergencias_filtros_e_paginacao(client, db):
+    user = _admin(db)
+    h1 = _hospital(db, "H-Pag-1")
+    h2 = _hospital(db, "H-Pag-2")
+    for codigo, hospital, peso_exp in (("PAG-A", h1, 90.0), ("PAG-B", h1, 70.0),
+                                       ("PAG-C", h1, 80.0), ("PAG-D", h2, 50.0)):
+        g = _gaiola(db, hospital, codigo=codigo)
+        balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 100.0)
+        balanca_service.registrar_pesagem(db, g, TipoPesagem.EXPEDICAO, peso_exp)
+
+    params = {"hospital_id": str(h1.id), "limit": 2}
+    resp = client.get("/api/v1/relatorios/divergencias", params=params, headers=_auth(user))
+    assert resp.status_code == 200
+    assert [r["gaiola_codigo"] for r in resp.json()] == ["PAG-B", "PAG-C"]
+
+    params.update(skip=2)
+    resp = client.get("/api/v1/relatorios/divergencias", params=params, headers=_auth(user))
+    assert [r["gaiola_codigo"] for r in resp.json()] == ["PAG-A"]
+
+    params = {"hospital_id": str(h1.id), "ordem": "asc", "limite_percentual": 15}
+    resp = client.get("/api/v1/relatorios/divergencias", params=params, headers=_auth(user))
+    assert [r["divergencia_percentual"] for r in resp.json()] == [20.0, 30.0]
+
+
 def test_relatorio_produtividade(client, db):
     user = _admin(db)
     resp = client.get("/api/v1/relatorios/produtividade", headers=_auth(user))
@@ -179,6 +207,21 @@ def test_relatorio_expedicao_csv(client, db):
     assert "text/csv" in resp.headers["content-type"]
 
 
+def test_relatorio_expedicao_csv_conteudo(client, db):
+    user = _admin(db)
+    h = _hospital(db, "H-CSV")
+    g = _gaiola(db, h, codigo="CSV-001")
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 40.0)
+    resp = client.get("/api/v1/relatorios/expedicao/csv", params={"hospital_id": str(h.id)},
+                      headers=_auth(user))
+    assert resp.status_code == 200
+    assert resp.content.startswith(b"\xef\xbb\xbf")
+    linhas = resp.content.decode("utf-8-sig").splitlines()
+    assert linhas[0].startswith("ID Gaiola,Código,Hospital")
+    assert len(linhas) == 2
+    assert "CSV-001" in linhas[1] and "40.0" in linhas[1]
+
+
 def test_relatorio_expedicao_excel(client, db):
     user = _admin(db)
     resp = client.get("/api/v1/relatorios/expedicao/excel", headers=_auth(user))
@@ -204,6 +247,39 @@ def test_registrar_pesagem_service(db):
     assert g.status == StatusGaiola.EM_TRANSPORTE_IDA
 
 
+def test_registrar_pesagem_atualiza_resumo(db):
+    h = _hospital(db, "H-Resumo")
+    g = _gaiola(db, h)
+    agora = datetime.now(timezone.utc)
+
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 100.0, timestamp=agora)
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.EXPEDICAO, 92.0, timestamp=agora)
+    # Leitura reenviada fora de ordem não sobrescreve a mais recente
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.EXPEDICAO, 50.0,
+                                      timestamp=agora - timedelta(hours=1))
+
+    db.refresh(g)
+    resumo = g.resumo_pesagem
+    assert float(resumo.peso_saida) == 100.0
+    assert float(resumo.peso_expedicao) == 92.0
+    assert resumo.peso_recebimento is None
+    assert float(resumo.divergencia) == 8.0
+
+
+def test_garantir_resumos_tolera_linha_criada_por_outra_transacao(db):
+    h = _hospital(db, "H-ResumoConc")
+    g = _gaiola(db, h)
+    # Simula a pesagem concorrente que criou o resumo depois do nosso SELECT
+    db.add(ResumoPesagem(gaiola_id=g.id))
+    db.flush()
+
+    balanca_service.garantir_resumos(db, [g.id, g.id])
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 70.0)
+
+    assert db.query(ResumoPesagem).filter_by(gaiola_id=g.id).count() == 1
+    assert float(db.get(ResumoPesagem, g.id).peso_saida) == 70.0
+
+
 def test_calcular_divergencia_none_when_missing(db):
     assert balanca_service.calcular_divergencia([]) is None
 
@@ -233,27 +309,327 @@ def test_tem_divergencia_critica(db):
 
 # ─── Service: notificacao_service ─────────────────────────────────────────────
 
-def test_notificacao_registrada():
-    notificacao_service.limpar_notificacoes()
+def test_notificacao_registrada(db):
     notificacao_service.notificar_mudanca_status(
         gaiola_codigo="GAI-TEST",
         status_anterior="CRIADA",
         status_novo="EM_TRANSPORTE_IDA",
         usuario="op@test.com",
     )
-    notifs = notificacao_service.get_notificacoes_recentes(10)
+    notifs = notificacao_service.listar_notificacoes(db, Response(), limite=10)
     assert len(notifs) == 1
-    assert notifs[0]["gaiola_codigo"] == "GAI-TEST"
-    assert notifs[0]["status_novo"] == "EM_TRANSPORTE_IDA"
-    notificacao_service.limpar_notificacoes()
+    assert notifs[0].gaiola_codigo == "GAI-TEST"
+    assert notifs[0].status_novo == "EM_TRANSPORTE_IDA"
 
 
-def test_notificacao_limite():
-    notificacao_service.limpar_notificacoes()
+def test_notificacao_limite(db):
     for i in range(10):
         notificacao_service.notificar_mudanca_status(f"G-{i}", "A", "B")
-    assert len(notificacao_service.get_notificacoes_recentes(5)) == 5
-    notificacao_service.limpar_notificacoes()
+    notifs = notificacao_service.listar_notificacoes(db, Response(), limite=5)
+    assert [n.gaiola_codigo for n in notifs] == ["G-9", "G-8", "G-7", "G-6", "G-5"]
+
+
+def test_despachante_entrega_em_lotes_a_cada_destino():
+    from app.services.despacho_service import Despachante
+
+    class Destino:
+        def __init__(self, nome, falhas=0):
+            self.nome, self.falhas, self.lotes = nome, falhas, []
+
+        def entregar(self, eventos, **_):
+            if self.falhas:
+                self.falhas -= 1
+                raise RuntimeError("indisponível")
+            self.lotes.append(len(eventos))
+
+    instavel, quebrado = Destino("instavel", falhas=1), Destino("quebrado", falhas=99)
+    despachante = Despachante(
+        [instavel, quebrado], workers=2, lote_max=4, latencia_max_ms=20, fila_max=8,
+        tentativas=2, espera_inicial_s=0.001,
+    )
+    for i in range(10):
+        despachante.enviar({"gaiola_codigo": f"G-{i}"})
+    despachante.iniciar()
+    despachante.parar()
+    assert sum(instavel.lotes) == 8 and max(instavel.lotes) <= 4
+    metricas = despachante.metricas()
+    assert (metricas["enviados"], metricas["descartados"], metricas["fila"]) == (8, 2, 0)
+    assert metricas["destinos"]["instavel"] == {"entregues": 8, "falhas": 1, "mortos": 0}
+    assert metricas["destinos"]["quebrado"]["mortos"] == 8
+    assert sum(len(m["eventos"]) for m in despachante.mortos) == 8
+    assert {m["destino"] for m in despachante.mortos} == {"quebrado"}
+
+
+def test_despachante_descarregar_em_nao_espera_os_demais_destinos():
+    import threading
+    import time
+    from app.services.despacho_service import Despachante
+
+    liberar = threading.Event()
+
+    class Destino:
+        def __init__(self, nome, lento=False):
+            self.nome, self.lento, self.eventos = nome, lento, []
+
+        def entregar(self, eventos, **_):
+            if self.lento:
+                liberar.wait(5)
+            self.eventos.extend(eventos)
+
+    gravacao, webhook = Destino("persistencia"), Destino("webhook", lento=True)
+    despachante = Despachante([gravacao, webhook], workers=1, latencia_max_ms=1)
+    despachante.iniciar()
+    # O único worker fica preso no webhook lento com o primeiro evento
+    despachante.enviar({"gaiola_codigo": "G-ocupa"})
+    prazo = time.monotonic() + 5
+    while not gravacao.eventos and time.monotonic() < prazo:
+        time.sleep(0.001)
+    for i in range(3):
+        despachante.enviar({"gaiola_codigo": f"G-{i}"})
+    inicio = time.monotonic()
+    assert despachante.descarregar_em(gravacao) == 3
+    assert time.monotonic() - inicio < 1 and webhook.eventos == []
+    assert despachante.metricas()["parciais"] == 1
+
+    liberar.set()
+    despachante.parar()
+    assert len(gravacao.eventos) == len(webhook.eventos) == 4
+    assert despachante.metricas()["destinos"]["persistencia"]["entregues"] == 4
+
+
+def test_despachante_descarregar_em_sem_workers_entrega_a_todos():
+    from app.services.despacho_service import Despachante
+
+    class Destino:
+        def __init__(self, nome):
+            self.nome, self.eventos = nome, []
+
+        def entregar(self, eventos, **_):
+            self.eventos.extend(eventos)
+
+    gravacao, webhook = Destino("persistencia"), Destino("webhook")
+    despachante = Despachante([gravacao, webhook], lote_max=2)
+    for i in range(5):
+        despachante.enviar({"gaiola_codigo": f"G-{i}"})
+    assert despachante.descarregar_em(gravacao) == 5
+    assert len(webhook.eventos) == 5
+    assert despachante.metricas()["parciais"] == 0
+
+
+# ─── Service: webhook_service ─────────────────────────────────────────────────
+
+def test_entregador_webhooks_agrupa_por_assinatura_com_backoff():
+    import hashlib
+    import hmac
+    import json as _json
+    import time
+
+    import httpx
+
+    from app.models.webhook import WebhookHospital
+    from app.services.webhook_service import ASSINATURA_HEADER, EntregadorWebhooks
+
+    recebidos, falhas = [], {"http://a.test/": 1}
+
+    def receptor(request):
+        if falhas.get(str(request.url)):
+            falhas[str(request.url)] -= 1
+            return httpx.Response(503)
+        recebidos.append((str(request.url), request.headers.get(ASSINATURA_HEADER), request.content))
+        return httpx.Response(204)
+
+    a = WebhookHospital(id=uuid.uuid4(), hospital_id=uuid.uuid4(), url="http://a.test/", segredo="s3gredo")
+    b = WebhookHospital(id=uuid.uuid4(), hospital_id=uuid.uuid4(), url="http://b.test/")
+    entregador = EntregadorWebhooks(
+        janela_ms=50, lote_max=100, concorrencia=2, tentativas=3, espera_inicial_s=0.01,
+        transporte=httpx.MockTransport(receptor),
+    )
+    entregador.iniciar()
+    for i in range(5):
+        entregador.adicionar(a, [{"n": i}])
+        entregador.adicionar(b, [{"n": i}, {"n": i + 100}])
+    prazo = time.monotonic() + 2
+    while entregador.metricas()["eventos_entregues"] < 15 and time.monotonic() < prazo:
+        time.sleep(0.01)
+    entregador.parar()
+
+    # Uma chamada por assinatura; a primeira de ``a`` falhou e foi repetida com o mesmo lote
+    assert sorted(url for url, _, _ in recebidos) == ["http://a.test/", "http://b.test/"]
+    url, assinatura, corpo = next(r for r in recebidos if r[0] == "http://a.test/")
+    assert [e["n"] for e in _json.loads(corpo)["eventos"]] == [0, 1, 2, 3, 4]
+    assert assinatura == "sha256=" + hmac.new(b"s3gredo", corpo, hashlib.sha256).hexdigest()
+    metricas = entregador.metricas()
+    assert (metricas["lotes_enviados"], metricas["falhas"], metricas["eventos_descartados"]) == (2, 1, 0)
+
+
+def test_entregador_webhooks_descarta_filas_ociosas(monkeypatch):
+    import time
+
+    import httpx
+
+    from app.models.webhook import WebhookHospital
+    from app.services import webhook_service
+
+    monkeypatch.setattr(webhook_service, "FILA_OCIOSA_S", 0.05)
+    entregador = webhook_service.EntregadorWebhooks(
+        janela_ms=1, transporte=httpx.MockTransport(lambda request: httpx.Response(204)),
+    )
+    entregador.iniciar()
+    try:
+        assinatura = WebhookHospital(id=uuid.uuid4(), hospital_id=uuid.uuid4(), url="http://ociosa.test/")
+        entregador.adicionar(assinatura, [{"n": 1}])
+        prazo = time.monotonic() + 2
+        while entregador.metricas()["assinaturas"] and time.monotonic() < prazo:
+            time.sleep(0.01)
+    finally:
+        entregador.parar()
+    metricas = entregador.metricas()
+    assert (metricas["eventos_entregues"], metricas["assinaturas"]) == (1, 0)
+
+
+def test_destino_webhooks_hospitais_filtra_eventos_por_assinatura(db):
+    from app.models.webhook import WebhookHospital
+    from app.services.webhook_service import DestinoWebhooksHospitais
+
+    class Entregador:
+        def __init__(self):
+            self.lotes = {}
+
+        def adicionar(self, assinatura, eventos):
+            self.lotes.setdefault(assinatura.url, []).extend(eventos)
+
+    hospital = Hospital(id=uuid.uuid4(), nome="H. Destino", ativo=True)
+    for codigo, divergencia in (("DW-1", 10), ("DW-2", 1)):
+        gaiola = Gaiola(id=uuid.uuid4(), codigo=codigo, hospital=hospital, status=StatusGaiola.PRONTA_EXPEDICAO)
+        db.add_all([gaiola, ResumoPesagem(gaiola_id=gaiola.id, divergencia=divergencia)])
+    db.add_all([
+        WebhookHospital(hospital_id=hospital.id, url="http://todos.test/", eventos="ENTREGUE,DIVERGENCIA"),
+        WebhookHospital(hospital_id=hospital.id, url="http://entregas.test/", eventos="ENTREGUE"),
+        WebhookHospital(hospital_id=hospital.id, url="http://inativo.test/", eventos="ENTREGUE", ativo=False),
+    ])
+    db.commit()
+
+    def evento(codigo, status):
+        return {"id": uuid.uuid4(), "timestamp": datetime.now(timezone.utc), "gaiola_codigo": codigo,
+                "status_anterior": "X", "status_novo": status}
+
+    entregador = Entregador()
+    DestinoWebhooksHospitais(entregador).entregar([
+        evento("DW-1", "PRONTA_EXPEDICAO"), evento("DW-2", "PRONTA_EXPEDICAO"),
+        evento("DW-2", "ENTREGUE"), evento("DW-1", "EM_LAVAGEM"),
+    ], db=db)
+    assert [(e["gaiola_codigo"], e["tipo"]) for e in entregador.lotes["http://todos.test/"]] == [
+        ("DW-1", "DIVERGENCIA"), ("DW-2", "ENTREGUE"),
+    ]
+    assert entregador.lotes["http://todos.test/"][0]["divergencia"] == 10.0
+    assert [e["tipo"] for e in entregador.lotes["http://entregas.test/"]] == ["ENTREGUE"]
+    assert "http://inativo.test/" not in entregador.lotes
+
+
+# ─── Service: revogacao_tokens ────────────────────────────────────────────────
+
+def test_revogacao_tokens_recarrega_versoes_do_banco(db):
+    import time
+
+    from app.services.revogacao_tokens import RevogacaoTokens
+
+    user = Usuario(id=uuid.uuid4(), nome="Rev", email="rev@test.com", senha_hash="x",
+                   tipo_usuario=TipoUsuario.MOTORISTA, ativo=True)
+    db.add(user)
+    db.commit()
+    revogacao = RevogacaoTokens(intervalo=0.2)
+    assert not revogacao.revogado(db, user.id, 0)
+    # Outro worker desativa o usuário: este só percebe na próxima carga
+    user.versao_token = 1
+    db.commit()
+    assert not revogacao.revogado(db, user.id, 0)
+    time.sleep(0.2)
+    assert revogacao.revogado(db, user.id, 0)
+    assert not revogacao.revogado(db, user.id, 1)
+    assert revogacao.metricas() == {"verificados": 4, "recusados": 1, "cargas": 2, "usuarios": 1}
+
+
+# ─── Service: senha_service ───────────────────────────────────────────────────
+
+def test_pool_senhas_limita_operacoes_em_andamento():
+    import asyncio
+    import threading
+
+    from app.services.senha_service import PoolSenhas, PoolSenhasCheio
+
+    pool = PoolSenhas(workers=1, fila_max=1)
+    senha_hash = pool.gerar_hash("segredo")
+    assert asyncio.run(pool.verificar_async("segredo", senha_hash)) == (True, None)
+    assert pool.verificar("errada", senha_hash) == (False, None)
+
+    liberar = threading.Event()
+    ocupadas = [pool._submeter(liberar.wait) for _ in range(2)]
+    with pytest.raises(PoolSenhasCheio):
+        pool.verificar("segredo", senha_hash)
+    liberar.set()
+    for futuro in ocupadas:
+        futuro.result()
+    metricas = pool.metricas()
+    assert (metricas["verificacoes"], metricas["hashes"], metricas["recusadas"]) == (2, 1, 1)
+
+
+# ─── database: pools por carga ────────────────────────────────────────────────
+
+def test_pool_medido_expoe_conexoes_em_uso_e_espera(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    from app.database import PoolMedido
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=PoolMedido,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        metricas = engine.pool.metricas()
+        assert (metricas["em_uso"], metricas["timeouts"], metricas["checkouts"]) == (1, 1, 2)
+        assert metricas["espera_max_ms"] >= 50
+    engine.dispose()
+    assert engine.pool.metricas()["em_uso"] == 0 and engine.pool.metricas()["timeouts"] == 1
+
+
+def test_roteador_leitura_usa_replica_e_volta_ao_primario(tmp_path):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database import RoteadorLeitura
+
+    def _sessoes(nome):
+        engine = create_engine(f"sqlite:///{tmp_path / nome}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE origem (nome TEXT)"))
+            conn.execute(text("INSERT INTO origem VALUES (:nome)"), {"nome": nome})
+        return sessionmaker(bind=engine)
+
+    def _origem(db):
+        with db:
+            return db.execute(text("SELECT nome FROM origem")).scalar()
+
+    primario, replica = _sessoes("primario.db"), _sessoes("replica.db")
+    roteador = RoteadorLeitura(replica, primario, espera_falha_s=60)
+    assert _origem(roteador.sessao()) == "replica.db"
+    assert _origem(roteador.sessao(forcar_primario=True)) == "primario.db"
+
+    fora = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'inexistente' / 'replica.db'}"))
+    roteador = RoteadorLeitura(fora, primario, espera_falha_s=60)
+    assert _origem(roteador.sessao()) == "primario.db"
+    assert _origem(roteador.sessao()) == "primario.db"
+    metricas = roteador.metricas()
+    assert (metricas["falhas_replica"], metricas["primario"], metricas["replica_disponivel"]) == (1, 2, False)
+
+    # Pool da réplica esgotado também cai para o primário, em vez de virar 500
+    from sqlalchemy.pool import QueuePool
+    engine_cheia = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", poolclass=QueuePool,
+                                 pool_size=1, max_overflow=0, pool_timeout=0.01)
+    roteador = RoteadorLeitura(sessionmaker(bind=engine_cheia), primario, espera_falha_s=60)
+    with engine_cheia.connect():
+        assert _origem(roteador.sessao()) == "primario.db"
+    assert roteador.metricas()["falhas_replica"] == 1
 
 
 # ─── Service: relatorio_service ───────────────────────────────────────────────
@@ -276,15 +652,660 @@ def test_relatorio_produtividade_service_com_dados(db):
     assert resultado["tempo_medio_min_por_etapa"]["lavagem"] == pytest.approx(30.0, abs=1.0)
 
 
+def test_relatorio_divergencias_service(db):
+    h = _hospital(db, "H-DivRel")
+    g_alta = _gaiola(db, h, codigo="DIVREL-1")
+    g_baixa = _gaiola(db, h, codigo="DIVREL-2")
+    for g, peso_exp in ((g_alta, 80.0), (g_baixa, 99.0)):
+        balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 100.0)
+        balanca_service.registrar_pesagem(db, g, TipoPesagem.EXPEDICAO, peso_exp)
+
+    resultado = relatorio_service.relatorio_divergencias(db, limite_percentual=5.0)
+    assert resultado == [{
+        "gaiola_codigo": "DIVREL-1",
+        "hospital": "H-DivRel",
+        "peso_saida": 100.0,
+        "peso_expedicao": 80.0,
+        "divergencia_percentual": 20.0,
+    }]
+
+
+def test_relatorio_expedicao_csv_em_lotes(db):
+    h = _hospital(db, "H-Lotes")
+    for i in range(5):
+        _gaiola(db, h, codigo=f"LOTE-{i}")
+    chunks = list(relatorio_service.relatorio_expedicao_csv(db, hospital_id=str(h.id), lote=2))
+    # cabeçalho + 2 lotes completos + lote final com 1 linha
+    assert len(chunks) == 4
+    assert chunks[0].startswith(b"\xef\xbb\xbf")
+    assert not any(c.startswith(b"\xef\xbb\xbf") for c in chunks[1:])
+    linhas = b"".join(chunks).decode("utf-8-sig").splitlines()
+    assert [linha.split(",")[1] for linha in linhas[1:]] == [f"LOTE-{i}" for i in range(5)]
+
+
+def test_relatorio_expedicao_excel_conteudo(db):
+    import io
+    import openpyxl
+    h = _hospital(db, "H-XLSX")
+    g = _gaiola(db, h, codigo="XLSX-001")
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 33.0)
+    conteudo = b"".join(relatorio_service.relatorio_expedicao_excel(db, hospital_id=str(h.id), lote=1))
+    ws = openpyxl.load_workbook(io.BytesIO(conteudo)).active
+    linhas = list(ws.iter_rows(values_only=True))
+    assert ws.title == "Relatório Expedição"
+    assert list(linhas[0]) == relatorio_service.COLUNAS_EXPEDICAO
+    assert linhas[1][1] == "XLSX-001"
+    assert linhas[1][3] == 33.0
+    assert len(linhas) == 2
+
+
+def test_relatorio_produtividade_service_agregados(db):
+    h = _hospital(db, "H-Agg")
+    g1 = _gaiola(db, h, status=StatusGaiola.ENTREGUE)
+    g2 = _gaiola(db, h, status=StatusGaiola.ENTREGUE)
+    _gaiola(db, h, status=StatusGaiola.EM_LAVAGEM)
+    balanca_service.registrar_pesagem(db, g1, TipoPesagem.EXPEDICAO, 10.5)
+    balanca_service.registrar_pesagem(db, g2, TipoPesagem.EXPEDICAO, 20.25)
+    g1.status = g2.status = StatusGaiola.ENTREGUE
+    db.commit()
+
+    resultado = relatorio_service.relatorio_produtividade(db)
+    assert resultado["total_gaiolas"] == 3
+    assert resultado["entregues"] == 2
+    assert resultado["peso_total_expedido_kg"] == pytest.approx(30.75)
+    assert resultado["por_status"] == {"ENTREGUE": 2, "EM_LAVAGEM": 1}
+    assert "por_grupo" not in resultado
+
+
+def test_relatorio_produtividade_group_by(client, db):
+    user = _admin(db)
+    h = _hospital(db, "H-Grupo")
+    g = _gaiola(db, h, status=StatusGaiola.ENTREGUE)
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.EXPEDICAO, 12.0)
+    g.status = StatusGaiola.ENTREGUE
+    fim = datetime.now(timezone.utc)
+    db.add_all([
+        Processo(id=uuid.uuid4(), gaiola_id=g.id, etapa=EtapaProcesso.LAVAGEM, maquina_id="LAV-1",
+                 data_inicio=fim - timedelta(minutes=40), data_fim=fim),
+        Processo(id=uuid.uuid4(), gaiola_id=g.id, etapa=EtapaProcesso.SECAGEM, maquina_id="LAV-1",
+                 data_inicio=fim - timedelta(minutes=20), data_fim=fim),
+        Processo(id=uuid.uuid4(), gaiola_id=g.id, etapa=EtapaProcesso.DOBRA, maquina_id="DOB-1",
+                 data_inicio=fim - timedelta(minutes=5)),
+    ])
+    db.commit()
+
+    resp = client.get("/api/v1/relatorios/produtividade", params={"group_by": "hospital"},
+                      headers=_auth(user))
+    assert resp.status_code == 200
+    assert resp.json()["por_grupo"] == [{
+        "grupo": "H-Grupo", "hospital_id": str(h.id),
+        "total_gaiolas": 1, "entregues": 1, "peso_total_expedido_kg": 12.0,
+    }]
+
+    resp = client.get("/api/v1/relatorios/produtividade", params={"group_by": "day"},
+                      headers=_auth(user))
+    assert [d["total_gaiolas"] for d in resp.json()["por_grupo"]] == [1]
+
+    resp = client.get("/api/v1/relatorios/produtividade", params={"group_by": "maquina"},
+                      headers=_auth(user))
+    grupos = resp.json()["por_grupo"]
+    assert grupos == [{"grupo": "LAV-1", "processos_concluidos": 2, "tempo_medio_min": pytest.approx(30.0, abs=0.5)}]
+
+    resp = client.get("/api/v1/relatorios/produtividade", params={"group_by": "turno"},
+                      headers=_auth(user))
+    assert resp.status_code == 422
+
+
 def test_build_rows_expedicao_com_pesagens(db):
     h = _hospital(db, "H-Rows")
     g = _gaiola(db, h)
-    p1 = Pesagem(id=uuid.uuid4(), gaiola_id=g.id, tipo_pesagem=TipoPesagem.SAIDA_HOSPITAL,
-                 peso=100.0, timestamp=datetime.now(timezone.utc))
-    p2 = Pesagem(id=uuid.uuid4(), gaiola_id=g.id, tipo_pesagem=TipoPesagem.EXPEDICAO,
-                 peso=94.0, timestamp=datetime.now(timezone.utc))
-    db.add_all([p1, p2]); db.commit(); db.refresh(g)
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 100.0)
+    balanca_service.registrar_pesagem(db, g, TipoPesagem.EXPEDICAO, 94.0)
+    db.refresh(g)
     rows = relatorio_service.build_rows_expedicao([g])
     assert len(rows) == 1
     assert rows[0]["Divergência (%)"] == pytest.approx(6.0, abs=0.01)
 
+
+
+# ─── Service: dashboard_service ───────────────────────────────────────────────
+
+def test_dashboard_estatisticas(db):
+    h = _hospital(db, "H-Dash")
+    _gaiola(db, h, status=StatusGaiola.EM_TRANSPORTE_IDA)
+    _gaiola(db, h, status=StatusGaiola.EM_LAVAGEM)
+    _gaiola(db, h, status=StatusGaiola.EM_DOBRA)
+    g = _gaiola(db, h, status=StatusGaiola.PRONTA_EXPEDICAO)
+    db.add(Pesagem(id=uuid.uuid4(), gaiola_id=g.id, tipo_pesagem=TipoPesagem.EXPEDICAO,
+                   peso=12.5, timestamp=datetime.now(timezone.utc)))
+    db.add(Pesagem(id=uuid.uuid4(), gaiola_id=g.id, tipo_pesagem=TipoPesagem.SAIDA_HOSPITAL,
+                   peso=99.0, timestamp=datetime.now(timezone.utc) - timedelta(days=2)))
+    db.commit()
+
+    stats = dashboard_service.estatisticas(db)
+    assert stats == {
+        "em_transito": 1,
+        "em_processamento": 2,
+        "prontas_expedicao": 1,
+        "peso_hoje": 12.5,
+    }
+
+
+def test_dashboard_alertas_usa_pesagem_mais_recente(db):
+    h = _hospital(db, "H-Alerta")
+    g_div = _gaiola(db, h, codigo="ALERTA-1")
+    g_ok = _gaiola(db, h, codigo="ALERTA-2")
+    agora = datetime.now(timezone.utc)
+    registrar = balanca_service.registrar_pesagem
+    registrar(db, g_div, TipoPesagem.SAIDA_HOSPITAL, 100.0, timestamp=agora)
+    registrar(db, g_div, TipoPesagem.EXPEDICAO, 90.0, timestamp=agora)
+    registrar(db, g_ok, TipoPesagem.SAIDA_HOSPITAL, 100.0, timestamp=agora)
+    registrar(db, g_ok, TipoPesagem.EXPEDICAO, 98.0, timestamp=agora)
+    registrar(db, g_ok, TipoPesagem.EXPEDICAO, 80.0, timestamp=agora - timedelta(hours=1))
+
+    alertas = dashboard_service.alertas_divergencia(db)
+    assert alertas == [{"gaiola": "ALERTA-1", "divergencia": 10.0}]
+
+
+def test_dashboard_page(client, db):
+    user = _admin(db)
+    client.cookies.set("access_token", _tok(user))
+    resp = client.get("/dashboard")
+    assert resp.status_code == 200
+    assert "Dashboard" in resp.text
+
+
+# ─── Service: ingestao_service ────────────────────────────────────────────────
+
+def test_buffer_pesagens_agrupa_em_lotes():
+    from concurrent.futures import ThreadPoolExecutor
+    lotes = []
+
+    def gravar(leituras):
+        lotes.append(list(leituras))
+        return [{"leitura": leitura} for leitura in leituras]
+
+    buffer = ingestao_service.BufferPesagens(gravar=gravar, lote_max=3, latencia_max_ms=50)
+    buffer.iniciar()
+    try:
+        with ThreadPoolExecutor(max_workers=7) as pool:
+            resultados = list(pool.map(lambda i: buffer.registrar(i, timeout=5), range(7)))
+    finally:
+        buffer.parar()
+
+    assert [r["leitura"] for r in resultados] == list(range(7))
+    assert sorted(x for lote in lotes for x in lote) == list(range(7))
+    assert max(len(lote) for lote in lotes) <= 3
+    metricas = buffer.metricas()
+    assert metricas["leituras"] == 7
+    assert metricas["lotes"] == len(lotes)
+    assert metricas["maior_lote"] == max(len(lote) for lote in lotes)
+
+
+def test_buffer_pesagens_propaga_falha():
+    def gravar(leituras):
+        raise RuntimeError("banco indisponível")
+
+    buffer = ingestao_service.BufferPesagens(gravar=gravar, lote_max=10, latencia_max_ms=1)
+    buffer.iniciar()
+    try:
+        with pytest.raises(RuntimeError):
+            buffer.registrar("x", timeout=5)
+    finally:
+        buffer.parar()
+    assert buffer.metricas()["falhas"] == 1
+
+
+def test_pesagem_balanca_com_buffer(client, db):
+    h = _hospital(db, "H-Buffer")
+    g = _gaiola(db, h, codigo="BUF-001")
+    ingestao_service.iniciar(ingestao_service.BufferPesagens(
+        gravar=lambda leituras: balanca_service.registrar_pesagens_lote(db, leituras),
+        latencia_max_ms=5,
+    ))
+    try:
+        resp = client.post("/api/v1/pesagens/balanca", json={
+            "gaiola_codigo": "BUF-001", "peso": 30.0,
+            "tipo_pesagem": "saida_hospital", "balanca_id": "B-BUF",
+        })
+        resp_404 = client.post("/api/v1/pesagens/balanca", json={
+            "gaiola_codigo": "NAO-EXISTE", "peso": 30.0,
+            "tipo_pesagem": "saida_hospital", "balanca_id": "B-BUF",
+        })
+        metricas = client.get("/api/v1/pesagens/balanca/metricas", headers=_auth(_admin(db))).json()
+    finally:
+        ingestao_service.parar()
+
+    assert resp.status_code == 201
+    assert resp.json()["gaiola_codigo"] == "BUF-001"
+    assert resp_404.status_code == 404
+    assert metricas["buffer_ativo"] is True
+    assert metricas["leituras"] == 2
+    db.refresh(g)
+    assert g.status == StatusGaiola.EM_TRANSPORTE_IDA
+    assert [float(p.peso) for p in g.pesagens] == [30.0]
+
+
+def test_pesagem_balanca_com_buffer_timeout_e_falha(client, db):
+    import threading
+    leitura = {"gaiola_codigo": "BUF-X", "peso": 30.0, "tipo_pesagem": "saida_hospital", "balanca_id": "B-BUF"}
+    liberar = threading.Event()
+
+    def gravar_lento(leituras):
+        liberar.wait(5)
+        return [{"erro": "descartada"} for _ in leituras]
+
+    ingestao_service.iniciar(ingestao_service.BufferPesagens(gravar=gravar_lento, latencia_max_ms=1, timeout_s=0.05))
+    try:
+        resp = client.post("/api/v1/pesagens/balanca", json=leitura)
+    finally:
+        liberar.set()
+        ingestao_service.parar()
+    assert resp.status_code == 504 and resp.headers["Retry-After"] == "1"
+
+    def gravar_quebrado(leituras):
+        raise RuntimeError("banco indisponível")
+
+    ingestao_service.iniciar(ingestao_service.BufferPesagens(gravar=gravar_quebrado, latencia_max_ms=1))
+    try:
+        resp = client.post("/api/v1/pesagens/balanca", json=leitura)
+    finally:
+        ingestao_service.parar()
+    assert resp.status_code == 503 and resp.headers["Retry-After"] == "1"
+
+
+def test_resolvedor_gaiolas_lru(db):
+    from app.services.gaiola_resolver import ResolvedorGaiolas
+    hospital = Hospital(id=uuid.uuid4(), nome="H. LRU", ativo=True)
+    for codigo in ("LRU-1", "LRU-2", "LRU-3"):
+        db.add(Gaiola(id=uuid.uuid4(), codigo=codigo, hospital=hospital, status=StatusGaiola.CRIADA))
+    db.commit()
+    resolvedor = ResolvedorGaiolas(tamanho=2, ttl=60)
+
+    assert resolvedor.resolver(db, "LRU-1").codigo == "LRU-1"
+    resolvedor.resolver(db, "LRU-2")
+    resolvedor.resolver(db, "LRU-1")
+    resolvedor.resolver(db, "LRU-3")  # descarta LRU-2, o menos usado
+    assert resolvedor.resolver(db, "NAO-EXISTE") is None
+    resolvedor.atualizar_status("LRU-1", StatusGaiola.EM_LAVAGEM)
+    assert resolvedor.resolver(db, "LRU-1").status == StatusGaiola.EM_LAVAGEM
+    resolvedor.resolver(db, "LRU-2")
+
+    m = resolvedor.metricas()
+    assert (m["hits"], m["misses"], m["tamanho"]) == (2, 5, 2)
+
+
+def test_resolvedor_so_atualiza_status_apos_commit(db, monkeypatch):
+    from app.services.gaiola_resolver import resolvedor
+    h = _hospital(db, "H-Commit")
+    g = _gaiola(db, h, codigo="CMT-001")
+    resolvedor.resolver(db, "CMT-001")
+
+    def commit_falho():
+        raise RuntimeError("commit falhou")
+
+    monkeypatch.setattr(db, "commit", commit_falho)
+    with pytest.raises(RuntimeError):
+        balanca_service.registrar_pesagem(db, g, TipoPesagem.SAIDA_HOSPITAL, 30.0)
+    assert resolvedor.resolver(db, "CMT-001").status == StatusGaiola.CRIADA
+
+
+def test_detector_estabilidade_emite_uma_vez_por_carga():
+    from app.services.estabilizacao_service import DetectorEstabilidade
+    detector = DetectorEstabilidade(janela=5, desvio_max=0.05, tempo_estavel=0.5, peso_minimo=0.5)
+    ruido = [(i * 0.1, 40.0 + (3 if i % 2 else -3)) for i in range(10)]
+    estavel = [(1 + i * 0.1, 42.0 + (0.01 if i % 2 else -0.01)) for i in range(20)]
+    vazia = [(3 + i * 0.1, 0.0) for i in range(5)]
+
+    assert detector.processar(ruido) == []
+    assert detector.processar(estavel) == [pytest.approx(42.0, abs=0.01)]
+    assert detector.processar([(5, 42.0)] * 3) == []
+    assert detector.processar(vazia) == []
+    assert detector.processar([(4 + i * 0.1, 30.0) for i in range(15)]) == [30.0]
+
+
+def test_gestor_balancas_limita_detectores(monkeypatch):
+    from app.services import estabilizacao_service
+    agora = [0.0]
+    monkeypatch.setattr(estabilizacao_service.time, "monotonic", lambda: agora[0])
+    gestor = estabilizacao_service.GestorBalancas(tamanho=2, ociosa_s=60)
+
+    primeiro = gestor.detector("BAL-1")
+    gestor.detector("BAL-2")
+    assert gestor.detector("BAL-1") is primeiro
+    gestor.detector("BAL-3")  # excede o tamanho: sai BAL-2, o menos recente
+    assert gestor.metricas()["balancas"] == 2 and gestor.detector("BAL-1") is primeiro
+    agora[0] = 61.0
+    gestor.detector("BAL-4")  # BAL-1 e BAL-3 estão ociosas
+    assert (gestor.metricas()["balancas"], gestor.metricas()["descartados"]) == (1, 3)
+    assert gestor.detector("BAL-1") is not primeiro
+
+
+# ─── Service: balanca_tcp_service ─────────────────────────────────────────────
+
+def test_listener_tcp_balancas():
+    import asyncio
+    from app.services import balanca_tcp_service
+
+    def gravar(leituras):
+        return [{
+            "gaiola_codigo": leitura.gaiola_codigo,
+            "pesagem_id": f"P{i}",
+            "status_anterior": "CRIADA",
+            "status_novo": "CRIADA",
+            "erro": None if leitura.gaiola_codigo != "NAO-EXISTE" else "Gaiola 'NAO-EXISTE' não encontrada",
+            "balanca_id": leitura.balanca_id,
+            "peso": leitura.peso,
+        } for i, leitura in enumerate(leituras)]
+
+    async def cenario():
+        buffer = ingestao_service.BufferPesagens(gravar=gravar, lote_max=10, latencia_max_ms=5)
+        buffer.iniciar()
+        servidor = balanca_tcp_service.ServidorBalancas(buffer, host="127.0.0.1", porta=0)
+        await servidor.iniciar()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+            writer.write(
+                b"ID BAL-TCP\n"
+                b"TCP-001;saida_hospital;45,5 kg\n"
+                b"NAO-EXISTE;expedicao;10\n"
+                b"TCP-001;pesagem_errada;10\n"
+            )
+            await writer.drain()
+            respostas = [(await reader.readline()).decode().strip() for _ in range(4)]
+            writer.close()
+        finally:
+            await servidor.parar()
+            buffer.parar()
+        return respostas, servidor.metricas()
+
+    respostas, metricas = asyncio.run(cenario())
+    assert respostas[0] == "OK ID"
+    assert respostas[1].startswith("OK P")
+    assert respostas[2].startswith("ERR Gaiola 'NAO-EXISTE'")
+    assert respostas[3].startswith("ERR tipo de pesagem inválido")
+    assert (metricas["leituras"], metricas["erros"], metricas["conexoes_ativas"]) == (1, 2, 0)
+
+
+def test_interpretar_linha_balanca():
+    from app.services.balanca_tcp_service import ErroProtocolo, interpretar_linha
+    leitura = interpretar_linha("G-1;EXPEDICAO;12.250kg;2024-05-01T10:00:00+00:00", "BAL-1")
+    assert (leitura.gaiola_codigo, leitura.tipo_pesagem, leitura.peso) == ("G-1", TipoPesagem.EXPEDICAO, 12.25)
+    assert leitura.timestamp.year == 2024 and leitura.balanca_id == "BAL-1"
+    with pytest.raises(ErroProtocolo):
+        interpretar_linha("G-1;expedicao", "BAL-1")
+    with pytest.raises(ErroProtocolo, match="balanca_id"):
+        interpretar_linha("G-1;expedicao;10", "B" * 101)
+
+
+# ─── Service: admissao_service ────────────────────────────────────────────────
+
+def test_controle_admissao_balde_por_balanca():
+    from app.services.admissao_service import CapacidadeEsgotada, ControleAdmissao, TaxaExcedida
+    agora = [0.0]
+    controle = ControleAdmissao(taxa=2, rajada=2, concorrencia_max=1, espera_ms=0, relogio=lambda: agora[0])
+
+    controle.consumir(["BAL-1"])
+    controle.consumir(["BAL-1"])
+    with pytest.raises(TaxaExcedida) as exc:
+        controle.consumir(["BAL-1", "BAL-2"])
+    assert exc.value.balanca_id == "BAL-1" and exc.value.espera == pytest.approx(0.5)
+    controle.consumir(["BAL-2"])  # baldes independentes; o lote rejeitado não consumiu BAL-2
+    controle.consumir(["BAL-2"])
+    agora[0] = 0.5
+    controle.consumir(["BAL-1"])
+    assert controle.metricas()["rejeitadas_taxa"] == 1
+
+    # Recusada por capacidade, a requisição não gasta o token da balança
+    with controle.vaga():
+        with pytest.raises(CapacidadeEsgotada):
+            with controle.admitir(["BAL-3"]):
+                pass
+    for _ in range(2):
+        with controle.admitir(["BAL-3"]):
+            pass
+    assert controle.metricas()["em_andamento"] == 0
+
+
+def test_controle_admissao_acompanha_lote_do_buffer(monkeypatch):
+    from app.config import settings
+    from app.services.admissao_service import ControleAdmissao
+
+    assert ControleAdmissao().concorrencia_max == settings.PESAGEM_CONCORRENCIA_MAX
+    monkeypatch.setattr(settings, "PESAGEM_BUFFER_ATIVO", True)
+    monkeypatch.setattr(settings, "PESAGEM_BUFFER_LOTE_MAX", 200)
+    assert ControleAdmissao().concorrencia_max == 200
+
+
+# ─── Service: eventos_service ─────────────────────────────────────────────────
+
+def _evento(codigo, status_novo="EM_LAVAGEM"):
+    return {
+        "id": uuid.uuid4(), "timestamp": datetime.now(timezone.utc), "gaiola_codigo": codigo,
+        "status_anterior": "CRIADA", "status_novo": status_novo, "usuario": None, "observacoes": None,
+    }
+
+
+def test_stream_eventos_replay_ao_vivo_e_heartbeat():
+    import asyncio
+    import threading
+    from app.services.eventos_service import CentralEventos, stream_eventos
+    from app.utils.paginacao import decode_cursor
+
+    perdido, ao_vivo = _evento("SSE-1"), _evento("SSE-2")
+
+    async def cenario():
+        central = CentralEventos(fila_max=10)
+        assinante = central.assinar()
+        stream = stream_eventos(central, assinante, [perdido], heartbeat=0.05)
+        partes = [await stream.__anext__(), await stream.__anext__()]
+        # Evento já reenviado pelo replay não é repetido; publicação vem de outra thread
+        threading.Thread(target=lambda: [central.publicar(perdido), central.publicar(ao_vivo)]).start()
+        partes.append(await stream.__anext__())
+        partes.append(await stream.__anext__())
+        await stream.aclose()
+        return partes, central.metricas()
+
+    partes, metricas = asyncio.run(cenario())
+    assert partes[0].startswith("retry: 50")
+    assert '"gaiola_codigo": "SSE-1"' in partes[1]
+    assert '"gaiola_codigo": "SSE-2"' in partes[2]
+    assert partes[3] == ": ping\n\n"
+    assert decode_cursor(partes[2].split("\n")[0][4:]) == (ao_vivo["timestamp"], ao_vivo["id"])
+    assert metricas["conectados"] == 0
+
+
+def test_central_eventos_desconecta_assinante_lento():
+    import asyncio
+    from app.services.eventos_service import CentralEventos
+
+    async def cenario():
+        central = CentralEventos(fila_max=2)
+        lento, rapido = central.assinar(), central.assinar()
+        for i in range(3):
+            central.publicar(_evento(f"LENTO-{i}"))
+            await asyncio.sleep(0)
+            rapido.fila.get_nowait()
+        return lento, rapido, central.metricas()
+
+    lento, rapido, metricas = asyncio.run(cenario())
+    assert lento.removido and not rapido.removido
+    assert (metricas["desconectados_lentos"], metricas["conectados"]) == (1, 1)
+
+
+def test_eventos_apos_last_event_id(db):
+    from app.utils.paginacao import encode_cursor
+    for i in range(3):
+        notificacao_service.notificar_mudanca_status(f"REPLAY-{i}", "CRIADA", "EM_LAVAGEM")
+    todos = notificacao_service.eventos_apos(db, encode_cursor(datetime(2000, 1, 1), uuid.UUID(int=0)), 10)
+    assert [e["gaiola_codigo"] for e in todos] == ["REPLAY-0", "REPLAY-1", "REPLAY-2"]
+    depois = notificacao_service.eventos_apos(db, encode_cursor(todos[0]["timestamp"], todos[0]["id"]), 10)
+    assert [e["gaiola_codigo"] for e in depois] == ["REPLAY-1", "REPLAY-2"]
+
+
+# ─── Service: barramento_service ──────────────────────────────────────────────
+
+class _ServidorNotifyFalso:
+    """
+    Simula LISTEN/NOTIFY como a libpq: cada conexão tem um socketpair que acorda
+    o select(). Um comando executado numa conexão lê as notificações pendentes
+    dela direto para ``notifies`` e esvazia o socket, e o NOTIFY para a própria
+    conexão chega ali sem acordar o select().
+    """
+
+    def __init__(self):
+        self.conexoes = []
+
+    def connect(self, dsn):
+        import socket
+        from collections import namedtuple
+        servidor = self
+        Notify = namedtuple("Notify", "channel payload")
+
+        class Cursor:
+            def __init__(self, conexao):
+                self.conexao = conexao
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                self.conexao.ler_socket()
+                if sql.startswith("LISTEN"):
+                    servidor.conexoes.append(self.conexao)
+                elif "pg_notify" in sql:
+                    for conexao in list(servidor.conexoes):
+                        if conexao is self.conexao:
+                            conexao.notifies.append(Notify(*params))
+                        else:
+                            conexao.pendentes.append(Notify(*params))
+                            conexao.escrita.send(b"x")
+
+        class Conexao:
+            closed = False
+            autocommit = False
+
+            def __init__(self):
+                self.leitura, self.escrita = socket.socketpair()
+                self.pendentes, self.notifies = [], []
+
+            def cursor(self):
+                return Cursor(self)
+
+            def fileno(self):
+                return self.leitura.fileno()
+
+            def ler_socket(self):
+                self.leitura.setblocking(False)
+                try:
+                    self.leitura.recv(1024)
+                except BlockingIOError:
+                    pass
+                self.notifies.extend(self.pendentes)
+                self.pendentes.clear()
+
+            def poll(self):
+                self.ler_socket()
+
+            def close(self):
+                self.closed = True
+                if self in servidor.conexoes:
+                    servidor.conexoes.remove(self)
+                self.leitura.close()
+                self.escrita.close()
+
+        return Conexao()
+
+
+def test_barramento_postgres_entrega_a_todos_os_workers(monkeypatch):
+    import threading
+    import psycopg2
+    from app.services.barramento_service import BarramentoPostgres
+
+    servidor = _ServidorNotifyFalso()
+    monkeypatch.setattr(psycopg2, "connect", servidor.connect)
+    recebidos = {"w1": [], "w2": []}
+    chegaram = threading.Event()
+    workers = {}
+    for nome in recebidos:
+        workers[nome] = BarramentoPostgres("postgresql://falso", canal="teste")
+
+        def receber(evento, nome=nome):
+            recebidos[nome].append(evento)
+            if all(recebidos.values()):
+                chegaram.set()
+        workers[nome].assinar(receber)
+        workers[nome].iniciar()
+    try:
+        for _ in range(50):
+            if len(servidor.conexoes) == 2:
+                break
+            threading.Event().wait(0.02)
+        evento = _evento("BUS-1")
+        workers["w1"].publicar(evento)
+        assert chegaram.wait(5)
+    finally:
+        for worker in workers.values():
+            worker.parar()
+    assert recebidos["w1"] == recebidos["w2"] == [evento]
+
+
+def test_barramento_postgres_entrega_o_proprio_evento_sem_outro_trafego(monkeypatch):
+    import threading
+    import psycopg2
+    from app.services.barramento_service import BarramentoPostgres
+
+    servidor = _ServidorNotifyFalso()
+    monkeypatch.setattr(psycopg2, "connect", servidor.connect)
+    barramento, recebidos, chegou = BarramentoPostgres("postgresql://falso", canal="teste"), [], threading.Event()
+    barramento.assinar(lambda evento: (recebidos.append(evento), chegou.set()))
+    barramento.iniciar()
+    try:
+        for _ in range(50):
+            if servidor.conexoes:
+                break
+            threading.Event().wait(0.02)
+        evento = _evento("BUS-3")
+        barramento.publicar(evento)
+        assert chegou.wait(3)
+    finally:
+        barramento.parar()
+    assert recebidos == [evento]
+
+
+def test_barramento_local_e_serializacao():
+    from app.services.barramento_service import BarramentoLocal, desserializar, serializar
+    evento = _evento("BUS-2")
+    assert desserializar(serializar(evento)) == evento
+    barramento, recebidos = BarramentoLocal(), []
+    barramento.assinar(recebidos.append)
+    barramento.publicar(evento)
+    assert recebidos == [evento]
+
+
+def test_listener_tcp_usa_buffer_proprio_e_tolera_porta_em_uso():
+    import asyncio
+    import socket
+    from app.services import balanca_tcp_service
+
+    async def cenario():
+        servidor = await balanca_tcp_service.iniciar("127.0.0.1", 0)
+        try:
+            buffer_http = ingestao_service.get_buffer()
+            with socket.socket() as ocupado:
+                ocupado.bind(("127.0.0.1", 0))
+                ocupado.listen()
+                await balanca_tcp_service.parar()
+                outro = await balanca_tcp_service.iniciar("127.0.0.1", ocupado.getsockname()[1])
+        finally:
+            await balanca_tcp_service.parar()
+        return servidor, buffer_http, outro
+
+    servidor, buffer_http, outro = asyncio.run(cenario())
+    assert buffer_http is None
+    assert servidor.buffer is not None
+    assert outro is None
+    assert balanca_tcp_service.get_servidor() is None